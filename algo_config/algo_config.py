@@ -1,18 +1,133 @@
+import hashlib
+import json
 import os
-from typing import Dict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional
 
 import yaml
 
 from dir_definitions import BENCHMARK_DIR
 
 
+def _freeze(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+class RunConfig:
+    """
+    Immutable config of one run. Equal configs are equal and have equal hashes, so a config (or the hash of some of
+    its values) can key caches. The config of the current run is bound with bind_config and read with
+    get_run_config, so concurrent runs in different threads or contexts do not see each other's config.
+    """
+
+    def __init__(self, values: Mapping[str, Any], name: str = ''):
+        self._values = MappingProxyType({key: _freeze(value) for key, value in values.items()})
+        self._name = name
+        self._hash = hash((name, self.get_hash()))
+
+    @classmethod
+    def from_file(cls, config_path: str) -> 'RunConfig':
+        with open(config_path) as f:
+            values = yaml.load(f, Loader=yaml.FullLoader)
+        return cls(values, os.path.splitext(os.path.basename(config_path))[0])
+
+    @property
+    def values(self) -> Mapping[str, Any]:
+        return self._values
+
+    @property
+    def config_name(self) -> str:
+        return self._name
+
+    def get_value(self, value: str):
+        return self._values[value]
+
+    def get_hash(self, keys: Optional[Iterable[str]] = None) -> str:
+        """
+        Hashes the config values, so that equal configs have equal hashes
+        :param keys: the keys to hash, all the keys by default
+        :return: hex digest
+        """
+        keys = sorted(self._values.keys()) if keys is None else sorted(keys)
+        values = {key: self._values.get(key) for key in keys}
+        return hashlib.sha1(json.dumps(values, sort_keys=True, default=_json_default).encode()).hexdigest()
+
+    def get_name(self) -> str:
+        return self._name.replace("benchmark_", "")
+
+    def replace(self, **values) -> 'RunConfig':
+        """
+        :return: a new config with the given values replaced
+        """
+        return RunConfig({**self._values, **values}, self._name)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RunConfig) and self._name == other._name and self._values == other._values
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        # the read-only mapping can not be pickled, the config is rebuilt from plain values in another process
+        return RunConfig, (_thaw(self._values), self._name)
+
+    def __repr__(self) -> str:
+        return f'RunConfig({self._name!r})'
+
+
+def _json_default(value: Any) -> Any:
+    return dict(value) if isinstance(value, MappingProxyType) else str(value)
+
+
+_bound_config: ContextVar[Optional[RunConfig]] = ContextVar('run_config', default=None)
+
+
+def get_run_config() -> RunConfig:
+    """
+    :return: the config bound to the current context, or the process-wide default config if none is bound
+    """
+    config = _bound_config.get()
+    return config if config is not None else AlgorithmConfig().get_run_config()
+
+
+@contextmanager
+def bind_config(config: RunConfig) -> Iterator[RunConfig]:
+    """
+    Binds the config to the current context for the duration of the block
+    :param config: the run config
+    """
+    token = _bound_config.set(config)
+    try:
+        yield config
+    finally:
+        _bound_config.reset(token)
+
+
 class AlgorithmConfig:
+    """
+    Compatibility shim over the run config. It holds the process-wide default config, replaced by load_config,
+    while the getters read the config bound to the current context when there is one.
+    """
     __instance = None
 
     def __new__(cls):
         if AlgorithmConfig.__instance is None:
             AlgorithmConfig.__instance = object.__new__(cls)
-            AlgorithmConfig.__instance.config = None
+            AlgorithmConfig.__instance.run_config = None
             AlgorithmConfig.__instance.load_default_config()
         return AlgorithmConfig.__instance
 
@@ -24,15 +139,19 @@ class AlgorithmConfig:
         self.load_config(os.path.join(BENCHMARK_DIR, files[0]))
 
     def load_config(self, config_path: str):
-        with open(config_path) as f:
-            self.config = yaml.load(f, Loader=yaml.FullLoader)
-            self.config_name = os.path.splitext(os.path.basename(config_path))[0]
+        self.run_config = RunConfig.from_file(config_path)
+
+    def get_run_config(self) -> RunConfig:
+        return self.run_config
 
     def get_config(self) -> Dict:
-        return self.config
+        return dict(get_run_config().values)
 
     def get_value(self, value: str):
-        return self.config[value]
+        return get_run_config().get_value(value)
+
+    def get_hash(self, keys: Optional[Iterable[str]] = None) -> str:
+        return get_run_config().get_hash(keys)
 
     def get_name(self) -> str:
-        return self.config_name.replace("benchmark_", "")
+        return get_run_config().get_name()
@@ -7,7 +7,5 @@ FIGURES_DIR = os.path.join(ROOT_DIR, 'figures')
 BENCHMARK_DIR = os.path.join(RESOURCES_DIR, 'benchmark')
 BOUNDS_DIR = os.path.join(RESOURCES_DIR, 'bounds')
 DTM_DIR = os.path.join(RESOURCES_DIR, 'dtm')
-VILLAGES_DIR = os.path.join(RESOURCES_DIR, 'villages')
 LOS_DIR = os.path.join(RESOURCES_DIR, 'los')
-SEGMENTED_AREAS_DIR = os.path.join(RESOURCES_DIR, 'segmented_areas')
-ROADS_NETWORKS_DIR = os.path.join(RESOURCES_DIR, 'roads_networks')
+ARTIFACTS_CACHE_DIR = os.path.join(RESOURCES_DIR, 'cache')
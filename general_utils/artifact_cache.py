@@ -0,0 +1,152 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Callable, Iterable, Optional, Dict, Any, TypeVar
+
+from algo_config.algo_config import get_run_config
+from dir_definitions import ARTIFACTS_CACHE_DIR
+
+T = TypeVar('T')
+
+MAX_CACHE_SIZE = 2 * 1024 ** 3  # bytes
+PICKLE_FILE_NAME = 'artifact.pkl'
+
+
+def file_digest(path: str) -> str:
+    """
+    :return: the sha1 digest of the file content, or a marker if the file does not exist
+    """
+    if not os.path.isfile(path):
+        return 'missing'
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def save_pickled(artifact: Any, artifact_dir: str) -> None:
+    with open(os.path.join(artifact_dir, PICKLE_FILE_NAME), 'wb') as f:
+        pickle.dump(artifact, f)
+
+
+def load_pickled(artifact_dir: str) -> Any:
+    with open(os.path.join(artifact_dir, PICKLE_FILE_NAME), 'rb') as f:
+        return pickle.load(f)
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+
+
+class ArtifactCache:
+    """
+    Content-addressed cache of derived artifacts. An artifact is stored in a directory named by the hash of
+    everything it was derived from: the relevant config values, the digests of the input files, the source code of
+    the modules computing it and the keys of the artifacts it depends on. Changing any of them leads to a new entry,
+    and the least recently used entries are evicted when the cache grows above its maximal size.
+    """
+
+    def __init__(self, cache_dir: str = ARTIFACTS_CACHE_DIR, max_size: int = MAX_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._files_digests = {}
+
+    def _file_digest(self, path: str) -> str:
+        # the digest of a file is computed once per content version, as detected by its modification time and size
+        stat = (os.path.getmtime(path), os.path.getsize(path)) if os.path.isfile(path) else None
+        if path not in self._files_digests or self._files_digests[path][0] != stat:
+            self._files_digests[path] = (stat, file_digest(path))
+        return self._files_digests[path][1]
+
+    def key(self, name: str, config_keys: Iterable[str] = (), input_files: Iterable[str] = (),
+            code_files: Iterable[str] = (), dependencies: Iterable[str] = ()) -> str:
+        """
+        Computes the key of an artifact
+        :param name: name of the artifact kind, e.g. 'los'
+        :param config_keys: the config keys the artifact depends on
+        :param input_files: paths of the input files the artifact is derived from
+        :param code_files: paths of the source files computing the artifact, the code version
+        :param dependencies: keys of the artifacts it is derived from
+        :return: the key
+        """
+        sha1 = hashlib.sha1(name.encode())
+        sha1.update(get_run_config().get_hash(config_keys).encode())
+        for path in sorted(input_files):
+            sha1.update(f'{os.path.basename(path)}:{self._file_digest(path)}'.encode())
+        for path in sorted(code_files):
+            sha1.update(f'{os.path.basename(path)}:{self._file_digest(path)}'.encode())
+        for dependency in dependencies:
+            sha1.update(dependency.encode())
+        return f'{name}_{sha1.hexdigest()}'
+
+    def contains(self, key: str) -> bool:
+        return os.path.isdir(os.path.join(self.cache_dir, key))
+
+    def get_or_create(self, key: str, create: Callable[[], T],
+                      save: Callable[[T, str], None] = save_pickled,
+                      load: Callable[[str], T] = load_pickled) -> T:
+        """
+        Loads the artifact of the key, creating and saving it first on a miss. The artifact is written to a
+        temporary directory and renamed into place, so a reader never sees a partial artifact.
+        :param key: the artifact key
+        :param create: function computing the artifact
+        :param save: function saving the artifact into a directory
+        :param load: function loading the artifact from its directory
+        :return: the artifact
+        """
+        artifact_dir = os.path.join(self.cache_dir, key)
+        if os.path.isdir(artifact_dir):
+            self.hits += 1
+            os.utime(artifact_dir)
+            return load(artifact_dir)
+
+        self.misses += 1
+        artifact = create()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=f'.{key}.', dir=self.cache_dir)
+        try:
+            save(artifact, temp_dir)
+            os.replace(temp_dir, artifact_dir)
+        except OSError:
+            # another process saved the same artifact meanwhile
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if not os.path.isdir(artifact_dir):
+                raise
+        self.evict(keep=key)
+        return load(artifact_dir)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Removes the least recently used artifacts until the cache is not larger than its maximal size
+        :param keep: key of an artifact not to remove
+        """
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_dir() and not entry.name.startswith('.')]
+        sizes = {entry.name: directory_size(entry.path) for entry in entries}
+        total_size = sum(sizes.values())
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if total_size <= self.max_size:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total_size -= sizes[entry.name]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+_artifact_cache = None
+
+
+def get_artifact_cache() -> ArtifactCache:
+    global _artifact_cache
+    if _artifact_cache is None:
+        _artifact_cache = ArtifactCache()
+    return _artifact_cache
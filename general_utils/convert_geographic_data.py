@@ -0,0 +1,29 @@
+import os
+import argparse
+
+from tqdm import tqdm
+
+from algo_config.algo_config import RunConfig
+from dir_definitions import BENCHMARK_DIR
+from general_utils.geo_data_retriever import convert_geographic_data_to_layer, GeographicType
+
+benchmark_files = [os.path.join(BENCHMARK_DIR, file)
+                   for file in os.listdir(BENCHMARK_DIR) if file.endswith('.yaml')]
+
+if __name__ == "__main__":
+    # converts the buildings and roads json files of the benchmarks areas to the columnar layer format
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-scenarios", help="scenarios to run", nargs="+", type=int)
+    args = parser.parse_args()
+
+    if args.scenarios is not None:
+        benchmark_files = [os.path.join(BENCHMARK_DIR, f"benchmark_{file}.yaml") for file in args.scenarios]
+    else:
+        benchmark_files = sorted(benchmark_files)
+
+    areas_names = {str(RunConfig.from_file(os.path.join(BENCHMARK_DIR, benchmark_file)).get_value('area_name'))
+                   for benchmark_file in benchmark_files}
+
+    for area_name in tqdm(sorted(areas_names)):
+        for geo_type in GeographicType:
+            convert_geographic_data_to_layer(area_name, geo_type)
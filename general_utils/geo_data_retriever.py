@@ -1,5 +1,7 @@
 import json
 import os
+import shutil
+import tempfile
 from enum import Enum
 from pathlib import Path
 from typing import Tuple, Dict, List
@@ -7,7 +9,12 @@ from typing import Tuple, Dict, List
 import requests
 
 from dir_definitions import RESOURCES_DIR
+from general_utils.artifact_cache import file_digest
 from models.bounding_box import BoundingBox
+from models.geo_layer import GeoLayer
+
+# the modification time, size and digest of the json file a layer was converted from, saved with the layer
+SOURCE_STAMP_FILE_NAME = 'source_stamp.json'
 
 
 class GeographicType(Enum):
@@ -96,9 +103,10 @@ def save_geographic_data(data: List[List[Tuple]], area_name: str, geo_type: Geog
     dir_path = os.path.join(RESOURCES_DIR, geo_type.get_entities_name())
     Path(dir_path).mkdir(parents=True, exist_ok=True)
 
-    file_path = os.path.join(dir_path, f'{geo_type.get_entities_name()}_{area_name}.json')
-    with open(file_path, "w") as f:
+    data_path = get_geographic_data_path(area_name, geo_type)
+    with open(f'{data_path}.json', "w") as f:
         json.dump(data, f)
+    _save_layer(GeoLayer.from_lists(data), data_path, _source_stamp(f'{data_path}.json'))
 
 
 def load_geographic_data(filename: str) -> List[List[Tuple]]:
@@ -111,6 +119,107 @@ def load_geographic_data(filename: str) -> List[List[Tuple]]:
         return json.load(f)
 
 
+def get_geographic_data_path(area_name: str, geo_type: GeographicType) -> str:
+    """Returns the path of the json file of the geographic data, without the extension. The columnar layer of the
+    same data is saved in a directory of the same name
+
+    :param area_name: area name
+    :param geo_type: geographic type of the data
+    :return: the path
+    """
+    return os.path.join(RESOURCES_DIR, geo_type.get_entities_name(), f'{geo_type.get_entities_name()}_{area_name}')
+
+
+def _source_stamp(json_path: str) -> Dict:
+    """
+    :return: the modification time, size and digest of the json file
+    """
+    return {"mtime": os.path.getmtime(json_path), "size": os.path.getsize(json_path), "digest": file_digest(json_path)}
+
+
+def _write_source_stamp(directory: str, source_stamp: Dict) -> None:
+    # written to a temporary file and renamed into place, so that a reader never sees a partial stamp
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{SOURCE_STAMP_FILE_NAME}.', dir=directory)
+    with os.fdopen(fd, "w") as f:
+        json.dump(source_stamp, f)
+    os.replace(temp_path, os.path.join(directory, SOURCE_STAMP_FILE_NAME))
+
+
+def _save_layer(layer: GeoLayer, layer_dir: str, source_stamp: Dict, overwrite: bool = True) -> None:
+    """Saves the layer to a temporary directory and renames it into place, so that processes loading the layer
+    concurrently never see a partial layer
+
+    :param layer: the layer
+    :param layer_dir: the layer directory
+    :param source_stamp: the stamp of the json file the layer was converted from
+    :param overwrite: replace an existing layer, otherwise the existing layer is kept
+    """
+    temp_dir = tempfile.mkdtemp(prefix=f'.{os.path.basename(layer_dir)}.', dir=os.path.dirname(layer_dir))
+    try:
+        layer.save(temp_dir)
+        _write_source_stamp(temp_dir, source_stamp)
+        if overwrite and os.path.isdir(layer_dir):
+            shutil.rmtree(layer_dir)
+        os.replace(temp_dir, layer_dir)
+    except OSError:
+        # another process saved the layer meanwhile
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if not os.path.isdir(layer_dir):
+            raise
+
+
+def convert_geographic_data_to_layer(area_name: str, geo_type: GeographicType, overwrite: bool = True) -> None:
+    """Converts the geographic data json file to the columnar layer format
+
+    :param area_name: area name
+    :param geo_type: geographic type of data to convert
+    :param overwrite: replace an existing layer, otherwise the existing layer is kept
+    :return: none
+    """
+    data_path = get_geographic_data_path(area_name, geo_type)
+    # stamped before reading, so a json file changing meanwhile is converted again on the next load
+    source_stamp = _source_stamp(f'{data_path}.json')
+    _save_layer(GeoLayer.from_lists(load_geographic_data(f'{data_path}.json')), data_path, source_stamp, overwrite)
+
+
+def _is_layer_stale(layer_dir: str) -> bool:
+    """
+    Checks whether the json file changed since the layer was converted from it. The json file is hashed only when
+    its modification time or size differ from the stamped ones, and the stamp is refreshed if the content is the same
+    :param layer_dir: the layer directory, next to the json file
+    :return: bool
+    """
+    stamp_path = os.path.join(layer_dir, SOURCE_STAMP_FILE_NAME)
+    if not os.path.isfile(stamp_path):
+        return True
+    with open(stamp_path) as f:
+        source_stamp = json.load(f)
+    json_path = f'{layer_dir}.json'
+    if (os.path.getmtime(json_path), os.path.getsize(json_path)) == (source_stamp["mtime"], source_stamp["size"]):
+        return False
+    current_stamp = _source_stamp(json_path)
+    if current_stamp["digest"] != source_stamp["digest"]:
+        return True
+    _write_source_stamp(layer_dir, current_stamp)
+    return False
+
+
+def load_geographic_layer(area_name: str, geo_type: GeographicType) -> GeoLayer:
+    """Loads the geographic data as a memory-mapped columnar layer. Converts the json file on first use, and again
+    whenever the json file changed since the layer was converted from it
+
+    :param area_name: area name
+    :param geo_type: geographic type of data to load
+    :return: the layer of the geographic data
+    """
+    layer_dir = get_geographic_data_path(area_name, geo_type)
+    if not os.path.isdir(layer_dir):
+        convert_geographic_data_to_layer(area_name, geo_type, overwrite=False)
+    elif os.path.isfile(f'{layer_dir}.json') and _is_layer_stale(layer_dir):
+        convert_geographic_data_to_layer(area_name, geo_type, overwrite=True)
+    return GeoLayer.load(layer_dir)
+
+
 def load_bounds(filename: str) -> BoundingBox:
     """Loads bounds from config file
 
@@ -1,5 +1,5 @@
 import math
-from typing import Tuple
+from typing import Tuple, Union
 
 import numpy as np
 
@@ -44,25 +44,43 @@ def distance_approx(first_coordinate_in_rad: np.ndarray, second_coordinate_in_ra
     return np.sqrt(np.power(dx, 2) + np.power(dy, 2)) * 1609.34
 
 
+def pairwise_distances(first_coordinates_in_rad: np.ndarray, second_coordinates_in_rad: np.ndarray) -> np.ndarray:
+    """Calculates distances between every pair of coordinates of two sets
+
+    :param first_coordinates_in_rad: 2D numpy array of n coordinates in radians
+    :param second_coordinates_in_rad: 2D numpy array of m coordinates in radians
+    :return: 2D numpy array (n, m) of distances in meters
+    """
+    p1 = first_coordinates_in_rad.reshape(-1, 1, 2)
+    p2 = second_coordinates_in_rad.reshape(1, -1, 2)
+    d_lat = p2[..., 0] - p1[..., 0]
+    d_lon = p2[..., 1] - p1[..., 1]
+
+    a = np.sin(d_lat / 2) ** 2 + np.cos(p1[..., 0]) * np.cos(p2[..., 0]) * np.sin(d_lon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_IN_KM * METERS_PER_KM * c
+
+
 def destination_coord_from_start_coord_and_angle(start_in_rad: np.ndarray,
-                                                 angle_in_radians: float,
-                                                 distance_in_meters: float) -> np.ndarray:
-    """Calculates a coordinate from a start coordinate, an angle and a distance
+                                                 angle_in_radians: Union[float, np.ndarray],
+                                                 distance_in_meters: Union[float, np.ndarray]) -> np.ndarray:
+    """Calculates a coordinate from a start coordinate, an angle and a distance.
+    Start coordinates, angles and distances are broadcast against each other.
 
     :param start_in_rad: start coordinate/s in radians (2D numpy array)
-    :param angle_in_radians: angle of destination coordinate in radians (clockwise, north is zero)
-    :param distance_in_meters: distance of destination point in meters
+    :param angle_in_radians: angle/s of destination coordinate in radians (clockwise, north is zero)
+    :param distance_in_meters: distance/s of destination point in meters
     :return: destination coordinate/s in radians (2D numpy array)
     """
-    distance_in_km = distance_in_meters / METERS_PER_KM
     start_in_rad = start_in_rad.reshape(-1, 2)
-    dist = np.zeros(start_in_rad.shape)
-    dist[:, 0] = np.arcsin(np.sin(start_in_rad[:, 0]) * np.cos(distance_in_km / EARTH_RADIUS_IN_KM) +
-                           np.cos(start_in_rad[:, 0]) * np.sin(distance_in_km / EARTH_RADIUS_IN_KM) *
-                           np.cos(angle_in_radians))
-    dist[:, 1] = start_in_rad[:, 1] + np.arctan2(
-        np.sin(angle_in_radians) * np.sin(distance_in_km / EARTH_RADIUS_IN_KM) * np.cos(start_in_rad[:, 0]),
-        np.cos(distance_in_km / EARTH_RADIUS_IN_KM) - np.sin(start_in_rad[:, 0]) * np.sin(dist[:, 0]))
+    lat, angle, delta = np.broadcast_arrays(start_in_rad[:, 0], angle_in_radians,
+                                            np.asarray(distance_in_meters) / METERS_PER_KM / EARTH_RADIUS_IN_KM)
+    lon = np.broadcast_to(start_in_rad[:, 1], lat.shape)
+    dist = np.zeros((lat.size, 2))
+    dist[:, 0] = np.arcsin(np.sin(lat) * np.cos(delta) + np.cos(lat) * np.sin(delta) * np.cos(angle))
+    dist[:, 1] = lon + np.arctan2(np.sin(angle) * np.sin(delta) * np.cos(lat),
+                                  np.cos(delta) - np.sin(lat) * np.sin(dist[:, 0]))
     return dist
 
 
@@ -84,23 +102,23 @@ def circle_around_point(coordinate_in_rad: np.ndarray, radius_in_meters: float,
 def delta_east_and_north(point1: np.ndarray, point2: np.ndarray) -> Tuple[float, float]:
     """
     Calculates approximated difference in lat and lon in rad
-    :param point1: lat,lon in rad
-    :param point2: lat,lon in rad
+    :param point1: lat,lon in rad (or an array of such points)
+    :param point2: lat,lon in rad (or an array of such points)
     :return: lat,lon difference
     """
-    d_lat = np.rad2deg(point2[0] - point1[0])
-    d_lon = np.rad2deg(point2[1] - point1[1])
+    d_lat = np.rad2deg(point2[..., 0] - point1[..., 0])
+    d_lon = np.rad2deg(point2[..., 1] - point1[..., 1])
     d_north = 60 * d_lat
-    d_east = d_lon * 60 * np.cos((point2[0] + point1[0]) / 2)
+    d_east = d_lon * 60 * np.cos((point2[..., 0] + point1[..., 0]) / 2)
     return d_east * NM_TO_METERS, d_north * NM_TO_METERS
 
 
-def calculate_bearing(point1: np.ndarray, point2: np.ndarray) -> float:
+def calculate_bearing(point1: np.ndarray, point2: np.ndarray) -> Union[float, np.ndarray]:
     """
     Calculates the bearing, the degree between the vector from point1 to point2 and a unit vector directed at the north
-    :param point1: lat,lon in rad
-    :param point2: lat,lon in rad
-    :return: degree in radians
+    :param point1: lat,lon in rad (or an array of such points)
+    :param point2: lat,lon in rad (or an array of such points)
+    :return: degree/s in radians
     """
     d_east, d_north = delta_east_and_north(point1, point2)
     angle_in_radians = np.arctan2(d_east, d_north) % (2 * math.pi)
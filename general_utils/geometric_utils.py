@@ -1,8 +1,10 @@
 from typing import List, Dict
 
 import numpy as np
-from shapely.geometry import Point, Polygon, MultiPolygon
+from shapely.geometry import Point, Polygon, MultiPolygon, LineString, box
+from shapely.geometry.base import BaseGeometry
 from shapely.ops import cascaded_union
+from shapely.strtree import STRtree
 
 from general_utils.geographic_utils import circle_around_point
 from general_utils.python_utils import make_iterable
@@ -131,3 +133,65 @@ def is_circle_contained_completely(c1: np.ndarray, r1: float, c2: np.ndarray, r2
     :return: true iff circle 1 in completely inside circle 2
     """
     return np.linalg.norm(c1 - c2) + r1 <= r2
+
+
+def first_boundary_intersections(lines: List[np.ndarray], boundary: BaseGeometry) -> np.ndarray:
+    """Finds for every line its first intersection point with the boundary, all the lines at once. The boundary
+    segments are indexed in an STR tree, and the segments of every line are intersected only with the boundary
+    segments whose bounding box intersects the bounding box of the line, so the memory grows with the number of
+    nearby segment pairs rather than with all of them
+
+    :param lines: list of 2D numpy arrays, the coordinates of every line
+    :param boundary: the boundary, a linestring or a multilinestring (e.g. the boundary of a polygon)
+    :return: 2D numpy array (lines, 2) of the first intersection point along every line, nan if there is none
+    """
+    first_points = np.full((len(lines), 2), np.nan)
+    if len(lines) == 0 or boundary.is_empty:
+        return first_points
+
+    # all the segments of the lines, and the position of each along its line
+    lines_starts = np.vstack([line[:-1] for line in lines])
+    lines_ends = np.vstack([line[1:] for line in lines])
+    lines_ids = np.repeat(np.arange(len(lines)), [len(line) - 1 for line in lines])
+    segments_ids = np.concatenate([np.arange(len(line) - 1) for line in lines])
+    lines_offsets = np.concatenate([[0], np.cumsum([len(line) - 1 for line in lines])])
+
+    # all the segments of the boundary, indexed by their bounding boxes
+    rings = [np.array(ring.coords) for ring in make_iterable(boundary)]
+    boundary_starts = np.vstack([ring[:-1] for ring in rings])
+    boundary_ends = np.vstack([ring[1:] for ring in rings])
+    boundary_segments = [LineString([start, end]) for start, end in zip(boundary_starts, boundary_ends)]
+    boundary_segments_ids = {id(segment): i for i, segment in enumerate(boundary_segments)}
+    tree = STRtree(boundary_segments)
+
+    # the pairs of a line segment and a boundary segment near its line
+    pairs_segments, pairs_boundary_segments = [], []
+    for line_id, line in enumerate(lines):
+        candidates = [boundary_segments_ids[id(segment)]
+                      for segment in tree.query(box(*line.min(axis=0), *line.max(axis=0)))]
+        line_segments = np.arange(lines_offsets[line_id], lines_offsets[line_id + 1])
+        pairs_segments.append(np.repeat(line_segments, len(candidates)))
+        pairs_boundary_segments.append(np.tile(np.array(candidates, dtype=np.int64), len(line_segments)))
+    segments = np.concatenate(pairs_segments)
+    boundary_segments = np.concatenate(pairs_boundary_segments)
+
+    # segments p + t * r and q + u * s intersect if 0 <= t, u <= 1
+    r = lines_ends[segments] - lines_starts[segments]
+    s = boundary_ends[boundary_segments] - boundary_starts[boundary_segments]
+    qp = boundary_starts[boundary_segments] - lines_starts[segments]
+    denominator = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+    parallel = denominator == 0
+    denominator = np.where(parallel, 1, denominator)
+    t = (qp[:, 0] * s[:, 1] - qp[:, 1] * s[:, 0]) / denominator
+    u = (qp[:, 0] * r[:, 1] - qp[:, 1] * r[:, 0]) / denominator
+    intersects = ~parallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+
+    # the first intersection along every line is the one with the smallest segment index and t
+    segments, t, r = segments[intersects], t[intersects], r[intersects]
+    if len(segments) == 0:
+        return first_points
+    positions = segments_ids[segments] + t
+    order = np.lexsort((positions, lines_ids[segments]))
+    first = order[np.r_[True, np.diff(lines_ids[segments][order]) != 0]]
+    first_points[lines_ids[segments[first]]] = lines_starts[segments[first]] + t[first, np.newaxis] * r[first]
+    return first_points
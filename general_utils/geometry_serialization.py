@@ -0,0 +1,121 @@
+from typing import Dict, List, NamedTuple, Sequence, Union
+
+import numpy as np
+from shapely.geometry import MultiPolygon, Polygon
+from shapely.geometry.base import BaseGeometry
+
+POLYGONS_ARRAYS = ('coords', 'rings_offsets', 'polygons_offsets', 'parts_offsets')
+
+
+class RaggedMultiPolygons(NamedTuple):
+    """
+    Sequence of multipolygons as flat arrays: all the rings coordinates (lat,lon) in one array, ring i is
+    coords[rings_offsets[i]:rings_offsets[i + 1]], the rings of polygon j are rings_offsets[polygons_offsets[j]:...]
+    (the exterior ring first, then the holes) and the polygons of multipolygon k are polygons_offsets[parts_offsets[k]:
+    parts_offsets[k + 1]].
+    """
+    coords: np.ndarray
+    rings_offsets: np.ndarray
+    polygons_offsets: np.ndarray
+    parts_offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.parts_offsets) - 1
+
+    @property
+    def n_polygons(self) -> int:
+        return len(self.polygons_offsets) - 1
+
+    def ring(self, ring_id: int) -> np.ndarray:
+        return self.coords[self.rings_offsets[ring_id]:self.rings_offsets[ring_id + 1]]
+
+    def exteriors(self) -> List[np.ndarray]:
+        """
+        :return: the exterior ring of every polygon, in all the multipolygons
+        """
+        return [self.ring(ring_id) for ring_id in self.polygons_offsets[:-1]]
+
+
+def polygons_of(geometry: BaseGeometry) -> List[Polygon]:
+    """
+    :return: the non-empty polygons of a polygon or a multipolygon
+    """
+    if geometry.is_empty:
+        return []
+    if isinstance(geometry, Polygon):
+        return [geometry]
+    if isinstance(geometry, MultiPolygon):
+        return list(geometry.geoms)
+    raise TypeError(f"Expected a polygon or a multipolygon, got {geometry.geom_type}")
+
+
+def multipolygons_to_ragged(geometries: Sequence[BaseGeometry]) -> RaggedMultiPolygons:
+    """
+    :param geometries: polygons or multipolygons
+    :return: the geometries as ragged arrays
+    """
+    parts = [polygons_of(geometry) for geometry in geometries]
+    rings = [np.asarray(ring.coords)[:, :2]
+             for polygons in parts for polygon in polygons for ring in [polygon.exterior, *polygon.interiors]]
+    n_rings = [1 + len(polygon.interiors) for polygons in parts for polygon in polygons]
+    return RaggedMultiPolygons(
+        coords=np.vstack(rings).astype(np.float64) if len(rings) > 0 else np.empty((0, 2)),
+        rings_offsets=np.concatenate([[0], np.cumsum([len(ring) for ring in rings])]).astype(np.int64),
+        polygons_offsets=np.concatenate([[0], np.cumsum(n_rings)]).astype(np.int64),
+        parts_offsets=np.concatenate([[0], np.cumsum([len(polygons) for polygons in parts])]).astype(np.int64))
+
+
+def ragged_to_multipolygons(ragged: RaggedMultiPolygons) -> List[MultiPolygon]:
+    """
+    Rebuilds the multipolygons from the ragged arrays, in one pass over the polygons
+    :param ragged: the ragged arrays
+    :return: list of multipolygons
+    """
+    coords = np.asarray(ragged.coords)
+    rings = np.split(coords, np.asarray(ragged.rings_offsets)[1:-1]) if len(ragged.rings_offsets) > 1 else []
+    polygons_offsets = np.asarray(ragged.polygons_offsets)
+    polygons = [Polygon(rings[start], rings[start + 1:end])
+                for start, end in zip(polygons_offsets[:-1], polygons_offsets[1:])]
+    parts_offsets = np.asarray(ragged.parts_offsets)
+    return [MultiPolygon(polygons[start:end]) for start, end in zip(parts_offsets[:-1], parts_offsets[1:])]
+
+
+def save_multipolygons(path: str, geometries: Dict[str, Sequence[BaseGeometry]],
+                       **arrays: np.ndarray) -> None:
+    """
+    Saves named sequences of polygons or multipolygons as ragged arrays in a single .npz file
+    :param path: path of the .npz file
+    :param geometries: the sequences of geometries by name
+    :param arrays: additional arrays to save in the file
+    """
+    file_arrays = dict(arrays)
+    for name, named_geometries in geometries.items():
+        ragged = multipolygons_to_ragged(named_geometries)
+        file_arrays.update({f'{name}_{array}': getattr(ragged, array) for array in POLYGONS_ARRAYS})
+    with open(path, 'wb') as f:
+        np.savez(f, **file_arrays)
+
+
+def load_multipolygons(path: str, names: Sequence[str],
+                       as_arrays: bool = False) -> Dict[str, Union[List[MultiPolygon], RaggedMultiPolygons]]:
+    """
+    Loads named sequences of multipolygons saved by save_multipolygons
+    :param path: path of the .npz file
+    :param names: the names of the sequences
+    :param as_arrays: return the ragged arrays, without creating the shapely objects
+    :return: the multipolygons (or the ragged arrays) by name
+    """
+    with np.load(path) as file_arrays:
+        raggeds = {name: RaggedMultiPolygons(*[file_arrays[f'{name}_{array}'] for array in POLYGONS_ARRAYS])
+                   for name in names}
+    if as_arrays:
+        return raggeds
+    return {name: ragged_to_multipolygons(ragged) for name, ragged in raggeds.items()}
+
+
+def load_arrays(path: str, names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Loads the additional arrays saved by save_multipolygons
+    """
+    with np.load(path) as file_arrays:
+        return {name: file_arrays[name] for name in names}
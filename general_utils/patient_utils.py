@@ -2,7 +2,7 @@ from typing import Tuple
 
 from shapely.geometry import Polygon, MultiPolygon
 
-from algo_config.algo_config import AlgorithmConfig
+from algo_config.algo_config import get_run_config
 from general_utils.geometric_utils import create_buffered_polygon_around_coord
 from models.scenario import Scenario
 from noise_heralds.villages.village_outliner import get_villages_outline
@@ -15,7 +15,7 @@ def get_no_entrance_polygon(scenario: Scenario) -> Polygon:
     :return: no entrance polygon
     """
     no_entrance_polygon = create_buffered_polygon_around_coord(scenario.patient.location,
-                                                               AlgorithmConfig().get_value('no_entrance_polygon_ratio')
+                                                               get_run_config().get_value('no_entrance_polygon_ratio')
                                                                * scenario.patient.effective_radius)
     return no_entrance_polygon
 
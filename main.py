@@ -1,26 +1,92 @@
 import argparse
 import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
 
 from tqdm import tqdm
 
-from algo_config.algo_config import AlgorithmConfig
+from algo_config.algo_config import RunConfig, bind_config
 from dir_definitions import BENCHMARK_DIR
-from general_utils.patient_utils import get_patient_filtered_polygons
-from models.scenario import Scenario
+from pipeline.engine import PipelineResult, DEFAULT_WORKERS, format_timings
+from pipeline.stages import HERALDS_PIPELINE
 
-from noise_heralds.make_noise.core import place_heralds_main
-from noise_heralds.segment import read_segmented_areas, SegmentedAreas
-from roads_heralds.block_roads.core import block_roads
-from roads_heralds.convert_roads_to_networks import read_network_graph
-from visualization.visualizer import draw
+FULL_SOLUTION_STAGES = ('heralds', 'full_figure')
 
 benchmark_files = [os.path.join(BENCHMARK_DIR, file)
                    for file in os.listdir(BENCHMARK_DIR) if file.endswith('.yaml')]
 
+
+def run_scenario(config: RunConfig, stage_workers: int = DEFAULT_WORKERS) -> PipelineResult:
+    """Runs the full solution of one scenario and draws it, with the config bound to the current context
+
+    :param config: the scenario config
+    :param stage_workers: number of stages running at once
+    :return: the stages outputs, the heralds of the solution among them, and their timings
+    """
+    with bind_config(config):
+        return HERALDS_PIPELINE.run(FULL_SOLUTION_STAGES, workers=stage_workers)
+
+
+def run_benchmark(benchmark_file: str, stage_workers: int = DEFAULT_WORKERS) -> Dict:
+    """Runs the scenario of a benchmark file, catching its failure. Every scenario loads its own config, so it can
+    run in a worker process; the area inputs and the cached artifacts are memory-mapped from the disk there.
+
+    :param benchmark_file: path of the benchmark yaml file
+    :param stage_workers: number of stages running at once
+    :return: the scenario result - its name, status, run time in seconds, and heralds count and stages timings or
+    error
+    """
+    name = os.path.splitext(os.path.basename(benchmark_file))[0].replace("benchmark_", "")
+    start_time = time.perf_counter()
+    try:
+        outputs, timings = run_scenario(RunConfig.from_file(benchmark_file), stage_workers)
+        result = {"status": "ok", "heralds": len(outputs["heralds"]), "timings": timings}
+    except Exception:
+        result = {"status": "failed", "error": traceback.format_exc()}
+    return {"name": name, "seconds": time.perf_counter() - start_time, **result}
+
+
+def run_benchmarks(benchmark_files: List[str], workers: int = 1, stage_workers: int = DEFAULT_WORKERS) -> List[Dict]:
+    """Runs the scenarios of the benchmark files, in a pool of worker processes if more than one worker is given
+
+    :param benchmark_files: paths of the benchmark yaml files
+    :param workers: number of worker processes
+    :param stage_workers: number of stages of a scenario running at once
+    :return: the scenarios results, in the order of the files
+    """
+    if workers <= 1:
+        return [run_benchmark(benchmark_file, stage_workers) for benchmark_file in tqdm(benchmark_files)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_benchmark, benchmark_file, stage_workers): i
+                   for i, benchmark_file in enumerate(benchmark_files)}
+        results = [None] * len(benchmark_files)
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            results[futures[future]] = future.result()
+    return results
+
+
+def print_summary(results: List[Dict], wall_seconds: float) -> None:
+    """Prints the status, run time and heralds count of every scenario, and the errors of the failed ones"""
+    for result in results:
+        details = f'{result["heralds"]} heralds ({format_timings(result["timings"])})' \
+            if result["status"] == "ok" else 'see error below'
+        print(f'{result["name"]:>10} {result["status"]:>7} {result["seconds"]:8.2f}s  {details}')
+    failed = [result for result in results if result["status"] != "ok"]
+    print(f'{len(results) - len(failed)}/{len(results)} scenarios succeeded, '
+          f'{sum(result["seconds"] for result in results):.2f}s total scenarios time, {wall_seconds:.2f}s wall time')
+    for result in failed:
+        print(f'\nscenario {result["name"]} failed:\n{result["error"]}')
+
+
 if __name__ == "__main__":
-    alg_config = AlgorithmConfig()
     parser = argparse.ArgumentParser()
     parser.add_argument("-scenarios", help="scenarios to run", nargs="+", type=int)
+    parser.add_argument("--workers", help="number of worker processes running scenarios", type=int, default=1)
+    parser.add_argument("--stage-workers", help="number of stages of a scenario running at once", type=int,
+                        default=DEFAULT_WORKERS)
     args = parser.parse_args()
 
     if args.scenarios is not None:
@@ -28,30 +94,7 @@ if __name__ == "__main__":
     else:
         benchmark_files = sorted(benchmark_files)
 
-    for benchmark_file in tqdm(benchmark_files):
-        alg_config.load_config(os.path.join(BENCHMARK_DIR, benchmark_file))
-        scenario = Scenario(heralds=None)
-
-        # calculate patient's contagion and effective polygons
-        patient_contagion_polygon, patient_effective_polygon = get_patient_filtered_polygons(scenario)
-
-        # read the segmented areas (villages and LOS map)
-        seg_areas: SegmentedAreas = read_segmented_areas()
-
-        # load the roads graph
-        G = read_network_graph()
-
-        # calculate noise heralds locations
-        noise_output = place_heralds_main(seg_areas)
-
-        # calculate roads heralds locations
-        blocks_output = block_roads(G, seg_areas.villages, patient_effective_polygon)
-
-        # draw the solution
-        draw(scenario=scenario,
-             seg_areas=seg_areas,
-             patient_contagion_polygon=patient_contagion_polygon,
-             patient_effective_polygon=patient_effective_polygon,
-             blocks_output=blocks_output,
-             noise_output=noise_output,
-             to_file=f'full/{alg_config.get_name()}')
+    start_time = time.perf_counter()
+    results = run_benchmarks([os.path.join(BENCHMARK_DIR, file) for file in benchmark_files], args.workers,
+                             args.stage_workers)
+    print_summary(results, time.perf_counter() - start_time)
@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple, Any
+
+from algo_config.algo_config import RunConfig, get_run_config
+from dir_definitions import BOUNDS_DIR
+from general_utils.geo_data_retriever import load_bounds, load_geographic_layer, GeographicType
+from models.bounding_box import BoundingBox
+from models.geo_layer import GeoLayer
+
+# the config values the area inputs and the area-level artifacts depend on, any other value is per scenario
+AREA_CONFIG_KEYS = ('area_name', 'grid_size', 'villages_radius', 'villages_resolution', 'village_min_buildings',
+                    'intersection_points_distance_threshold', 'roads_noding')
+MAX_RESIDENT_AREAS = 4
+
+
+class AreaContext:
+    """
+    The inputs of one area, loaded once and shared by all the stages and scenarios of the area: the bounding box and
+    the buildings and roads layers (memory-mapped, read only). Other area-level objects can be memoized on it too.
+    """
+
+    def __init__(self, area_name: str):
+        self._area_name = area_name
+        self._bbox = load_bounds(os.path.join(BOUNDS_DIR, f'bounds_{area_name}.json'))
+        self._buildings = load_geographic_layer(area_name, GeographicType.BUILDING)
+        self._roads = load_geographic_layer(area_name, GeographicType.ROAD)
+        self._memoized = {}
+        self._lock = threading.Lock()
+        self._names_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def area_name(self) -> str:
+        return self._area_name
+
+    @property
+    def bbox(self) -> BoundingBox:
+        return self._bbox
+
+    @property
+    def buildings(self) -> GeoLayer:
+        return self._buildings
+
+    @property
+    def roads(self) -> GeoLayer:
+        return self._roads
+
+    def memoize(self, name: str, create: Callable[[], Any]) -> Any:
+        """
+        Returns the area-level object of the given name, creating it on first use
+        :param name: name of the object
+        :param create: function creating the object
+        :return: the object
+        """
+        # every object is created under its own lock, so creating one object does not block using the others
+        with self._lock:
+            name_lock = self._names_locks.setdefault(name, threading.Lock())
+        with name_lock:
+            if name not in self._memoized:
+                self._memoized[name] = create()
+            return self._memoized[name]
+
+
+_area_contexts: Dict[Tuple[str, str], AreaContext] = OrderedDict()
+_area_contexts_lock = threading.Lock()
+_max_resident_areas = MAX_RESIDENT_AREAS
+
+
+def set_max_resident_areas(max_resident_areas: int) -> None:
+    """
+    Sets how many areas stay resident, e.g. to keep all the areas served by a long-running process
+    :param max_resident_areas: the maximal number of resident areas
+    """
+    global _max_resident_areas
+    with _area_contexts_lock:
+        _max_resident_areas = max_resident_areas
+        while len(_area_contexts) > _max_resident_areas:
+            _area_contexts.popitem(last=False)
+
+
+def get_area_context(config: RunConfig = None) -> AreaContext:
+    """
+    Returns the context of the area of the config, keyed by the area name and the hash of the area config values.
+    Only the most recently used areas stay resident.
+    :param config: the run config, the config of the current context by default
+    :return: the area context
+    """
+    config = config if config is not None else get_run_config()
+    key = (str(config.get_value('area_name')), config.get_hash(AREA_CONFIG_KEYS))
+    with _area_contexts_lock:
+        if key in _area_contexts:
+            _area_contexts.move_to_end(key)
+        else:
+            _area_contexts[key] = AreaContext(key[0])
+            while len(_area_contexts) > _max_resident_areas:
+                _area_contexts.popitem(last=False)
+        return _area_contexts[key]
+
+
+def clear_area_contexts() -> None:
+    with _area_contexts_lock:
+        _area_contexts.clear()
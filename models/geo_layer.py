@@ -0,0 +1,92 @@
+import os
+from pathlib import Path
+from typing import List, Sequence, Iterator, Dict, Optional
+
+import numpy as np
+
+ATTRIBUTE_FILE_PREFIX = 'attribute_'
+
+
+class GeoLayer:
+    """
+    Compact layer of many geometries (roads or buildings) - one flat array of all the coordinates (lat,lon in
+    degrees) and the offsets of every geometry in it. Geometry i is coords[offsets[i]:offsets[i + 1]]. Optional
+    per-geometry attributes are kept as arrays of the layer length. All arrays are saved as .npy files and can be
+    memory-mapped on load.
+    """
+
+    def __init__(self, coords: np.ndarray, offsets: np.ndarray, attributes: Optional[Dict[str, np.ndarray]] = None):
+        self._coords = coords
+        self._offsets = offsets
+        self._attributes = attributes or {}
+
+    @classmethod
+    def from_lists(cls, geometries: Sequence[Sequence[Sequence[float]]]) -> 'GeoLayer':
+        """
+        :param geometries: list of geometries, each a list of points
+        :return: the layer
+        """
+        offsets = np.concatenate([[0], np.cumsum([len(geometry) for geometry in geometries])]).astype(np.int64)
+        coords = np.array([point for geometry in geometries for point in geometry], dtype=float).reshape(-1, 2)
+        return cls(coords, offsets)
+
+    @property
+    def coords(self) -> np.ndarray:
+        return self._coords
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets
+
+    @property
+    def attributes(self) -> Dict[str, np.ndarray]:
+        return self._attributes
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if i < 0:
+            i += len(self)
+        return self._coords[self._offsets[i]:self._offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def starts(self) -> np.ndarray:
+        """
+        :return: the indices of the first point of every geometry in the coords array
+        """
+        return self._offsets[:-1]
+
+    def ends(self) -> np.ndarray:
+        """
+        :return: the indices of the last point of every geometry in the coords array
+        """
+        return self._offsets[1:] - 1
+
+    def with_coords(self, coords: np.ndarray) -> 'GeoLayer':
+        """
+        :return: a new layer with the same geometries structure and the given coordinates
+        """
+        return GeoLayer(coords, self._offsets, self._attributes)
+
+    def to_lists(self) -> List[List[List[float]]]:
+        return [geometry.tolist() for geometry in self]
+
+    def save(self, layer_dir: str) -> None:
+        Path(layer_dir).mkdir(parents=True, exist_ok=True)
+        np.save(os.path.join(layer_dir, 'coords.npy'), np.asarray(self._coords, dtype=np.float64))
+        np.save(os.path.join(layer_dir, 'offsets.npy'), np.asarray(self._offsets, dtype=np.int64))
+        for name, values in self._attributes.items():
+            np.save(os.path.join(layer_dir, f'{ATTRIBUTE_FILE_PREFIX}{name}.npy'), values)
+
+    @classmethod
+    def load(cls, layer_dir: str, mmap_mode: Optional[str] = 'r') -> 'GeoLayer':
+        attributes = {file[len(ATTRIBUTE_FILE_PREFIX):-len('.npy')]:
+                      np.load(os.path.join(layer_dir, file), mmap_mode=mmap_mode)
+                      for file in sorted(os.listdir(layer_dir)) if file.startswith(ATTRIBUTE_FILE_PREFIX)}
+        return cls(np.load(os.path.join(layer_dir, 'coords.npy'), mmap_mode=mmap_mode),
+                   np.load(os.path.join(layer_dir, 'offsets.npy'), mmap_mode=mmap_mode),
+                   attributes)
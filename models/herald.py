@@ -1,7 +1,10 @@
 from enum import Enum
+from typing import List, Union, Dict
 
 import numpy as np
 
+from general_utils.geographic_utils import pairwise_distances
+
 
 class CharacterType(Enum):
     CHARISMATIC = 0
@@ -26,3 +29,108 @@ class Herald:
     @property
     def character(self) -> CharacterType:
         return self._character
+
+
+class HeraldSet:
+    """
+    Struct-of-arrays container of many heralds - parallel arrays of locations (lat,lon in degrees),
+    effective radii (meters) and CharacterType codes
+    """
+
+    def __init__(self, locations: np.ndarray, effective_radii: Union[float, np.ndarray],
+                 characters: Union[CharacterType, np.ndarray] = CharacterType.CHARISMATIC):
+        self._locations = np.asarray(locations, dtype=float).reshape(-1, 2)
+        n_heralds = len(self._locations)
+        if isinstance(characters, CharacterType):
+            characters = characters.value
+        self._effective_radii = np.broadcast_to(np.asarray(effective_radii, dtype=float), (n_heralds,)).copy()
+        self._characters = np.broadcast_to(np.asarray(characters, dtype=np.int8), (n_heralds,)).copy()
+
+    @classmethod
+    def empty(cls) -> 'HeraldSet':
+        return cls(np.empty((0, 2)), np.empty(0), np.empty(0, dtype=np.int8))
+
+    @classmethod
+    def from_heralds(cls, heralds: List[Herald]) -> 'HeraldSet':
+        if len(heralds) == 0:
+            return cls.empty()
+        return cls(np.array([herald.location for herald in heralds]).reshape(-1, 2),
+                   np.array([herald.effective_radius for herald in heralds]),
+                   np.array([herald.character.value for herald in heralds]))
+
+    @classmethod
+    def concatenate(cls, herald_sets: List['HeraldSet']) -> 'HeraldSet':
+        if len(herald_sets) == 0:
+            return cls.empty()
+        return cls(np.vstack([herald_set.locations for herald_set in herald_sets]),
+                   np.concatenate([herald_set.effective_radii for herald_set in herald_sets]),
+                   np.concatenate([herald_set.characters for herald_set in herald_sets]))
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __getitem__(self, index) -> 'HeraldSet':
+        # index can be anything numpy accepts - an int, a slice, a mask or an indices array
+        return HeraldSet(self._locations[index], self._effective_radii[index], self._characters[index])
+
+    @property
+    def locations(self) -> np.ndarray:
+        return self._locations
+
+    @property
+    def effective_radii(self) -> np.ndarray:
+        return self._effective_radii
+
+    @property
+    def characters(self) -> np.ndarray:
+        return self._characters
+
+    def herald(self, index: int) -> Herald:
+        return Herald(self._locations[index], float(self._effective_radii[index]),
+                      CharacterType(int(self._characters[index])))
+
+    def to_heralds(self) -> List[Herald]:
+        return [self.herald(i) for i in range(len(self))]
+
+    def distances_to(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates the distance of every herald to every point
+        :param points: 2D array of points in lat,lon
+        :return: 2D array (heralds, points) of distances in meters
+        """
+        return pairwise_distances(np.deg2rad(self._locations), np.deg2rad(points))
+
+    def covers(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates which points are inside the effective radius of every herald
+        :param points: 2D array of points in lat,lon
+        :return: 2D boolean array (heralds, points)
+        """
+        return self.distances_to(points) <= self._effective_radii[:, np.newaxis]
+
+    def covered(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates which points are inside the effective radius of at least one herald
+        :param points: 2D array of points in lat,lon
+        :return: boolean mask of the points
+        """
+        return np.any(self.covers(points), axis=0)
+
+    def to_dict(self) -> Dict[str, list]:
+        return {"locations": self._locations.tolist(),
+                "effective_radii": self._effective_radii.tolist(),
+                "characters": [CharacterType(int(code)).name for code in self._characters]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> 'HeraldSet':
+        return cls(np.array(data["locations"], dtype=float).reshape(-1, 2),
+                   np.array(data["effective_radii"], dtype=float),
+                   np.array([CharacterType[name].value for name in data["characters"]], dtype=np.int8))
+
+    def save(self, path: str) -> None:
+        np.savez(path, locations=self._locations, effective_radii=self._effective_radii, characters=self._characters)
+
+    @classmethod
+    def load(cls, path: str) -> 'HeraldSet':
+        with np.load(path) as data:
+            return cls(data["locations"], data["effective_radii"], data["characters"])
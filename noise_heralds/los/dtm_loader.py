@@ -1,7 +1,7 @@
 import json
 import math
 import os
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 import numpy as np
 
@@ -55,7 +55,8 @@ def _read_elevation_from_array(elevations: np.ndarray, lat, lon) -> int:
 
 
 def _open_hgt_file(filename: str) -> np.ndarray:
-    """Given a DTM file name returns a DTM numpy array
+    """Given a DTM file name returns a DTM numpy array, memory-mapped from the file so that only the read pages are
+    loaded, and are shared by all the processes reading the file
 
     :param filename: DTM file name
     :return: DTM numpy array
@@ -65,21 +66,45 @@ def _open_hgt_file(filename: str) -> np.ndarray:
 
     assert dim * dim * 2 == size, 'Invalid file size'
 
-    return np.fromfile(filename, np.dtype('>i2'), dim * dim).reshape((dim, dim))
+    return np.memmap(filename, np.dtype('>i2'), mode='r', shape=(dim, dim))
 
 
-def _get_file_name(lat, lon) -> Optional[str]:
-    """Returns the file name of the given coordinate. If it doesn't exist, returns none.
+def get_dtm_files(south: float, west: float, north: float, east: float) -> List[str]:
+    """Returns the paths of all the DTM files covering the bounds, whether they exist or not
+
+    :param south: south bound
+    :param west: west bound
+    :param north: north bound
+    :param east: east bound
+    :return: list of file paths
+    """
+    return [_get_file_path(lat, lon)
+            for lat in range(math.floor(south), math.floor(north) + 1)
+            for lon in range(math.floor(west), math.floor(east) + 1)]
+
+
+def _get_file_path(lat, lon) -> str:
+    """Returns the path of the DTM file of the given coordinate
 
     :param lat: latitude
     :param lon: longitude
-    :return: file name
+    :return: file path
     """
     ns = 'N' if lat >= 0 else 'S'
     ew = 'E' if lon >= 0 else 'W'
 
     hgt_file = "%(ns)s%(lat)02d%(ew)s%(lon)03d.hgt" % {'lat': abs(lat), 'lon': abs(lon), 'ns': ns, 'ew': ew}
-    hgt_file_path = os.path.join(DTM_DIR, hgt_file)
+    return os.path.join(DTM_DIR, hgt_file)
+
+
+def _get_file_name(lat, lon) -> Optional[str]:
+    """Returns the file name of the given coordinate. If it doesn't exist, returns none.
+
+    :param lat: latitude
+    :param lon: longitude
+    :return: file name
+    """
+    hgt_file_path = _get_file_path(lat, lon)
     if os.path.isfile(hgt_file_path):
         return hgt_file_path
     else:
@@ -1,17 +1,27 @@
 import os
 import pickle
+import warnings
 from typing import Tuple, List
 
 import numpy as np
 from shapely.geometry import MultiPolygon, Polygon
 
-from algo_config.algo_config import AlgorithmConfig
-from dir_definitions import LOS_DIR, BENCHMARK_DIR
+from algo_config.algo_config import RunConfig, bind_config, get_run_config
+from dir_definitions import LOS_DIR, BENCHMARK_DIR, BOUNDS_DIR
+from general_utils.artifact_cache import get_artifact_cache
+from general_utils.geometry_serialization import save_multipolygons, load_multipolygons
+from models.area_context import get_area_context
 from models.bounding_box import BoundingBox
 from models.scenario import Scenario
-from noise_heralds.los.dtm_loader import get_elevation
+from noise_heralds.los import los_utils, dtm_loader
+from noise_heralds.los.dtm_loader import get_elevation, get_dtm_files
 from noise_heralds.los.los_utils import find_los
 
+# the patient location is relative to the bounds of the area, so the location keys are enough
+LOS_CONFIG_KEYS = ('area_name', 'grid_size', 'patient_location_type', 'patient_location_south',
+                   'patient_location_west')
+LOS_FILE_NAME = 'los.npz'
+
 
 def evaluate_grid_cells_centers(bounds: BoundingBox, grid_size: int) -> np.ndarray:
     """Returns the centers of all grid cells
@@ -54,6 +64,17 @@ def transform_coords_geo_to_grid(grid_size: int, bounds: BoundingBox, coords: np
     return np.vstack((x, y)).T
 
 
+def patient_grid_cell() -> Tuple[int, int]:
+    """
+    :return: the cell of the LOS grid the patient of the current config stands in. The LOS depends on the patient
+    location only through this cell
+    """
+    grid_size = get_run_config().get_value('grid_size')
+    scenario = Scenario(heralds=None)
+    cell = transform_coords_geo_to_grid(grid_size, scenario.bbox, scenario.patient.location).reshape(2).astype(int)
+    return int(cell[0]), int(cell[1])
+
+
 def generate_los_grid(patient_height: int, above_surface_height: int):
     """Creates a line-of-sight grid
     :param bounds: scenario bbox
@@ -62,12 +83,11 @@ def generate_los_grid(patient_height: int, above_surface_height: int):
     :param above_surface_height: height agl from which we check if there's a LOS to the patient (in meters)
     :return: binary grid which states whether there's a LOS to the patient
     """
-    grid_size = AlgorithmConfig().get_value('grid_size')
-    scenario = Scenario(heralds=None)
-    bounds = scenario.bbox
-    patient_loc = scenario.patient.location
-    elevations = generate_elevation_grid(bounds, grid_size)
-    patient_coord_in_grid = transform_coords_geo_to_grid(grid_size, bounds, patient_loc).reshape(2).astype(int)
+    grid_size = get_run_config().get_value('grid_size')
+    bounds = Scenario(heralds=None).bbox
+    # the elevation grid does not depend on the patient, it is read once per area
+    elevations = get_area_context().memoize('elevation_grid', lambda: generate_elevation_grid(bounds, grid_size))
+    patient_coord_in_grid = np.array(patient_grid_cell())
     patient_elevation = elevations[patient_coord_in_grid[0], patient_coord_in_grid[1]]
     patient_xyz = np.hstack((patient_coord_in_grid, patient_elevation))
     vis = find_los(elevations, patient_xyz, patient_height, above_surface_height)
@@ -81,7 +101,7 @@ def binary_grid_to_multipolygons(vis: np.ndarray) -> Tuple[MultiPolygon, MultiPo
     :param vis: binary grid which states whether there's a LOS to the patient
     :return: a tuple which contains false polygons and true polygons
     """
-    grid_size = AlgorithmConfig().get_value('grid_size')
+    grid_size = get_run_config().get_value('grid_size')
     scenario = Scenario(heralds=None)
     bounds = scenario.bbox
     cells = evaluate_grid_cells_centers(bounds, grid_size)
@@ -99,40 +119,73 @@ def binary_grid_to_multipolygons(vis: np.ndarray) -> Tuple[MultiPolygon, MultiPo
     return MultiPolygon(polygons[0]).buffer(0), MultiPolygon(polygons[1]).buffer(0)
 
 
-def save_los(mp: Tuple[MultiPolygon, MultiPolygon]) -> None:
-    """Saves true and false multipolygons to a file
-    :param mp: tuple of multipolygons representing the LOS
+def los_artifact_key() -> str:
     """
-    if not os.path.isdir(LOS_DIR):
-        os.mkdir(LOS_DIR)
-
-    with open(os.path.join(LOS_DIR, f'los_mp_{AlgorithmConfig().get_name()}.pkl'), 'wb') as f:
-        pickle.dump(mp, f)
+    :return: the key of the LOS of the current config in the artifact cache
+    """
+    area_name = get_run_config().get_value('area_name')
+    bounds = Scenario(heralds=None).bbox
+    input_files = [os.path.join(BOUNDS_DIR, f'bounds_{area_name}.json')] + get_dtm_files(*bounds.as_tuple())
+    return get_artifact_cache().key('los',
+                                    config_keys=LOS_CONFIG_KEYS,
+                                    input_files=input_files,
+                                    code_files=[__file__, los_utils.__file__, dtm_loader.__file__])
 
 
-def create_los():
+def create_los() -> Tuple[MultiPolygon, MultiPolygon]:
     """
-    Creates the LOS if no such file exists
+    Calculates the LOS multipolygons
     """
     los = generate_los_grid(50, 5)
-    mp = binary_grid_to_multipolygons(los)
-    save_los(mp)
+    return binary_grid_to_multipolygons(los)
 
 
-def get_los() -> Tuple[MultiPolygon, MultiPolygon]:
-    """Reads true and false multipolygons from a file
+def save_los(los: Tuple[MultiPolygon, MultiPolygon], artifact_dir: str) -> None:
+    save_multipolygons(os.path.join(artifact_dir, LOS_FILE_NAME), {'los': los})
+
+
+def load_los(artifact_dir: str) -> Tuple[MultiPolygon, MultiPolygon]:
+    return tuple(load_multipolygons(os.path.join(artifact_dir, LOS_FILE_NAME), ['los'])['los'])
+
+
+def get_missing_dtm_files() -> List[str]:
+    """
+    :return: the paths of the DTM files needed for the LOS of the current config which do not exist
+    """
+    bounds = Scenario(heralds=None).bbox
+    return [path for path in get_dtm_files(*bounds.as_tuple()) if not os.path.isfile(path)]
+
+
+def load_legacy_los() -> Tuple[MultiPolygon, MultiPolygon]:
+    """
+    Reads the LOS saved by older versions for a benchmark. It was calculated for the LOS config values of the
+    benchmark YAML, so it is used only when the current config has the same ones
     :return: tuple of multipolygons representing the LOS
+    :raises FileNotFoundError: if there is no legacy LOS for the LOS config values of the current config
     """
-    los_path = os.path.join(LOS_DIR, f'los_mp_{AlgorithmConfig().get_name()}.pkl')
-    if not os.path.isfile(los_path):
-        create_los()
+    run_config = get_run_config()
+    legacy_los_path = os.path.join(LOS_DIR, f'los_mp_{run_config.get_name()}.pkl')
+    benchmark_config_path = os.path.join(BENCHMARK_DIR, f'{run_config.config_name}.yaml')
+    is_benchmark_los = os.path.isfile(legacy_los_path) and os.path.isfile(benchmark_config_path) and \
+        RunConfig.from_file(benchmark_config_path).get_hash(LOS_CONFIG_KEYS) == run_config.get_hash(LOS_CONFIG_KEYS)
+    if not is_benchmark_los:
+        raise FileNotFoundError(f"Missing DTM files to calculate the LOS: {get_missing_dtm_files()}")
+    warnings.warn(f"Missing DTM files to calculate the LOS, using {legacy_los_path}")
+    with open(legacy_los_path, 'rb') as f:
+        return pickle.load(f)
+
 
-    with open(los_path, 'rb') as f:
-        los: Tuple[MultiPolygon, MultiPolygon] = pickle.load(f)
-    return los
+def get_los() -> Tuple[MultiPolygon, MultiPolygon]:
+    """Reads true and false multipolygons from the artifact cache, calculating them if needed. Without the DTM files
+    the LOS can not be calculated, and the LOS saved by older versions for the benchmark is imported into the cache
+    instead, if the config has the LOS config values of the benchmark
+    :return: tuple of multipolygons representing the LOS
+    """
+    create = create_los if len(get_missing_dtm_files()) == 0 else load_legacy_los
+    return get_artifact_cache().get_or_create(los_artifact_key(), create, save=save_los, load=load_los)
 
 
 if __name__ == '__main__':
     for file in os.listdir(BENCHMARK_DIR):
-        AlgorithmConfig().load_config(os.path.join(BENCHMARK_DIR, file))
-        create_los()
+        with bind_config(RunConfig.from_file(os.path.join(BENCHMARK_DIR, file))):
+            get_los()
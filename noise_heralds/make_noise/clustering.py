@@ -1,19 +1,60 @@
 from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, List, NamedTuple
 
 import numpy as np
 from sklearn.cluster import AgglomerativeClustering
-import math
 from shapely.geometry import MultiLineString
 
-from algo_config.algo_config import AlgorithmConfig
+from algo_config.algo_config import get_run_config
 from general_utils.geometric_utils import create_buffered_polygon_around_coord
-from general_utils.math_utils import normalize_vector, angle_between
 import networkx as nx
 
 NORMAL_TO_CENTER_VECTOR_DEG = 45
 
 
+class BoundarySegments(NamedTuple):
+    """
+    The segments of the villages boundary, with their unit normals - they do not depend on the patient location
+    """
+    starts: np.ndarray
+    ends: np.ndarray
+    mids: np.ndarray
+    normals: np.ndarray
+
+
+def calculate_boundary_segments(villages_boundary: MultiLineString) -> BoundarySegments:
+    """
+    Splits the villages boundary to its segments
+    :param villages_boundary: villages boundary
+    :return: the boundary segments
+    """
+    edges_points = [np.array(edge) for edge in villages_boundary]
+    starts = np.concatenate([edge_points[:-1] for edge_points in edges_points]).reshape(-1, 2)
+    ends = np.concatenate([edge_points[1:] for edge_points in edges_points]).reshape(-1, 2)
+    edges_vecs = ends - starts
+    normals = np.stack([-edges_vecs[:, 1], edges_vecs[:, 0]], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        normals = normals / np.linalg.norm(normals, axis=1).reshape(-1, 1)
+    return BoundarySegments(starts=starts, ends=ends, mids=(ends + starts) / 2, normals=normals)
+
+
+def filter_front_points(patient_loc: np.ndarray, segments: BoundarySegments) -> np.ndarray:
+    """
+    Taking first and last point of every boundary segment whose normal creates a degree of
+    -NORMAL_TO_CENTER_VECTOR_DEG to NORMAL_TO_CENTER_VECTOR_DEG with the line that connects the center of the segment
+    to the patient
+    :param patient_loc: location of the patient in lat,lon
+    :param segments: the villages boundary segments
+    :return: all front points (points on edges directed towards the patient location)
+    """
+    mids_to_patient_vecs = patient_loc - segments.mids
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mids_to_patient_vecs = mids_to_patient_vecs / np.linalg.norm(mids_to_patient_vecs, axis=1).reshape(-1, 1)
+        cos_phi = np.clip(np.sum(segments.normals * mids_to_patient_vecs, axis=1), -1.0, 1.0)
+        is_front = np.degrees(np.arccos(cos_phi)) < NORMAL_TO_CENTER_VECTOR_DEG
+    return np.stack([segments.starts[is_front], segments.ends[is_front]], axis=1).reshape(-1, 2)
+
+
 def calculate_front_points(patient_loc: np.ndarray, villages_boundary: MultiLineString) -> np.ndarray:
     """
     Taking first and last point in an edge of the villages boundary if the edge's
@@ -23,21 +64,7 @@ def calculate_front_points(patient_loc: np.ndarray, villages_boundary: MultiLine
     :param villages_boundary: villages boundary
     :return: all front points (points on edges directed towards the patient location)
     """
-    front_points = []
-    for edge in villages_boundary:
-        edge_points = np.array(edge)
-        for point1, point2 in zip(edge_points[:-1], edge_points[1:]):
-            edge_vec = point2 - point1
-            edge_mid = (point2 + point1) / 2
-            normal_vec = normalize_vector(np.array([-edge_vec[1], edge_vec[0]]))
-            mid_edge_to_patient_vec = normalize_vector(patient_loc - edge_mid)
-            phi = math.degrees(angle_between(normal_vec, mid_edge_to_patient_vec))
-            if phi < NORMAL_TO_CENTER_VECTOR_DEG:
-                concat_points = np.concatenate([point1, point2]).reshape(2, 2)
-                front_points.extend(concat_points)
-
-    front_points = np.array(front_points)
-    return front_points
+    return filter_front_points(patient_loc, calculate_boundary_segments(villages_boundary))
 
 
 def cluster_front_points(front_points: np.ndarray) -> Dict[int, np.ndarray]:
@@ -48,7 +75,7 @@ def cluster_front_points(front_points: np.ndarray) -> Dict[int, np.ndarray]:
     """
     clusters_labels_dict = defaultdict(np.ndarray)
     clustering = AgglomerativeClustering(n_clusters=None,
-                                         distance_threshold=float(AlgorithmConfig().get_value(
+                                         distance_threshold=float(get_run_config().get_value(
                                              'front_points_distance_threshold')),
                                          compute_full_tree=True).fit(front_points)
 
@@ -79,7 +106,7 @@ def create_centers_graph(clusters_centers: Dict[int, np.ndarray]) -> nx.Graph:
     :param clusters_centers: a dict mapping cluster label to the relevant cluster center
     :return: a clusters centers graph
     """
-    noise_herald_effective_radius = AlgorithmConfig().get_value('noise_herald_effective_radius')
+    noise_herald_effective_radius = get_run_config().get_value('noise_herald_effective_radius')
     n_clusters = len(clusters_centers.keys())
     A = np.zeros([n_clusters, n_clusters])
     for i, (label, cluster_center) in enumerate(clusters_centers.items()):
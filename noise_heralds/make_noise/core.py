@@ -1,34 +1,42 @@
-import matplotlib.pyplot as plt
-from models.scenario import Scenario
-from noise_heralds.make_noise.clustering import calculate_front_points, cluster_front_points, \
-    calculate_clusters_centers, \
-    create_centers_graph, calculate_min_set_cover
-from noise_heralds.make_noise.post_process import push_centers_out_of_contagion_polygon, \
-    move_clusters_centers_towards_patient
-from noise_heralds.segment import SegmentedAreas
+from typing import Dict, Optional
 
+import numpy as np
 
-def place_heralds_main(seg_area: SegmentedAreas):
-    plt.figure(figsize=(12, 10))
+from algo_config.algo_config import get_run_config
+from models.herald import HeraldSet
+from models.patient import Patient
+from noise_heralds.make_noise.clustering import cluster_front_points, calculate_clusters_centers, \
+    create_centers_graph, calculate_min_set_cover, BoundarySegments, filter_front_points
+from noise_heralds.make_noise.local_search import CoverageState, refine_clusters_centers, MAX_STALLED_ITERATIONS
+from noise_heralds.make_noise.post_process import push_centers_out_of_contagion_polygon, \
+    move_clusters_centers_towards_patient
 
-    # assign the boundary and patient location to variables
-    villages_boundary = seg_area.villages.boundary
-    scenario = Scenario(heralds=None)
 
+def place_heralds(boundary_segments: BoundarySegments, patient: Patient) -> Dict:
+    """
+    Places the noise heralds of a patient. The villages boundary segments do not depend on the patient, so they can
+    be calculated once for many patients
+    :param boundary_segments: the villages boundary segments
+    :param patient: the patient
+    :return: the noise output - the filtered clusters centers and the heralds
+    """
     # calculate all front points (points directed at the patient)
-    front_points = calculate_front_points(scenario.patient.location, villages_boundary)
+    front_points = filter_front_points(patient.location, boundary_segments)
 
     # cluster the front points
     clusters_labels_dict = cluster_front_points(front_points)
 
     # calculate cluster centers from clusters
     clusters_centers = calculate_clusters_centers(clusters_labels_dict)
+    labels = list(clusters_centers.keys())
+    centers = np.array(list(clusters_centers.values())).reshape(-1, 2)
 
     # move the centers towards the patient location
-    move_clusters_centers_towards_patient(clusters_centers, scenario.patient.location)
+    centers = move_clusters_centers_towards_patient(centers, patient.location)
 
-    # move the centers towards the patient location
-    push_centers_out_of_contagion_polygon(clusters_centers, scenario)
+    # push the centers out of the patient's contagion polygon
+    centers = push_centers_out_of_contagion_polygon(centers, patient)
+    clusters_centers = dict(zip(labels, centers))
 
     # creates a clusters centers graph - an edge exists if the intersection is nonzero
     G = create_centers_graph(clusters_centers)
@@ -39,6 +47,58 @@ def place_heralds_main(seg_area: SegmentedAreas):
     # filter to the min set clusters
     filtered_clusters_centers = {label: clusters_centers[label] for label in min_set_labels}
 
-    noise_output = {"filtered_clusters_centers": filtered_clusters_centers}
+    # optionally refine the min set with a time-budgeted local search (fewer heralds, same coverage)
+    if get_run_config().get_value('noise_refinement_time_budget') > 0:
+        filtered_clusters_centers = refine_clusters_centers(filtered_clusters_centers, front_points, patient)
+
+    heralds = HeraldSet(np.array(list(filtered_clusters_centers.values())).reshape(-1, 2),
+                        get_run_config().get_value('noise_herald_effective_radius'))
+
+    noise_output = {"filtered_clusters_centers": filtered_clusters_centers,
+                    "heralds": heralds}
+
+    return noise_output
+
+
+def front_points_coverage(clusters_centers: Dict[int, np.ndarray], front_points: np.ndarray) -> float:
+    """
+    :param clusters_centers: a dict mapping label to the herald center
+    :param front_points: the front points of the patient
+    :return: the fraction of the front points covered by the heralds
+    """
+    if len(front_points) == 0:
+        return 1.0
+    centers = np.array(list(clusters_centers.values())).reshape(-1, 2)
+    state = CoverageState(centers, front_points, get_run_config().get_value('noise_herald_effective_radius'))
+    return float(np.mean(state.counts > 0))
+
+
+def place_heralds_from(front_points: np.ndarray, patient: Patient, previous_clusters_centers: Dict[int, np.ndarray],
+                       time_budget: Optional[float] = None,
+                       max_stalled_iterations: int = MAX_STALLED_ITERATIONS) -> Dict:
+    """
+    Places the noise heralds of a patient starting from the heralds placed for a close previous location, instead of
+    clustering the front points and solving the set cover again. The previous heralds are pushed out of the contagion
+    circle of the patient, and the local search keeps covered the front points they cover while dropping the
+    redundant heralds
+    :param front_points: the front points of the patient
+    :param patient: the patient
+    :param previous_clusters_centers: the filtered clusters centers of the previous location
+    :param time_budget: the local search budget in seconds, the noise_refinement_time_budget config value by default
+    :param max_stalled_iterations: number of successive iterations without improvement that stop the local search
+    :return: the noise output - the filtered clusters centers and the heralds
+    """
+    labels = list(previous_clusters_centers.keys())
+    centers = np.array(list(previous_clusters_centers.values())).reshape(-1, 2)
+    centers = push_centers_out_of_contagion_polygon(centers, patient)
+    filtered_clusters_centers = refine_clusters_centers(dict(zip(labels, centers)), front_points, patient,
+                                                        time_budget=time_budget,
+                                                        max_stalled_iterations=max_stalled_iterations)
+
+    heralds = HeraldSet(np.array(list(filtered_clusters_centers.values())).reshape(-1, 2),
+                        get_run_config().get_value('noise_herald_effective_radius'))
+
+    noise_output = {"filtered_clusters_centers": filtered_clusters_centers,
+                    "heralds": heralds}
 
     return noise_output
@@ -0,0 +1,245 @@
+import copy
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from algo_config.algo_config import get_run_config
+from general_utils.geographic_utils import pairwise_distances, destination_coord_from_start_coord_and_angle
+from models.patient import Patient
+
+MOVES = ('shift', 'merge', 'add')
+BATCH_SIZE = 64
+SHIFT_STD_RATIO = 0.3  # std of a shift move, as a ratio of the herald effective radius
+MAX_STALLED_ITERATIONS = 200
+
+
+class CoverageState:
+    """
+    The current heralds positions and the targets they cover. Holds the coverage matrix and the per-target
+    coverage counts, so candidate moves can be scored in batches without recomputing the whole solution.
+    """
+
+    def __init__(self, centers: np.ndarray, targets: np.ndarray, radius: float, required: Optional[np.ndarray] = None):
+        self.targets_in_rad = np.deg2rad(targets)
+        self.radius = radius
+        self.centers = np.empty((0, 2))
+        self.covers = np.zeros((0, len(targets)), dtype=bool)
+        self.counts = np.zeros(len(targets), dtype=int)
+        self.add(centers)
+        # by default, keep covered whatever the initial centers cover
+        self.required = self.counts > 0 if required is None else required
+
+    def __len__(self) -> int:
+        return len(self.centers)
+
+    def coverage(self, centers: np.ndarray) -> np.ndarray:
+        """
+        Calculates which targets are covered by each of the given centers
+        :param centers: 2D array of centers in lat,lon
+        :return: 2D boolean array (centers, targets)
+        """
+        return pairwise_distances(np.deg2rad(centers), self.targets_in_rad) <= self.radius
+
+    def copy(self) -> 'CoverageState':
+        # arrays are replaced, never modified in place, so a shallow copy is enough
+        return copy.copy(self)
+
+    def assign(self, other: 'CoverageState'):
+        """
+        Takes the heralds and coverage of another state of the same targets, e.g. an accepted trial state
+        """
+        self.centers = other.centers
+        self.covers = other.covers
+        self.counts = other.counts
+
+    def n_uncovered(self) -> int:
+        return int(np.sum(self.required & (self.counts == 0)))
+
+    def add(self, centers: np.ndarray, covers: Optional[np.ndarray] = None):
+        centers = centers.reshape(-1, 2)
+        covers = self.coverage(centers) if covers is None else covers.reshape(-1, self.covers.shape[1])
+        self.centers = np.vstack([self.centers, centers])
+        self.covers = np.vstack([self.covers, covers])
+        self.counts = self.counts + covers.sum(0)
+
+    def remove(self, indices: np.ndarray):
+        keep = np.ones(len(self.centers), dtype=bool)
+        keep[indices] = False
+        self.counts = self.counts - self.covers[~keep].sum(0)
+        self.centers = self.centers[keep]
+        self.covers = self.covers[keep]
+
+    def droppable(self) -> np.ndarray:
+        """
+        A herald can be dropped if every required target it covers is covered by another herald as well
+        :return: boolean mask of the droppable heralds
+        """
+        uniquely_covered = self.required & (self.counts == 1)
+        return ~np.any(self.covers & uniquely_covered, axis=1)
+
+    def drop_redundant(self, rng: np.random.Generator) -> int:
+        """
+        Drops redundant heralds one by one, at random order, until none is left
+        :return: number of dropped heralds
+        """
+        n_dropped = 0
+        droppable = self.droppable()
+        while np.any(droppable):
+            self.remove(rng.choice(np.flatnonzero(droppable)))
+            n_dropped += 1
+            droppable = self.droppable()
+        return n_dropped
+
+
+def outside_contagion_circle(candidates: np.ndarray, patient: Patient) -> np.ndarray:
+    """
+    Mask of candidates located outside of the contagion circle of the patient
+    :param candidates: 2D array of candidate centers in lat,lon
+    :param patient: the patient
+    :return: boolean mask
+    """
+    distances = pairwise_distances(np.deg2rad(candidates), np.deg2rad(patient.location)).reshape(-1)
+    return distances >= patient.contagion_radius
+
+
+def best_valid_candidate(state: CoverageState, candidates: np.ndarray, patient: Patient,
+                         replaced: np.ndarray) -> Tuple[Optional[int], Optional[np.ndarray]]:
+    """
+    Scores a batch of candidates, each replacing the given heralds, and returns the valid candidate covering most
+    targets. A candidate is valid if it is outside the contagion circle and keeps every required target covered.
+    :param state: the current coverage state
+    :param candidates: 2D array of candidate centers in lat,lon
+    :param patient: the patient
+    :param replaced: indices of the heralds that the candidate replaces
+    :return: index of the best candidate and its coverage row, or none if no candidate is valid
+    """
+    candidates_covers = state.coverage(candidates)
+    remaining_counts = state.counts - state.covers[replaced].sum(0)
+    new_counts = remaining_counts[np.newaxis, :] + candidates_covers
+    n_uncovered = np.sum(state.required & (new_counts == 0), axis=1)
+    valid = outside_contagion_circle(candidates, patient) & (n_uncovered <= state.n_uncovered())
+    if not np.any(valid):
+        return None, None
+    scores = np.where(valid, candidates_covers.sum(1), -1)
+    best = int(np.argmax(scores))
+    return best, candidates_covers[best]
+
+
+def shift_move(state: CoverageState, patient: Patient, rng: np.random.Generator) -> bool:
+    """
+    Moves a random herald to a nearby position covering more targets
+    """
+    if len(state) == 0:
+        return False
+    herald = rng.integers(len(state))
+    angles = rng.uniform(0, 2 * np.pi, BATCH_SIZE)
+    distances = np.abs(rng.normal(0, SHIFT_STD_RATIO * state.radius, BATCH_SIZE))
+    candidates = np.rad2deg(destination_coord_from_start_coord_and_angle(np.deg2rad(state.centers[herald]),
+                                                                         angles, distances))
+    best, best_covers = best_valid_candidate(state, candidates, patient, np.array([herald]))
+    if best is None or best_covers.sum() <= state.covers[herald].sum():
+        return False
+    state.remove(np.array([herald]))
+    state.add(candidates[best], best_covers)
+    return True
+
+
+def merge_move(state: CoverageState, patient: Patient, rng: np.random.Generator) -> bool:
+    """
+    Replaces two close heralds with a single herald placed between them
+    """
+    if len(state) < 2:
+        return False
+    centers_in_rad = np.deg2rad(state.centers)
+    distances = pairwise_distances(centers_in_rad, centers_in_rad)
+    pairs = np.argwhere(np.triu(distances <= 2 * state.radius, k=1))
+    if len(pairs) == 0:
+        return False
+    first, second = pairs[rng.integers(len(pairs))]
+    ratios = rng.uniform(0, 1, (BATCH_SIZE, 1))
+    candidates = state.centers[first] + ratios * (state.centers[second] - state.centers[first])
+    best, best_covers = best_valid_candidate(state, candidates, patient, np.array([first, second]))
+    if best is None:
+        return False
+    state.remove(np.array([first, second]))
+    state.add(candidates[best], best_covers)
+    return True
+
+
+def add_move(state: CoverageState, targets: np.ndarray, patient: Patient, rng: np.random.Generator) -> bool:
+    """
+    Adds a herald on a weakly covered target, and keeps it only if it leaves at least two other heralds redundant
+    (or if it covers previously uncovered targets)
+    """
+    weak = state.required & (state.counts <= 1)
+    if not np.any(weak):
+        return False
+    candidates = targets[rng.choice(np.flatnonzero(weak), BATCH_SIZE)]
+    candidates_covers = state.coverage(candidates)
+    valid = outside_contagion_circle(candidates, patient)
+    if not np.any(valid):
+        return False
+    scores = np.where(valid, np.sum(candidates_covers & weak, axis=1), -1)
+    best = int(np.argmax(scores))
+
+    before = (state.n_uncovered(), len(state))
+    trial = state.copy()
+    trial.add(candidates[best], candidates_covers[best])
+    trial.drop_redundant(rng)
+    if (trial.n_uncovered(), len(trial)) >= before:
+        return False
+    state.assign(trial)
+    return True
+
+
+def refine_clusters_centers(clusters_centers: Dict[int, np.ndarray], front_points: np.ndarray, patient: Patient,
+                            required: Optional[np.ndarray] = None, time_budget: Optional[float] = None,
+                            max_stalled_iterations: int = MAX_STALLED_ITERATIONS) -> Dict[int, np.ndarray]:
+    """
+    Refines the heralds positions with a local search under a wall-clock budget, stopped earlier when the search
+    stalls. Every iteration tries one of the moves (shift, merge, add) scored in a batch of candidates, and drops the
+    heralds that became redundant.
+    The objective is first to keep all required front points covered and then to use as few heralds as possible.
+    :param clusters_centers: a dict mapping cluster label to the relevant cluster center
+    :param front_points: all front points, the targets the heralds need to cover
+    :param patient: the patient
+    :param required: mask of the front points that must stay covered. defaults to the ones covered by the input
+    :param time_budget: the wall-clock budget in seconds, the noise_refinement_time_budget config value by default
+    :param max_stalled_iterations: number of successive iterations without improvement that stop the search
+    :return: a dict mapping label to the refined centers
+    """
+    if time_budget is None:
+        time_budget = get_run_config().get_value('noise_refinement_time_budget')
+    rng = np.random.default_rng(get_run_config().get_value('noise_refinement_seed'))
+    radius = get_run_config().get_value('noise_herald_effective_radius')
+    deadline = time.perf_counter() + time_budget
+
+    labels = list(clusters_centers.keys())
+    centers = np.array(list(clusters_centers.values())).reshape(-1, 2)
+    state = CoverageState(centers, front_points, radius, required)
+
+    state.drop_redundant(rng)
+    stalled_iterations = 0
+    while time.perf_counter() < deadline and stalled_iterations < max_stalled_iterations:
+        move = MOVES[rng.integers(len(MOVES))]
+        if move == 'shift':
+            improved = shift_move(state, patient, rng)
+        elif move == 'merge':
+            improved = merge_move(state, patient, rng)
+        else:
+            improved = add_move(state, front_points, patient, rng)
+        improved = state.drop_redundant(rng) > 0 or improved
+        stalled_iterations = 0 if improved else stalled_iterations + 1
+
+    # keep the labels of unchanged heralds, and give new labels to the moved ones
+    refined_clusters_centers = {}
+    next_label = max(labels, default=-1) + 1
+    for center in state.centers:
+        matches = [label for label in labels if np.array_equal(clusters_centers[label], center)]
+        if matches:
+            refined_clusters_centers[matches[0]] = center
+        else:
+            refined_clusters_centers[next_label] = center
+            next_label += 1
+    return refined_clusters_centers
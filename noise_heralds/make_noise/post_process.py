@@ -1,39 +1,38 @@
-from models.scenario import Scenario
-from general_utils.geographic_utils import destination_coord_from_start_coord_and_angle, calculate_bearing
-from general_utils.geometric_utils import create_buffered_polygon_around_coord
-from typing import Dict
 import numpy as np
-from shapely.geometry import Point
+
+from general_utils.geographic_utils import destination_coord_from_start_coord_and_angle, calculate_bearing, \
+    pairwise_distances
+from models.patient import Patient
 
 CENTERS_MOVEMENT_RATIO = 0.1
 
 
-def move_clusters_centers_towards_patient(clusters_centers: Dict[int, np.ndarray],
-                                          patient_loc: np.ndarray) -> None:
+def move_clusters_centers_towards_patient(clusters_centers: np.ndarray, patient_loc: np.ndarray) -> np.ndarray:
     """
-    Move the cluster center towards the patient
-    :param clusters_centers: a dict mapping cluster label to the relevant cluster center
+    Move the clusters centers towards the patient
+    :param clusters_centers: 2D array of the clusters centers in lat,lon
     :param patient_loc: location of the patient in lat,lon
-    :return: none, modifies the dict inplace
+    :return: 2D array of the moved centers
     """
-    for label, cluster_center in clusters_centers.items():
-        clusters_centers[label] = cluster_center + CENTERS_MOVEMENT_RATIO * (patient_loc - cluster_center)
+    return clusters_centers + CENTERS_MOVEMENT_RATIO * (patient_loc.reshape(1, 2) - clusters_centers)
 
 
-def push_centers_out_of_contagion_polygon(clusters_centers: Dict[int, np.ndarray], scenario: Scenario):
+def push_centers_out_of_contagion_polygon(clusters_centers: np.ndarray, patient: Patient) -> np.ndarray:
     """
-    Push centers out of contagion polygon of the patient
-    :param clusters_centers: a dict mapping cluster label to the relevant cluster center
-    :param scenario: the scenario object
-    :return: none, modifies the dict inplace
+    Push centers out of contagion polygon of the patient. The centers inside the contagion radius are found by their
+    geodesic distance to the patient, and all of them are pushed to the contagion circle along their bearing at once.
+    :param clusters_centers: 2D array of the clusters centers in lat,lon
+    :param patient: the patient
+    :return: 2D array of the pushed centers
     """
-    patient_effective_polygon = create_buffered_polygon_around_coord(scenario.patient.location,
-                                                                     scenario.patient.contagion_radius)
-    for label, cluster_center in clusters_centers.items():
-        if Point(cluster_center).intersects(patient_effective_polygon):
-            start_in_rad = np.deg2rad(scenario.patient.location)
-            angle_in_radians = calculate_bearing(scenario.patient.location, cluster_center)
-            moved_center = destination_coord_from_start_coord_and_angle(start_in_rad,
-                                                                        angle_in_radians,
-                                                                        scenario.patient.contagion_radius)
-            clusters_centers[label] = np.rad2deg(moved_center).reshape(-1)
+    patient_loc_in_rad = np.deg2rad(patient.location).reshape(2)
+    centers_in_rad = np.deg2rad(clusters_centers).reshape(-1, 2)
+    inside = pairwise_distances(centers_in_rad, patient_loc_in_rad).reshape(-1) <= patient.contagion_radius
+
+    pushed_centers = clusters_centers.copy()
+    angles_in_radians = calculate_bearing(patient_loc_in_rad, centers_in_rad[inside])
+    moved_centers = destination_coord_from_start_coord_and_angle(patient_loc_in_rad,
+                                                                 angles_in_radians,
+                                                                 patient.contagion_radius)
+    pushed_centers[inside] = np.rad2deg(moved_centers)
+    return pushed_centers
@@ -1,18 +1,35 @@
 import os
-import pickle
-from typing import NamedTuple
+from typing import NamedTuple, Union
 
 from shapely.geometry import MultiPolygon, Polygon
 
-from noise_heralds.los.los_generator import get_los
-from noise_heralds.villages.village_outliner import get_villages_outline
-from dir_definitions import SEGMENTED_AREAS_DIR, BENCHMARK_DIR
-from algo_config.algo_config import AlgorithmConfig
+from general_utils.artifact_cache import get_artifact_cache
+from general_utils.geometry_serialization import save_multipolygons, load_multipolygons, RaggedMultiPolygons
+from noise_heralds.los.los_generator import get_los, los_artifact_key
+from noise_heralds.villages.village_outliner import get_villages_outline, villages_artifact_key
+from dir_definitions import BENCHMARK_DIR
+from algo_config.algo_config import RunConfig, bind_config
+
+SEGMENTED_AREAS_CONFIG_KEYS = ('village_min_buildings',)
+SEGMENTED_AREAS_FILE_NAME = 'segmented_areas.npz'
 
 
 class SegmentedAreas(NamedTuple):
-    villages: MultiPolygon
-    los: MultiPolygon
+    villages: Union[MultiPolygon, RaggedMultiPolygons]
+    los: Union[MultiPolygon, RaggedMultiPolygons]
+
+
+def buffer_villages(villages: MultiPolygon) -> MultiPolygon:
+    """Buffers the villages outlines into the villages area
+
+    :param villages: villages outlines
+    :return: villages area as a multipolygon
+    """
+    villages = villages.buffer(0.001)
+
+    if type(villages) == Polygon:
+        villages = MultiPolygon([villages])
+    return villages
 
 
 def calc_areas() -> SegmentedAreas:
@@ -23,11 +40,7 @@ def calc_areas() -> SegmentedAreas:
     los = get_los()
     los = [mp.buffer(0) for mp in los]  # make sure multipolygon valid
 
-    villages = get_villages_outline()
-    villages = villages.buffer(0.001)
-
-    if type(villages) == Polygon:
-        villages = MultiPolygon([villages])
+    villages = buffer_villages(get_villages_outline())
 
     if type(los[1]) == Polygon:
         los[1] = MultiPolygon([los[1]])
@@ -36,40 +49,49 @@ def calc_areas() -> SegmentedAreas:
                           los=los[1])
 
 
-def save_segmented_areas(areas: SegmentedAreas) -> None:
-    """Saves segmented areas to a file
-
-    :param areas: segmented areas
-    :return: none
+def segmented_areas_artifact_key() -> str:
     """
-    if not os.path.isdir(SEGMENTED_AREAS_DIR):
-        os.mkdir(SEGMENTED_AREAS_DIR)
+    :return: the key of the segmented areas of the current config in the artifact cache
+    """
+    return get_artifact_cache().key('segmented_areas',
+                                    config_keys=SEGMENTED_AREAS_CONFIG_KEYS,
+                                    code_files=[__file__],
+                                    dependencies=[los_artifact_key(), villages_artifact_key()])
+
 
-    segmented_areas_path = os.path.join(SEGMENTED_AREAS_DIR, f'areas_{AlgorithmConfig().get_name()}.pkl')
-    with open(segmented_areas_path, 'wb') as f:
-        pickle.dump(areas, f)
+def save_segmented_areas(seg_areas: SegmentedAreas, artifact_dir: str) -> None:
+    save_multipolygons(os.path.join(artifact_dir, SEGMENTED_AREAS_FILE_NAME),
+                       {name: [multipolygon] for name, multipolygon in seg_areas._asdict().items()})
 
 
-def read_segmented_areas() -> SegmentedAreas:
-    """Reads segmented areas from a file
+def load_segmented_areas(artifact_dir: str, as_arrays: bool = False) -> SegmentedAreas:
+    """Loads segmented areas saved by save_segmented_areas
+
+    :param artifact_dir: the directory of the areas
+    :param as_arrays: return the areas as ragged arrays, without creating the shapely objects
     :return: segmented areas
     """
-    segmented_areas_path = os.path.join(SEGMENTED_AREAS_DIR, f'areas_{AlgorithmConfig().get_name()}.pkl')
-    if not os.path.isfile(segmented_areas_path):
-        seg_areas = calc_areas()
-        save_segmented_areas(seg_areas)
+    areas = load_multipolygons(os.path.join(artifact_dir, SEGMENTED_AREAS_FILE_NAME), SegmentedAreas._fields,
+                               as_arrays=as_arrays)
+    return SegmentedAreas(**{name: area if as_arrays else area[0] for name, area in areas.items()})
+
+
+def read_segmented_areas(as_arrays: bool = False) -> SegmentedAreas:
+    """Reads segmented areas from the artifact cache, calculating them if needed
 
-    with open(segmented_areas_path, 'rb') as f:
-        return pickle.load(f)
+    :param as_arrays: return the areas as ragged arrays, without creating the shapely objects
+    :return: segmented areas
+    """
+    return get_artifact_cache().get_or_create(segmented_areas_artifact_key(), calc_areas,
+                                              save=save_segmented_areas,
+                                              load=lambda artifact_dir: load_segmented_areas(artifact_dir, as_arrays))
 
 
 def create_segmentation():
-    seg_areas = calc_areas()
-    save_segmented_areas(seg_areas)
+    read_segmented_areas()
 
 
 if __name__ == '__main__':
-    alg_config = AlgorithmConfig()
     for benchmark_file in os.listdir(BENCHMARK_DIR):
-        alg_config.load_config(os.path.join(BENCHMARK_DIR, benchmark_file))
-        create_segmentation()
+        with bind_config(RunConfig.from_file(os.path.join(BENCHMARK_DIR, benchmark_file))):
+            create_segmentation()
@@ -1,6 +1,5 @@
 import os
-import pickle
-from typing import List, BinaryIO
+from typing import List, Dict
 
 import networkx as nx
 import numpy as np
@@ -9,12 +8,20 @@ from scipy.spatial.distance import cdist
 from shapely.geometry import Polygon, MultiPolygon, Point
 from shapely.ops import cascaded_union
 
-from algo_config.algo_config import AlgorithmConfig
-from dir_definitions import BENCHMARK_DIR, VILLAGES_DIR
+from algo_config.algo_config import RunConfig, bind_config, get_run_config
+from dir_definitions import BENCHMARK_DIR
+from general_utils import geometric_utils, geographic_utils
+from general_utils.artifact_cache import get_artifact_cache
+from general_utils.geo_data_retriever import get_geographic_data_path, GeographicType
+from general_utils.geometry_serialization import save_multipolygons, load_multipolygons, load_arrays
+from models.area_context import get_area_context
 from models.scenario import Scenario
 from general_utils.geographic_utils import circle_around_point
 from general_utils.geometric_utils import merge_circles, circle_points
 
+VILLAGES_CONFIG_KEYS = ('area_name', 'villages_radius', 'villages_resolution')
+VILLAGES_FILE_NAME = 'villages.npz'
+
 
 def merge_multiple_circles(centers: np.ndarray, radius: float) -> MultiPolygon:
     """Given a set of circles with the same radius, creates a multipolygon which represents the merged circles
@@ -51,31 +58,25 @@ def merge_multiple_circles(centers: np.ndarray, radius: float) -> MultiPolygon:
     return MultiPolygon([polygons[uf[s.pop()]] for s in uf.to_sets()])
 
 
-def save_villages_outline(mp: MultiPolygon, buildings: List[Point]):
-    """Saves villages outlines to a file
+def count_villages_buildings(mp: MultiPolygon, buildings: List[Point]) -> List[Dict]:
+    """Counts the buildings of every village
 
     :param mp: villages outlines as a multipolygon
     :param buildings: buildings centers
-    :return:
+    :return: list of the villages, each with its polygon and its buildings count
     """
-    if not os.path.isdir(VILLAGES_DIR):
-        os.mkdir(VILLAGES_DIR)
-
-    villages = [{"count": len([bldg for bldg in buildings if polygon.contains(bldg)]),
-                 "polygon": polygon}
-                for polygon in mp]
-    with open(os.path.join(VILLAGES_DIR, f'villages_{AlgorithmConfig().get_name()}.pickle'), 'wb') as f:
-        pickle.dump(villages, f)
+    return [{"count": len([bldg for bldg in buildings if polygon.contains(bldg)]),
+             "polygon": polygon}
+            for polygon in mp]
 
 
-def _read_villages_outline(file: BinaryIO, filter_count=None) -> MultiPolygon:
-    """Reads villages outlines from a file
+def _filter_villages_outline(data: List[Dict], filter_count=None) -> MultiPolygon:
+    """Filters the villages outlines
 
-    :param file: villages file
+    :param data: list of the villages, each with its polygon and its buildings count
     :param filter_count: filter out villages which less buildings than this number
     :return: villages outlines as a multipolygon
     """
-    data = pickle.load(file)
     if filter_count is None:
         mp = MultiPolygon([p["polygon"] for p in data])
     else:
@@ -83,35 +84,65 @@ def _read_villages_outline(file: BinaryIO, filter_count=None) -> MultiPolygon:
     return mp
 
 
+def villages_artifact_key() -> str:
+    """
+    :return: the key of the villages of the current config in the artifact cache
+    """
+    buildings_path = get_geographic_data_path(get_run_config().get_value('area_name'), GeographicType.BUILDING)
+    return get_artifact_cache().key('villages',
+                                    config_keys=VILLAGES_CONFIG_KEYS,
+                                    input_files=[f'{buildings_path}.json'],
+                                    code_files=[__file__, geometric_utils.__file__, geographic_utils.__file__])
+
+
+def save_villages_outline(villages: List[Dict], artifact_dir: str) -> None:
+    save_multipolygons(os.path.join(artifact_dir, VILLAGES_FILE_NAME),
+                       {'villages': [village["polygon"] for village in villages]},
+                       counts=np.array([village["count"] for village in villages], dtype=np.int64))
+
+
+def load_villages_outline(artifact_dir: str) -> List[Dict]:
+    """Loads villages saved by save_villages_outline
+
+    :param artifact_dir: the directory of the villages
+    :return: list of the villages, each with its polygon and its buildings count
+    """
+    path = os.path.join(artifact_dir, VILLAGES_FILE_NAME)
+    polygons = load_multipolygons(path, ['villages'])['villages']
+    counts = load_arrays(path, ['counts'])['counts']
+    return [{"count": int(count),
+             "polygon": polygon.geoms[0] if len(polygon.geoms) == 1 else polygon}
+            for count, polygon in zip(counts, polygons)]
+
+
 def get_villages_outline() -> MultiPolygon:
-    """Reads villages outlines from benchmark file
+    """Reads villages outlines from the artifact cache, calculating them if needed
     :return: villages outlines as a multipolygon
     """
-    villages_outline_path = os.path.join(VILLAGES_DIR, f'villages_{AlgorithmConfig().get_name()}.pickle')
-    if not os.path.isfile(villages_outline_path):
-        create_villages_outline()
+    def read_villages() -> MultiPolygon:
+        villages = get_artifact_cache().get_or_create(villages_artifact_key(), create_villages_outline,
+                                                      save=save_villages_outline, load=load_villages_outline)
+        return _filter_villages_outline(villages, filter_count=get_run_config().get_value('village_min_buildings'))
 
-    with open(villages_outline_path, 'rb') as f:
-        return _read_villages_outline(f, filter_count=AlgorithmConfig().get_value('village_min_buildings'))
+    # the villages depend only on the area, they are read once per area
+    return get_area_context().memoize('villages_outline', read_villages)
 
 
-def create_villages_outline():
+def create_villages_outline() -> List[Dict]:
     scenario = Scenario(heralds=None)
     buildings_centers = [Polygon(building).centroid for building in scenario.buildings if len(building) > 2]
     buildings_centers_xy = [c.xy for c in buildings_centers]
     b = np.array(buildings_centers_xy).reshape(-1, 2)
-    circle_p = circle_around_point(np.deg2rad(b[0]), AlgorithmConfig().get_value('villages_radius')
-                                   , AlgorithmConfig().get_value('villages_resolution'))
+    circle_p = circle_around_point(np.deg2rad(b[0]), get_run_config().get_value('villages_radius')
+                                   , get_run_config().get_value('villages_resolution'))
     d = np.linalg.norm(np.rad2deg(circle_p[0]) - b[0])
 
     mp = merge_multiple_circles(b, d)
-    save_villages_outline(mp, buildings_centers)
+    return count_villages_buildings(mp, buildings_centers)
 
 
 if __name__ == "__main__":
 
     for file in os.listdir(BENCHMARK_DIR):
-        benchmark_num = file.split('.')[0].split('_')[-1]
-
-        AlgorithmConfig().load_config(os.path.join(BENCHMARK_DIR, file))
-        create_villages_outline()
+        with bind_config(RunConfig.from_file(os.path.join(BENCHMARK_DIR, file))):
+            get_villages_outline()
@@ -0,0 +1,133 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from algo_config.algo_config import RunConfig, bind_config, get_run_config
+
+DEFAULT_WORKERS = 4
+
+
+class Stage(NamedTuple):
+    """
+    A stage of the pipeline - computes its output from the outputs of the stages it depends on, passed to its
+    function as keyword arguments by the names of these outputs
+    """
+    output: str
+    inputs: Tuple[str, ...]
+    run: Callable[..., Any]
+
+
+class PipelineResult(NamedTuple):
+    outputs: Dict[str, Any]
+    timings: Dict[str, float]  # seconds per stage, in completion order
+
+
+def _run_stage_in_process(config: RunConfig, run: Callable[..., Any], inputs: Dict[str, Any]) -> Any:
+    # a worker process does not share the context of the caller, so the run config is bound again there
+    with bind_config(config):
+        return run(**inputs)
+
+
+class Pipeline:
+    """
+    Declared stages forming a DAG, by their inputs and outputs. Running the pipeline for some target outputs runs
+    only the stages they depend on, each once, and runs stages whose inputs are ready concurrently. Stages run on a
+    thread pool in a copy of the caller's context, so they see the run config bound by the caller, or on a process
+    pool, in which case their functions, inputs and outputs must be picklable. Stages computing derived artifacts
+    resolve them through the artifact cache themselves.
+    """
+
+    def __init__(self, stages: Iterable[Stage]):
+        self._stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.output in self._stages:
+                raise ValueError(f"Duplicate stage output: {stage.output}")
+            self._stages[stage.output] = stage
+        for stage in self._stages.values():
+            missing_inputs = [name for name in stage.inputs if name not in self._stages]
+            if missing_inputs:
+                raise ValueError(f"Stage {stage.output} depends on unknown outputs: {missing_inputs}")
+
+    @property
+    def stages(self) -> Dict[str, Stage]:
+        return self._stages
+
+    def resolve(self, targets: Sequence[str]) -> List[str]:
+        """
+        Finds the stages needed for the targets
+        :param targets: the required outputs
+        :return: the needed stages outputs, in a topological order
+        :raises ValueError: on an unknown target or a dependency cycle
+        """
+        order, visited, visiting = [], set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name not in self._stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage: {name}")
+            visiting.add(name)
+            for input_name in self._stages[name].inputs:
+                visit(input_name)
+            visiting.remove(name)
+            visited.add(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def run(self, targets: Sequence[str], workers: int = DEFAULT_WORKERS, processes: bool = False,
+            outputs: Optional[Dict[str, Any]] = None) -> PipelineResult:
+        """
+        Runs the stages needed for the targets
+        :param targets: the required outputs
+        :param workers: maximal number of stages running at once, stages run one by one in the calling thread if 1
+        :param processes: run the stages on a process pool instead of a thread pool
+        :param outputs: outputs already computed, their stages are not run
+        :return: the outputs of all the run stages (and the given ones), and the time every stage took
+        """
+        outputs = dict(outputs or {})
+        timings = {}
+        pending = [name for name in self.resolve(targets) if name not in outputs]
+
+        if workers <= 1:
+            for name in pending:
+                stage = self._stages[name]
+                start_time = time.perf_counter()
+                outputs[name] = stage.run(**{input_name: outputs[input_name] for input_name in stage.inputs})
+                timings[name] = time.perf_counter() - start_time
+            return PipelineResult(outputs, timings)
+
+        config = get_run_config()
+        executor_type = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with executor_type(max_workers=workers) as executor:
+            running, start_times = {}, {}
+            waiting: Set[str] = set(pending)
+            while waiting or running:
+                for name in [name for name in pending if name in waiting]:
+                    stage = self._stages[name]
+                    if any(input_name not in outputs for input_name in stage.inputs):
+                        continue
+                    inputs = {input_name: outputs[input_name] for input_name in stage.inputs}
+                    if processes:
+                        future = executor.submit(_run_stage_in_process, config, stage.run, inputs)
+                    else:
+                        future = executor.submit(contextvars.copy_context().run, stage.run, **inputs)
+                    running[future] = name
+                    start_times[name] = time.perf_counter()
+                    waiting.remove(name)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs[name] = future.result()
+                    timings[name] = time.perf_counter() - start_times[name]
+        return PipelineResult(outputs, timings)
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    return ', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items())
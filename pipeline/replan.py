@@ -0,0 +1,164 @@
+import argparse
+import os
+import time
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+from shapely.geometry import MultiPolygon
+
+from algo_config.algo_config import RunConfig, bind_config, get_run_config
+from dir_definitions import BENCHMARK_DIR
+from general_utils.patient_utils import get_patient_filtered_polygons
+from models.herald import HeraldSet
+from models.scenario import Scenario
+from noise_heralds.los.los_generator import create_los, patient_grid_cell
+from noise_heralds.make_noise.clustering import filter_front_points
+from noise_heralds.make_noise.core import place_heralds, place_heralds_from, front_points_coverage
+from pipeline.engine import DEFAULT_WORKERS, format_timings
+from pipeline.stages import HERALDS_PIPELINE
+from pipeline.sweep import PATIENT_INDEPENDENT_STAGES, resolve_with_los
+from roads_heralds.block_roads.core import IncrementalBlocker
+
+
+class Plan(NamedTuple):
+    """
+    The solution of one patient location of a stream
+    """
+    patient_location: np.ndarray
+    noise_output: Dict
+    blocks_output: Dict
+    heralds: HeraldSet
+    los: Optional[Tuple[MultiPolygon, MultiPolygon]]
+    warm_started: bool  # whether the noise heralds were repaired from the previous plan
+    los_reused: bool  # whether the LOS of the previous plan was kept
+    timings: Dict[str, float]  # seconds per step
+
+
+class StreamingPlanner:
+    """
+    Solves the scenario of an area for successive locations of a moving patient, reusing the previous solution:
+    - the LOS is calculated again only when the patient moves to another cell of the LOS grid
+    - the roads are blocked incrementally, only the nodes and edges around the change of the patient polygons are
+      tested again
+    - the noise heralds are repaired from the previous ones by the local search. The search stops after
+      replanning_max_stalled_iterations iterations without improvement, or at the latest after the
+      replanning_time_budget config value, so the budget is spent whole only while the search keeps improving.
+      The heralds are placed from scratch for the first location, and whenever the repaired heralds are more than
+      the ones of the last full plan or cover less of the front points than it by more than the
+      replanning_coverage_tolerance config value
+    """
+
+    def __init__(self, config: Optional[RunConfig] = None, with_los: Optional[bool] = None,
+                 workers: int = DEFAULT_WORKERS):
+        """
+        :param config: the area config, the config of the current context by default
+        :param with_los: whether to calculate the LOS of every location, by default only if the DTM files exist
+        :param workers: number of area stages loading at once
+        """
+        self._config = config if config is not None else get_run_config()
+        with bind_config(self._config):
+            area_outputs = HERALDS_PIPELINE.run(PATIENT_INDEPENDENT_STAGES, workers=workers).outputs
+            self._with_los = resolve_with_los(with_los)
+            self._blocker = IncrementalBlocker(area_outputs['roads_graph'], area_outputs['villages_area'],
+                                               area_outputs['contracted_roads_graph'])
+        self._boundary_segments = area_outputs['boundary_segments']
+
+        self._filtered_clusters_centers = None
+        self._full_plan_coverage = None
+        self._full_plan_heralds = None
+        self._los_cell = None
+        self._los = None
+
+    def _place_noise_heralds(self, scenario: Scenario) -> Tuple[Dict, bool]:
+        front_points = filter_front_points(scenario.patient.location, self._boundary_segments)
+        if self._filtered_clusters_centers is not None:
+            noise_output = place_heralds_from(front_points, scenario.patient, self._filtered_clusters_centers,
+                                              get_run_config().get_value('replanning_time_budget'),
+                                              get_run_config().get_value('replanning_max_stalled_iterations'))
+            coverage = front_points_coverage(noise_output["filtered_clusters_centers"], front_points)
+            if len(noise_output["heralds"]) <= self._full_plan_heralds and \
+                    coverage >= self._full_plan_coverage - get_run_config().get_value('replanning_coverage_tolerance'):
+                return noise_output, True
+
+        noise_output = place_heralds(self._boundary_segments, scenario.patient)
+        self._full_plan_coverage = front_points_coverage(noise_output["filtered_clusters_centers"], front_points)
+        self._full_plan_heralds = len(noise_output["heralds"])
+        return noise_output, False
+
+    def update(self, location: np.ndarray, relative: bool = False) -> Plan:
+        """
+        Solves the scenario for the next location of the patient
+        :param location: the patient location - lat,lon in degrees, or relative to the area bounds
+        :param relative: whether the location is relative to the area bounds
+        :return: the plan of the location
+        """
+        south, west = np.asarray(location, dtype=float).reshape(2)
+        location_config = self._config.replace(patient_location_type='relative' if relative else 'absolute',
+                                               patient_location_south=float(south),
+                                               patient_location_west=float(west))
+        timings = {}
+        with bind_config(location_config):
+            start_time = time.perf_counter()
+            scenario = Scenario(heralds=None)
+            patient_polygons = get_patient_filtered_polygons(scenario)
+            timings['patient_polygons'] = time.perf_counter() - start_time
+
+            los_reused = False
+            if self._with_los:
+                start_time = time.perf_counter()
+                los_cell = patient_grid_cell()
+                los_reused = los_cell == self._los_cell
+                if not los_reused:
+                    self._los_cell, self._los = los_cell, create_los()
+                timings['los'] = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            noise_output, warm_started = self._place_noise_heralds(scenario)
+            self._filtered_clusters_centers = noise_output["filtered_clusters_centers"]
+            timings['noise_output'] = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            blocks_output = self._blocker.block(patient_polygons[1])
+            timings['blocks_output'] = time.perf_counter() - start_time
+
+        return Plan(patient_location=np.array(scenario.patient.location),
+                    noise_output=noise_output,
+                    blocks_output=blocks_output,
+                    heralds=HeraldSet.concatenate([noise_output["heralds"], blocks_output["heralds"]]),
+                    los=self._los if self._with_los else None,
+                    warm_started=warm_started,
+                    los_reused=los_reused,
+                    timings=timings)
+
+
+def replan_stream(locations: Iterable[np.ndarray], relative: bool = False, config: Optional[RunConfig] = None,
+                  with_los: Optional[bool] = None) -> Iterator[Plan]:
+    """
+    Solves the scenario of the area for a stream of patient locations, see StreamingPlanner. The area is loaded once,
+    before the first location is read
+    :param locations: iterable of patient locations - lat,lon in degrees, or relative to the area bounds
+    :param relative: whether the locations are relative to the area bounds
+    :param config: the area config, the config of the current context by default
+    :param with_los: whether to calculate the LOS of every location, by default only if the DTM files exist
+    :return: iterator of the plans, one per location
+    """
+    planner = StreamingPlanner(config, with_los)
+    for location in locations:
+        yield planner.update(location, relative)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-scenario", help="scenario of the area", type=int, required=True)
+    parser.add_argument("-start", help="relative start location of the route", nargs=2, type=float,
+                        default=[0.4, 0.4])
+    parser.add_argument("-end", help="relative end location of the route", nargs=2, type=float, default=[0.6, 0.6])
+    parser.add_argument("-steps", help="number of locations along the route", type=int, default=20)
+    args = parser.parse_args()
+
+    route = np.linspace(args.start, args.end, args.steps)
+    plans = replan_stream(route, relative=True,
+                          config=RunConfig.from_file(os.path.join(BENCHMARK_DIR, f"benchmark_{args.scenario}.yaml")))
+    for i, plan in enumerate(plans):
+        print(f'{i}: {len(plan.heralds)} heralds, {"warm" if plan.warm_started else "full"} noise heralds, '
+              f'{sum(plan.timings.values()):.2f}s ({format_timings(plan.timings)})')
@@ -0,0 +1,220 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple
+
+from algo_config.algo_config import RunConfig, bind_config
+from dir_definitions import BENCHMARK_DIR
+from models.area_context import AREA_CONFIG_KEYS, MAX_RESIDENT_AREAS, set_max_resident_areas
+from pipeline.engine import DEFAULT_WORKERS
+from pipeline.stages import HERALDS_PIPELINE
+from pipeline.sweep import PATIENT_INDEPENDENT_STAGES
+
+DEFAULT_PORT = 8765
+# the config values the warm area outputs depend on, a request overriding any of them is solved from the artifacts
+WARM_CONFIG_KEYS = AREA_CONFIG_KEYS + ('roads_graph_contraction',)
+PLAN_STAGES = ('noise_output', 'blocks_output', 'heralds')
+
+
+class PlanningRequestError(ValueError):
+    pass
+
+
+class WarmArea(NamedTuple):
+    config: RunConfig
+    outputs: Dict[str, Any]  # the outputs of the patient independent stages
+
+
+_warm_areas: Dict[str, WarmArea] = {}
+
+
+def served_areas() -> List[str]:
+    return list(_warm_areas.keys())
+
+
+def warm_areas(config_paths: List[str], workers: int = DEFAULT_WORKERS) -> List[str]:
+    """
+    Loads the areas of the configs and keeps their patient independent outputs in memory, to be shared by all the
+    requests of the process
+    :param config_paths: paths of the areas configs, an area is named by its config name
+    :param workers: number of stages of an area loading at once
+    :return: the names of the warm areas
+    """
+    set_max_resident_areas(max(len(config_paths), MAX_RESIDENT_AREAS))
+    for config_path in config_paths:
+        config = RunConfig.from_file(config_path)
+        with bind_config(config):
+            outputs = HERALDS_PIPELINE.run(PATIENT_INDEPENDENT_STAGES, workers=workers).outputs
+        _warm_areas[config.get_name()] = WarmArea(config, outputs)
+    return served_areas()
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def request_config(request: Dict) -> RunConfig:
+    """
+    :param request: the planning request - the area name, optionally the patient location and config overrides
+    :return: the config of the request
+    :raises PlanningRequestError: on an unknown area or config value, or a malformed request
+    """
+    if not isinstance(request, dict):
+        raise PlanningRequestError("The request must be a JSON object")
+    area = str(request.get("area"))
+    if area not in _warm_areas:
+        raise PlanningRequestError(f"Unknown area: {area}, the served areas are {served_areas()}")
+    config = _warm_areas[area].config
+    overrides = request.get("config", {})
+    if not isinstance(overrides, dict):
+        raise PlanningRequestError("The config overrides must be a JSON object")
+    overrides = dict(overrides)
+    unknown_keys = [key for key in overrides if key not in config.values]
+    if unknown_keys:
+        raise PlanningRequestError(f"Unknown config values: {unknown_keys}")
+    patient = request.get("patient")
+    if patient is not None:
+        if not isinstance(patient, dict):
+            raise PlanningRequestError("The patient must be a JSON object with a location")
+        location = patient.get("location")
+        if not isinstance(location, list) or len(location) != 2 or not all(is_number(coord) for coord in location):
+            raise PlanningRequestError(f"The patient location must be a pair of numbers, got {location}")
+        relative = patient.get("relative", False)
+        if not isinstance(relative, bool):
+            raise PlanningRequestError(f"The patient relative flag must be a boolean, got {relative}")
+        south, west = location
+        overrides.update(patient_location_type='relative' if relative else 'absolute',
+                         patient_location_south=float(south), patient_location_west=float(west))
+    return config.replace(**overrides)
+
+
+def plan(request: Dict) -> Dict:
+    """
+    Solves a planning request on its warm area. Only the patient dependent stages run, unless the request overrides
+    config values the area outputs depend on
+    :param request: the planning request, see request_config
+    :return: the response - the patient location, the noise heralds and the road block heralds, and the timings
+    """
+    start_time = time.perf_counter()
+    config = request_config(request)
+    warm_area = _warm_areas[config.get_name()]
+    is_warm = config.get_hash(WARM_CONFIG_KEYS) == warm_area.config.get_hash(WARM_CONFIG_KEYS)
+    with bind_config(config):
+        outputs, timings = HERALDS_PIPELINE.run(('scenario',) + PLAN_STAGES, workers=1,
+                                                outputs=warm_area.outputs if is_warm else None)
+    return {"area": config.get_name(),
+            "patient_location": [float(coord) for coord in outputs["scenario"].patient.location],
+            "noise_heralds": outputs["noise_output"]["heralds"].to_dict(),
+            "road_block_heralds": outputs["blocks_output"]["heralds"].to_dict(),
+            "warm": is_warm,
+            "timings": timings,
+            "seconds": time.perf_counter() - start_time}
+
+
+class PlanningRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /health - the served areas
+    POST /plan - a JSON planning request, answered with the JSON plan
+    """
+
+    def _send_json(self, status: int, body: Dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        self._send_json(200, {"status": "ok", "areas": self.server.areas})
+
+    def do_POST(self):
+        if self.path != '/plan':
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": f"The request is not valid JSON: {e}"})
+            return
+        try:
+            request_config(request)
+        except PlanningRequestError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        try:
+            # the request is solved by the workers pool, which bounds the number of requests solved at once
+            response = self.server.executor.submit(plan, request).result()
+        except Exception:
+            self._send_json(500, {"error": traceback.format_exc()})
+        else:
+            self._send_json(200, response)
+
+    def log_message(self, format: str, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PlanningServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, executor: Executor, areas: List[str], verbose: bool = False):
+        super().__init__(address, PlanningRequestHandler)
+        self.executor = executor
+        self.areas = areas
+        self.verbose = verbose
+
+
+def serve(config_paths: List[str], host: str = '127.0.0.1', port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS,
+          processes: bool = False, verbose: bool = False) -> None:
+    """
+    Serves planning requests on the areas of the configs until interrupted. The areas are loaded once, before
+    serving. The requests are solved by a pool of worker threads, or of worker processes forked after the areas are
+    loaded, so every worker starts with the warm areas
+    :param config_paths: paths of the areas configs
+    :param host: the address to listen on, the local host only by default
+    :param port: the port to listen on
+    :param workers: number of requests solved at once
+    :param processes: solve the requests on a process pool instead of a thread pool
+    :param verbose: log every request
+    """
+    areas = warm_areas(config_paths)
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        # the workers are forked on the first task, start them before the server threads
+        executor.submit(served_areas).result()
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    with executor, PlanningServer((host, port), executor, areas, verbose) as server:
+        print(f'Serving areas {areas} on http://{host}:{server.server_address[1]}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-scenarios", help="scenarios of the served areas, all the benchmarks by default", nargs="+",
+                        type=int)
+    parser.add_argument("--host", help="address to listen on", default='127.0.0.1')
+    parser.add_argument("--port", help="port to listen on", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", help="number of requests solved at once", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--processes", help="solve the requests on worker processes", action='store_true')
+    parser.add_argument("--verbose", help="log every request", action='store_true')
+    args = parser.parse_args()
+
+    if args.scenarios is not None:
+        config_files = [f"benchmark_{scenario}.yaml" for scenario in args.scenarios]
+    else:
+        config_files = sorted(file for file in os.listdir(BENCHMARK_DIR) if file.endswith('.yaml'))
+    serve([os.path.join(BENCHMARK_DIR, file) for file in config_files], args.host, args.port, args.workers,
+          args.processes, args.verbose)
@@ -0,0 +1,96 @@
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+# the client only talks to the service, it does not import the planning modules
+DEFAULT_URL = 'http://127.0.0.1:8765'
+PERCENTILES = (50, 90, 99)
+
+
+def request_json(url: str, body: Dict = None, timeout: float = 600) -> Dict:
+    """
+    Sends a request to the service, a POST if it has a body
+    :param url: the endpoint url
+    :param body: the JSON body
+    :param timeout: timeout in seconds
+    :return: the JSON response, with the error if the request failed
+    """
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return {"error": f"HTTP {e.code}: {json.loads(e.read()).get('error')}"}
+
+
+def random_plan_requests(areas: List[str], n_requests: int, seed: int = 0) -> List[Dict]:
+    """
+    :param areas: the areas to plan in, taken in turn
+    :param n_requests: number of requests
+    :param seed: seed of the patient locations
+    :return: planning requests with random patient locations, relative to the area bounds
+    """
+    rng = np.random.default_rng(seed)
+    locations = rng.uniform(0.2, 0.8, (n_requests, 2))
+    return [{"area": areas[i % len(areas)], "patient": {"location": location.tolist(), "relative": True}}
+            for i, location in enumerate(locations)]
+
+
+def run_latency_benchmark(url: str, requests: List[Dict], concurrency: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Sends the planning requests to the service, with a number of requests in flight at once
+    :param url: the service url
+    :param requests: the planning requests
+    :param concurrency: number of requests in flight at once
+    :return: per request - the latency seen by the client and the solving time reported by the service (nan if the
+    request failed), and the errors (empty if none), and the wall time of all the requests
+    """
+    def timed_request(body: Dict):
+        start_time = time.perf_counter()
+        response = request_json(f'{url}/plan', body)
+        return time.perf_counter() - start_time, response
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_request, requests))
+    wall_seconds = time.perf_counter() - start_time
+    return {"latencies": np.array([latency for latency, _ in results]),
+            "service_seconds": np.array([response.get("seconds", np.nan) for _, response in results]),
+            "errors": np.array([response.get("error", '') for _, response in results], dtype=object),
+            "wall_seconds": np.array(wall_seconds)}
+
+
+def print_report(results: Dict[str, np.ndarray]) -> None:
+    ok = results["errors"] == ''
+    latencies = results["latencies"][ok]
+    print(f'{np.sum(ok)}/{len(ok)} requests succeeded, {len(ok) / float(results["wall_seconds"]):.2f} requests/s')
+    if len(latencies) > 0:
+        percentiles = np.percentile(latencies, PERCENTILES)
+        print('latency ' + ', '.join(f'p{percentile} {seconds:.3f}s'
+                                     for percentile, seconds in zip(PERCENTILES, percentiles)) +
+              f', mean {np.mean(latencies):.3f}s (solving {np.nanmean(results["service_seconds"][ok]):.3f}s)')
+    for error in sorted(set(results["errors"][~ok])):
+        print(f'error: {error}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="url of the planning service", default=DEFAULT_URL)
+    parser.add_argument("-areas", help="areas to plan in, all the served areas by default", nargs="+")
+    parser.add_argument("-requests", help="number of requests", type=int, default=50)
+    parser.add_argument("-concurrency", help="number of requests in flight at once", type=int, default=1)
+    parser.add_argument("-seed", help="seed of the patient locations", type=int, default=0)
+    args = parser.parse_args()
+
+    areas = args.areas if args.areas is not None else request_json(f'{args.url}/health')["areas"]
+    # one request per area first, so the measured requests do not include loading lazily created artifacts
+    run_latency_benchmark(args.url, random_plan_requests(areas, len(areas), args.seed + 1), args.concurrency)
+    print_report(run_latency_benchmark(args.url, random_plan_requests(areas, args.requests, args.seed),
+                                       args.concurrency))
@@ -0,0 +1,119 @@
+from typing import Dict, Optional, Tuple
+
+from shapely.geometry import MultiPolygon, Polygon
+
+from algo_config.algo_config import get_run_config
+from general_utils.patient_utils import get_patient_filtered_polygons
+from models.herald import HeraldSet
+from models.scenario import Scenario
+from noise_heralds.los.los_generator import get_los
+from noise_heralds.make_noise.clustering import BoundarySegments, calculate_boundary_segments
+from noise_heralds.make_noise.core import place_heralds
+from noise_heralds.segment import read_segmented_areas, SegmentedAreas, buffer_villages
+from noise_heralds.villages.village_outliner import get_villages_outline
+from pipeline.engine import Stage, Pipeline
+from roads_heralds.block_roads.core import block_roads
+from roads_heralds.convert_roads_to_networks import read_network_graph, read_contracted_network_graph
+from roads_heralds.roads_to_networks.contract import ContractedRoadsGraph
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
+from visualization.visualizer import draw
+
+# the LOS, villages and roads graph stages are independent, they fill the artifact cache concurrently and the later
+# stages read the artifacts from it. the heralds depend only on the villages area and not on the LOS, which is used by
+# the figures
+
+
+def scenario_stage() -> Scenario:
+    return Scenario(heralds=None)
+
+
+def patient_polygons_stage(scenario: Scenario, villages) -> Tuple[Polygon, Polygon]:
+    return get_patient_filtered_polygons(scenario)
+
+
+def segmented_areas_stage(los, villages) -> SegmentedAreas:
+    return read_segmented_areas()
+
+
+def villages_area_stage(villages: MultiPolygon) -> MultiPolygon:
+    return buffer_villages(villages)
+
+
+def boundary_segments_stage(villages_area: MultiPolygon) -> BoundarySegments:
+    return calculate_boundary_segments(villages_area.boundary)
+
+
+def contracted_roads_graph_stage(roads_graph: RoadsGraph) -> Optional[ContractedRoadsGraph]:
+    return read_contracted_network_graph() if get_run_config().get_value('roads_graph_contraction') else None
+
+
+def noise_output_stage(scenario: Scenario, boundary_segments: BoundarySegments) -> Dict:
+    return place_heralds(boundary_segments, scenario.patient)
+
+
+def blocks_output_stage(roads_graph: RoadsGraph, contracted_roads_graph: Optional[ContractedRoadsGraph],
+                        villages_area: MultiPolygon, patient_polygons: Tuple[Polygon, Polygon]) -> Dict:
+    return block_roads(roads_graph, villages_area, patient_polygons[1], contracted_G=contracted_roads_graph)
+
+
+def heralds_stage(noise_output: Dict, blocks_output: Dict) -> HeraldSet:
+    return HeraldSet.concatenate([noise_output["heralds"], blocks_output["heralds"]])
+
+
+def full_figure_stage(scenario: Scenario, segmented_areas: SegmentedAreas, patient_polygons: Tuple[Polygon, Polygon],
+                      noise_output: Dict, blocks_output: Dict, heralds: HeraldSet) -> str:
+    scenario.heralds = heralds
+    to_file = f'full/{get_run_config().get_name()}'
+    draw(scenario=scenario,
+         seg_areas=segmented_areas,
+         patient_contagion_polygon=patient_polygons[0],
+         patient_effective_polygon=patient_polygons[1],
+         blocks_output=blocks_output,
+         noise_output=noise_output,
+         to_file=to_file)
+    return to_file
+
+
+def noise_figure_stage(scenario: Scenario, segmented_areas: SegmentedAreas,
+                       patient_polygons: Tuple[Polygon, Polygon], noise_output: Dict) -> str:
+    to_file = f'noise_only/{get_run_config().get_name()}'
+    draw(scenario=scenario,
+         seg_areas=segmented_areas,
+         patient_contagion_polygon=patient_polygons[0],
+         patient_effective_polygon=patient_polygons[1],
+         noise_output=noise_output,
+         to_file=to_file)
+    return to_file
+
+
+def blocks_figure_stage(scenario: Scenario, segmented_areas: SegmentedAreas,
+                        patient_polygons: Tuple[Polygon, Polygon], blocks_output: Dict) -> str:
+    to_file = f'blocks_only/{get_run_config().get_name()}'
+    draw(scenario=scenario,
+         seg_areas=segmented_areas,
+         patient_contagion_polygon=patient_polygons[0],
+         patient_effective_polygon=patient_polygons[1],
+         blocks_output=blocks_output,
+         to_file=to_file)
+    return to_file
+
+
+HERALDS_PIPELINE = Pipeline([
+    Stage('scenario', (), scenario_stage),
+    Stage('los', (), get_los),
+    Stage('villages', (), get_villages_outline),
+    Stage('roads_graph', (), read_network_graph),
+    Stage('patient_polygons', ('scenario', 'villages'), patient_polygons_stage),
+    Stage('segmented_areas', ('los', 'villages'), segmented_areas_stage),
+    Stage('villages_area', ('villages',), villages_area_stage),
+    Stage('boundary_segments', ('villages_area',), boundary_segments_stage),
+    Stage('contracted_roads_graph', ('roads_graph',), contracted_roads_graph_stage),
+    Stage('noise_output', ('scenario', 'boundary_segments'), noise_output_stage),
+    Stage('blocks_output', ('roads_graph', 'contracted_roads_graph', 'villages_area', 'patient_polygons'),
+          blocks_output_stage),
+    Stage('heralds', ('noise_output', 'blocks_output'), heralds_stage),
+    Stage('full_figure', ('scenario', 'segmented_areas', 'patient_polygons', 'noise_output', 'blocks_output',
+                          'heralds'), full_figure_stage),
+    Stage('noise_figure', ('scenario', 'segmented_areas', 'patient_polygons', 'noise_output'), noise_figure_stage),
+    Stage('blocks_figure', ('scenario', 'segmented_areas', 'patient_polygons', 'blocks_output'), blocks_figure_stage),
+])
@@ -0,0 +1,133 @@
+import argparse
+import os
+import time
+import traceback
+import warnings
+from typing import Dict, Optional
+
+import numpy as np
+
+from algo_config.algo_config import RunConfig, bind_config, get_run_config
+from dir_definitions import BENCHMARK_DIR
+from noise_heralds.los.los_generator import get_missing_dtm_files
+from pipeline.engine import DEFAULT_WORKERS
+from pipeline.stages import HERALDS_PIPELINE
+
+# the stages not depending on the patient location, run once per sweep
+PATIENT_INDEPENDENT_STAGES = ('villages', 'villages_area', 'boundary_segments', 'roads_graph',
+                              'contracted_roads_graph')
+
+
+def relative_locations_grid(n_south: int, n_west: int, margin: float = 0.1) -> np.ndarray:
+    """
+    Creates a grid of patient locations relative to the area bounds, as in the patient_location_south and
+    patient_location_west config values
+    :param n_south: number of locations along the south-north axis
+    :param n_west: number of locations along the west-east axis
+    :param margin: relative margin of the grid from the area bounds
+    :return: 2D array (n_south * n_west, 2) of relative locations
+    """
+    south, west = np.meshgrid(np.linspace(margin, 1 - margin, n_south), np.linspace(margin, 1 - margin, n_west),
+                              indexing='ij')
+    return np.stack([south.reshape(-1), west.reshape(-1)], axis=1)
+
+
+def resolve_with_los(with_los: Optional[bool]) -> bool:
+    """
+    Without the DTM files the LOS of other patient locations than the benchmark ones can not be calculated
+    :param with_los: whether the LOS is requested, or none to calculate it only if the DTM files of the area exist
+    :return: whether to calculate the LOS
+    :raises FileNotFoundError: if the LOS is requested and DTM files are missing
+    """
+    missing_dtm_files = get_missing_dtm_files()
+    if with_los is None:
+        if missing_dtm_files:
+            warnings.warn("Missing DTM files, the patient locations are solved without LOS")
+        return len(missing_dtm_files) == 0
+    if with_los and missing_dtm_files:
+        raise FileNotFoundError(f"Missing DTM files to calculate the LOS: {missing_dtm_files}")
+    return with_los
+
+
+def sweep_patient_locations(locations: np.ndarray, relative: bool = False, config: Optional[RunConfig] = None,
+                            with_los: Optional[bool] = None, workers: int = DEFAULT_WORKERS) -> Dict[str, np.ndarray]:
+    """
+    Solves the scenario of the area for every patient location. The villages, their boundary segments and the roads
+    graphs are loaded once, and only the patient-dependent stages run per location: the patient polygons, the front
+    points filtering and noise heralds, the roads blocking and optionally the LOS. A failing location is reported in
+    the error column and does not stop the sweep.
+    :param locations: 2D array of patient locations - lat,lon in degrees, or relative to the area bounds
+    :param relative: whether the locations are relative to the area bounds
+    :param config: the area config, the config of the current context by default
+    :param with_los: whether to calculate the LOS of every location, by default only if the DTM files exist
+    :param workers: number of stages of a location running at once
+    :return: columnar table, one row per location - the patient location, the noise and block heralds counts, the
+    visible fraction of the area (nan without LOS), the run time and the error (empty if none). The heralds of all the
+    locations are in flat columns, the heralds of location i are heralds_offsets[i]:heralds_offsets[i + 1]
+    """
+    config = config if config is not None else get_run_config()
+    locations = np.asarray(locations, dtype=float).reshape(-1, 2)
+    with bind_config(config):
+        area_outputs = HERALDS_PIPELINE.run(PATIENT_INDEPENDENT_STAGES, workers=workers).outputs
+        with_los = resolve_with_los(with_los)
+    targets = ('scenario', 'noise_output', 'blocks_output', 'heralds') + (('los',) if with_los else ())
+
+    patient_locations = np.full((len(locations), 2), np.nan)
+    noise_heralds = np.zeros(len(locations), dtype=np.int64)
+    block_heralds = np.zeros(len(locations), dtype=np.int64)
+    visible_fractions = np.full(len(locations), np.nan)
+    seconds = np.zeros(len(locations))
+    errors = np.full(len(locations), '', dtype=object)
+    heralds = []
+    for i, (south, west) in enumerate(locations):
+        location_config = config.replace(patient_location_type='relative' if relative else 'absolute',
+                                         patient_location_south=float(south), patient_location_west=float(west))
+        start_time = time.perf_counter()
+        try:
+            with bind_config(location_config):
+                outputs = HERALDS_PIPELINE.run(targets, workers=workers, outputs=area_outputs).outputs
+        except Exception:
+            errors[i] = traceback.format_exc()
+            heralds.append(None)
+        else:
+            patient_locations[i] = outputs['scenario'].patient.location
+            noise_heralds[i] = len(outputs['noise_output']['heralds'])
+            block_heralds[i] = len(outputs['blocks_output']['heralds'])
+            if with_los:
+                hidden, visible = outputs['los']
+                visible_fractions[i] = visible.area / (visible.area + hidden.area)
+            heralds.append(outputs['heralds'])
+        seconds[i] = time.perf_counter() - start_time
+
+    heralds_counts = [0 if location_heralds is None else len(location_heralds) for location_heralds in heralds]
+    heralds = [location_heralds for location_heralds in heralds if location_heralds is not None]
+    return {"patient_location": patient_locations,
+            "noise_heralds": noise_heralds,
+            "block_heralds": block_heralds,
+            "visible_fraction": visible_fractions,
+            "seconds": seconds,
+            "error": errors,
+            "heralds_offsets": np.concatenate([[0], np.cumsum(heralds_counts)]).astype(np.int64),
+            "heralds_locations": np.vstack([location_heralds.locations for location_heralds in heralds] +
+                                           [np.empty((0, 2))]),
+            "heralds_effective_radii": np.concatenate([location_heralds.effective_radii for location_heralds in heralds]
+                                                      + [np.empty(0)]),
+            "heralds_characters": np.concatenate([location_heralds.characters for location_heralds in heralds] +
+                                                 [np.empty(0, dtype=np.int8)])}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-scenario", help="scenario of the swept area", type=int, required=True)
+    parser.add_argument("-grid", help="number of relative locations along the south and west axes", nargs=2,
+                        type=int, default=[5, 5])
+    parser.add_argument("-out", help="path of the output .npz table", required=True)
+    args = parser.parse_args()
+
+    table = sweep_patient_locations(relative_locations_grid(*args.grid), relative=True,
+                                    config=RunConfig.from_file(os.path.join(BENCHMARK_DIR,
+                                                                            f"benchmark_{args.scenario}.yaml")))
+    np.savez(args.out, **{name: column.astype(str) if column.dtype == object else column
+                          for name, column in table.items()})
+    print(f'{np.sum(table["error"] == "")}/{len(table["error"])} locations solved, '
+          f'{np.mean(table["seconds"]):.2f}s per location')
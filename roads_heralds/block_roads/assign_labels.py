@@ -1,48 +1,52 @@
-from shapely.geometry import MultiLineString, Polygon, LineString
+from shapely.geometry import MultiLineString, Polygon
+from shapely.prepared import prep
 from collections import defaultdict
 from typing import Dict, Tuple
 import numpy as np
 
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
 
-def edge_is_contained(edge: Tuple[int, int], is_contained_in_patient_circle: np.ndarray) -> bool:
-    # both inner and outer nodes are in the effective polygon
-    return is_contained_in_patient_circle[edge[0]] and is_contained_in_patient_circle[edge[1]]
 
+def crossing_edges_mask(edges: np.ndarray, is_contained_in_patient_circle: np.ndarray) -> np.ndarray:
+    # exactly one of the inner and outer nodes is in the effective polygon
+    return is_contained_in_patient_circle[edges[:, 0]] != is_contained_in_patient_circle[edges[:, 1]]
 
-def edge_crosses(edge: Tuple[int, int], is_contained_in_patient_circle: np.ndarray) -> bool:
-    # one of the inner and outer nodes are in the effective polygon
-    return is_contained_in_patient_circle[edge[0]] or is_contained_in_patient_circle[edge[1]]
 
-
-def assign_edges_labels(edges_to_roads_dict: Dict[Tuple, LineString], is_contained_in_patient_circle: np.ndarray,
-                        patient_effective_polygon: Polygon, no_entrance_polygon: Polygon) -> Dict[Tuple[int,int],str]:
+def assign_edges_labels(G: RoadsGraph, is_contained_in_patient_circle: np.ndarray, patient_effective_polygon: Polygon,
+                        no_entrance_polygon: Polygon, intersects_no_entrance: np.ndarray) -> Dict[Tuple[int, int], str]:
     """
     Assigns labels to edges:
-    'contained' - edge is contained in patient_effective_polygon
     'safe_crossing' - edge crosses the patient_effective_polygon, and is outside the dangerous zone
-    'danger_crossing' - edge crosses the patient_effective_polygon, and is outside the dangerous zone
-    If edge is marked, aka crosses the polygon, save the contained node first and the second is the outer node
+    'danger_crossing' - edge crosses the patient_effective_polygon, and its part inside reaches the dangerous zone
+    If edge is marked, aka crosses the polygon, save the contained node first and the second is the outer node.
+    The crossing edges are found at once from the nodes containment, and only the crossing edges whose road reaches
+    the dangerous zone are intersected with the effective polygon.
+    :param G: roads network
+    :param is_contained_in_patient_circle: mask of the nodes contained in the effective polygon
+    :param patient_effective_polygon: effective polygon
+    :param no_entrance_polygon: danger polygon
+    :param intersects_no_entrance: mask of the edges whose road intersects the danger polygon
+    :return: dict from the crossing edges to the label
     """
-
-    edges_labels = {}
-    for edge in edges_to_roads_dict.keys():
-        if edge_is_contained(edge, is_contained_in_patient_circle):
-            pass
-        elif edge_crosses(edge, is_contained_in_patient_circle):
-            road = edges_to_roads_dict[edge]
-            intersection_line = patient_effective_polygon.intersection(road)
-            if type(intersection_line) == MultiLineString:
-                intersection_line = max(intersection_line, key=lambda line: line.length)
-
-            if is_contained_in_patient_circle[edge[1]]:
-                edge = (edge[1], edge[0])
-
-            if intersection_line.intersects(no_entrance_polygon):
-                edges_labels[edge] = 'danger_crossing'
-            else:
-                edges_labels[edge] = 'safe_crossing'
-
-    return edges_labels
+    edges = np.asarray(G.edges)
+    crossing = np.flatnonzero(crossing_edges_mask(edges, is_contained_in_patient_circle))
+
+    # the contained node first
+    oriented_edges = edges[crossing]
+    flip = is_contained_in_patient_circle[oriented_edges[:, 1]]
+    oriented_edges[flip] = oriented_edges[flip, ::-1]
+
+    # a road outside the dangerous zone is safe without intersecting it with the effective polygon
+    danger = intersects_no_entrance[crossing]
+    prepared_no_entrance_polygon = prep(no_entrance_polygon)
+    for i in np.flatnonzero(danger):
+        intersection_line = patient_effective_polygon.intersection(G.road(crossing[i]))
+        if type(intersection_line) == MultiLineString:
+            intersection_line = max(intersection_line, key=lambda line: line.length)
+        danger[i] = prepared_no_entrance_polygon.intersects(intersection_line)
+
+    return {edge: 'danger_crossing' if edge_danger else 'safe_crossing'
+            for edge, edge_danger in zip(map(tuple, oriented_edges.tolist()), danger)}
 
 
 def get_inner_node(edge: Tuple[int, int], is_contained_in_patient_circle: np.ndarray) -> int:
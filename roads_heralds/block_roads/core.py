@@ -1,53 +1,342 @@
-from shapely.geometry import MultiPolygon, Polygon
+from typing import Optional, Dict, Tuple
+
+import numpy as np
+from shapely.geometry import MultiPolygon, Polygon, Point
+from shapely.prepared import prep
 
 from general_utils.patient_utils import get_no_entrance_polygon
+from algo_config.algo_config import get_run_config
+from roads_heralds.block_roads.edge_predicates import RoadsIndex, EdgePredicates, compute_edge_predicates, \
+    split_edges_predicates
 from roads_heralds.block_roads.assign_labels import assign_edges_labels, assign_nodes_labels
 from roads_heralds.block_roads.fix_nodes_locs import update_nodes_plotting_locs
+from roads_heralds.block_roads.min_cut import min_cut_edges_labels
 from roads_heralds.block_roads.post_process import post_process
 
-from roads_heralds.roads_to_networks.roads_utils import get_geo_locs, get_roads
+from roads_heralds.roads_to_networks.contract import ContractedRoadsGraph, split_chains
+from roads_heralds.roads_to_networks.graph_kernels import find_edges_ids
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
 
+from models.area_context import get_area_context
+from models.herald import HeraldSet
 from models.scenario import Scenario
 from general_utils.geometric_utils import point_in_multipolygon
-import networkx as nx
 
+BLOCKED_NODES_LABELS = ['danger_marked', 'safe_marked']
+ROAD_BLOCK_HERALD_EFFECTIVE_RADIUS = 0.0
+
+
+def contained_nodes(G: RoadsGraph, contracted_G: ContractedRoadsGraph, patient_effective_polygon: Polygon,
+                    intersects_patient_boundary: np.ndarray) -> np.ndarray:
+    """
+    Finds the nodes of the original graph contained in the patient effective polygon. Only the nodes of the contracted
+    graph are tested, and the inner nodes of the chains crossing the polygon boundary. The inner nodes of any other
+    chain lie on the same side of the boundary as its ends.
+    :param G: the original roads network
+    :param contracted_G: the contracted roads network
+    :param patient_effective_polygon: the patient effective polygon
+    :param intersects_patient_boundary: mask of the contracted edges intersecting the effective polygon boundary
+    :return: mask of the original nodes contained in the patient effective polygon
+    """
+    nodes_geo_locs = np.asarray(G.nodes_geo_locs)
+    is_contained = np.zeros(G.n_nodes, dtype=bool)
+    is_contained[contracted_G.nodes_ids] = point_in_multipolygon(nodes_geo_locs[contracted_G.nodes_ids],
+                                                                 patient_effective_polygon)
+
+    chains_nodes = np.asarray(contracted_G.chains_nodes)
+    chains_offsets = np.asarray(contracted_G.chains_nodes_offsets)
+    chains_ids = np.repeat(np.arange(contracted_G.n_edges), np.diff(chains_offsets))
+    is_inner = np.ones(len(chains_nodes), dtype=bool)
+    is_inner[chains_offsets[:-1]] = False
+    is_inner[chains_offsets[1:] - 1] = False
+    crossing = is_inner & intersects_patient_boundary[chains_ids]
+    not_crossing = is_inner & ~crossing
+    is_contained[chains_nodes[not_crossing]] = is_contained[chains_nodes[chains_offsets[chains_ids[not_crossing]]]]
+    is_contained[chains_nodes[crossing]] = point_in_multipolygon(nodes_geo_locs[chains_nodes[crossing]],
+                                                                 patient_effective_polygon)
+    return is_contained
 
-def block_roads(G: nx.Graph, villages: MultiPolygon, patient_effective_polygon: Polygon):
+
+def expand_edges_labels(contracted_G: ContractedRoadsGraph, split_G: RoadsGraph, contracted_edges_ids: np.ndarray,
+                        original_edges_ids: np.ndarray, edges_labels: Dict,
+                        inner_nodes_mask: np.ndarray) -> Tuple[Dict, np.ndarray]:
+    """
+    Expands the edges labels of a graph with split chains, see split_chains, to the original graph. A labeled original
+    edge keeps its label. A contracted chain is labeled only by the min cut solver, and the original graph is then
+    labeled at the chain edge at the end given second: the outer end of a blocked road, the rest of the chain being on
+    the inner side of the cut, or the blocked node, the rest of the chain being on the outer side.
+    The labels are ordered by the original edges ids, as when labeling the original graph.
+    :param contracted_G: the contracted roads network
+    :param split_G: the roads network with split chains
+    :param contracted_edges_ids: the contracted edge every edge of split_G belongs to
+    :param original_edges_ids: the original edge id of every edge of split_G, -1 for the contracted chains
+    :param edges_labels: the edges labels of split_G, the inner node first
+    :param inner_nodes_mask: mask of the nodes on the inner side
+    :return: the edges labels of the original graph, and the mask of the original nodes on the inner side
+    """
+    inner_nodes_mask = inner_nodes_mask.copy()
+    labeled_edges = []
+    for (edge, edge_label), edge_id in zip(edges_labels.items(), find_edges_ids(split_G, list(edges_labels.keys()))):
+        original_edge_id = int(original_edges_ids[edge_id])
+        if original_edge_id < 0:
+            chain_nodes = contracted_G.chain_nodes(contracted_edges_ids[edge_id]).tolist()
+            chain_edges = contracted_G.chain_edges(contracted_edges_ids[edge_id]).tolist()
+            if chain_nodes[0] != edge[1]:
+                chain_nodes, chain_edges = chain_nodes[::-1], chain_edges[::-1]
+            inner_nodes_mask[chain_nodes[1:-1]] = inner_nodes_mask[edge[0]]
+            edge, original_edge_id = (chain_nodes[1], chain_nodes[0]), chain_edges[0]
+        labeled_edges.append((original_edge_id, edge, edge_label))
+    labeled_edges.sort(key=lambda labeled_edge: labeled_edge[0])
+    return {edge: edge_label for _, edge, edge_label in labeled_edges}, inner_nodes_mask
+
+
+def block_roads(G: RoadsGraph, villages: MultiPolygon, patient_effective_polygon: Polygon,
+                roads_index: Optional[RoadsIndex] = None, contracted_G: Optional[ContractedRoadsGraph] = None):
     scenario = Scenario(heralds=None)
     no_entrance_polygon = get_no_entrance_polygon(scenario)
 
+    # the roads index depends only on the graph, so it is built once per area unless given. with a contracted graph
+    # it is the index of the contracted graph
+    if roads_index is None:
+        if contracted_G is not None:
+            roads_index = get_area_context().memoize('contracted_roads_index', lambda: RoadsIndex(contracted_G))
+        else:
+            roads_index = get_area_context().memoize('roads_index', lambda: RoadsIndex(G))
+
+    # intersect all the edges at once with the scenario geometries
+    edges_predicates = compute_edge_predicates(roads_index,
+                                               no_entrance_polygon,
+                                               villages,
+                                               scenario.bbox.get_end_of_map_polygon(),
+                                               patient_effective_polygon)
+
+    if contracted_G is not None:
+        is_contained_in_patient_polygon = contained_nodes(G, contracted_G, patient_effective_polygon,
+                                                          edges_predicates.intersects_patient_boundary)
+        return label_contracted_roads(G, contracted_G, scenario, no_entrance_polygon, patient_effective_polygon,
+                                      villages, is_contained_in_patient_polygon, edges_predicates,
+                                      get_area_context().memoize('edges_to_roads_dict', G.get_roads),
+                                      G.get_geo_locs())
+
     # get the geo locations
-    nodes_geo_locs = get_geo_locs(G)
+    nodes_geo_locs = G.get_geo_locs()
 
-    # get the linestrings of the underlying roads_heralds as the attribute of an edge
-    edges_to_roads_dict = get_roads(G)
+    # get the linestrings of the underlying roads_heralds per edge
+    edges_to_roads_dict = G.get_roads()
 
     # find for each intersection if it is contained in the patient effective polygon
     is_contained_in_patient_polygon = point_in_multipolygon(nodes_geo_locs, patient_effective_polygon)
 
+    return label_roads(G, scenario, no_entrance_polygon, patient_effective_polygon, is_contained_in_patient_polygon,
+                       edges_predicates, edges_to_roads_dict, nodes_geo_locs)
+
+
+def label_edges(G: RoadsGraph, no_entrance_polygon: Polygon, patient_effective_polygon: Polygon,
+                is_contained_in_patient_polygon: np.ndarray,
+                edges_predicates: EdgePredicates) -> Tuple[Dict[Tuple[int, int], str], np.ndarray]:
+    """
+    Labels the edges of the graph with the solver of the current config
+    :param G: the roads network
+    :param no_entrance_polygon: danger polygon
+    :param patient_effective_polygon: the patient effective polygon
+    :param is_contained_in_patient_polygon: mask of the nodes contained in the patient effective polygon
+    :param edges_predicates: the edges predicates of the scenario
+    :return: the edges labels, the inner node first, and the mask of the nodes on the inner side
+    """
+    if get_run_config().get_value('roads_blocking_solver') == 'min_cut':
+        # label the edges of a cut with the fewest heralds between the outsiders and the no entrance polygon. the
+        # inner side of the cut takes the role of the effective polygon when choosing the blocked node of every edge
+        return min_cut_edges_labels(G, no_entrance_polygon, is_contained_in_patient_polygon, edges_predicates)
+
     # calculate label per edge
-    edges_labels = assign_edges_labels(edges_to_roads_dict,
+    edges_labels = assign_edges_labels(G,
                                        is_contained_in_patient_polygon,
                                        patient_effective_polygon,
-                                       no_entrance_polygon)
+                                       no_entrance_polygon,
+                                       edges_predicates.intersects_no_entrance)
 
     # post process the selected edges
-    edges_labels = post_process(G, edges_labels,
-                                edges_to_roads_dict,
-                                scenario,
-                                no_entrance_polygon,
-                                villages,nodes_geo_locs)
+    edges_labels = post_process(G, edges_labels, edges_predicates)
+    return edges_labels, is_contained_in_patient_polygon
+
 
+def place_road_blocks(scenario: Scenario, patient_effective_polygon: Polygon, edges_labels: Dict,
+                      inner_nodes_mask: np.ndarray, edges_to_roads_dict: Dict, nodes_geo_locs: Dict) -> Dict:
+    """
+    Labels the nodes given the edges labels, and places the road block heralds
+    :param scenario: the scenario
+    :param patient_effective_polygon: the patient effective polygon
+    :param edges_labels: the edges labels, the inner node first
+    :param inner_nodes_mask: mask of the nodes on the inner side
+    :param edges_to_roads_dict: the linestrings of the roads per edge
+    :param nodes_geo_locs: the geo locations of the nodes, updated with the display locations of the blocks
+    :return: the block output
+    """
     # for all post-processed filtered edges, assign the relevant node the label
-    nodes_labels = assign_nodes_labels(edges_labels, is_contained_in_patient_polygon)
+    nodes_labels = assign_nodes_labels(edges_labels, inner_nodes_mask)
 
     # get the display location of nodes. if able - push node to the boundary of the effective polygon
     nodes_labels = update_nodes_plotting_locs(nodes_labels, edges_labels, edges_to_roads_dict, nodes_geo_locs,
                                               patient_effective_polygon)
 
+    # a road block herald stands at every marked node
+    blocked_nodes = [node for node, node_label in nodes_labels.items() if node_label in BLOCKED_NODES_LABELS]
+    heralds = HeraldSet(np.array([nodes_geo_locs[node] for node in blocked_nodes]).reshape(-1, 2),
+                        ROAD_BLOCK_HERALD_EFFECTIVE_RADIUS)
+
     block_output = {"scenario": scenario,
                     "nodes_labels": nodes_labels,
                     "edges_labels": edges_labels,
                     "edges_to_roads_dict": edges_to_roads_dict,
-                    "nodes_geo_locs": nodes_geo_locs}
+                    "nodes_geo_locs": nodes_geo_locs,
+                    "heralds": heralds}
     return block_output
+
+
+def label_roads(G: RoadsGraph, scenario: Scenario, no_entrance_polygon: Polygon, patient_effective_polygon: Polygon,
+                is_contained_in_patient_polygon: np.ndarray, edges_predicates: EdgePredicates,
+                edges_to_roads_dict: Dict, nodes_geo_locs: Dict) -> Dict:
+    """
+    Labels the edges and nodes of the graph given the geometric predicates of the scenario, and places the road block
+    heralds
+    :param G: the roads network
+    :param scenario: the scenario
+    :param no_entrance_polygon: danger polygon
+    :param patient_effective_polygon: the patient effective polygon
+    :param is_contained_in_patient_polygon: mask of the nodes contained in the patient effective polygon
+    :param edges_predicates: the edges predicates of the scenario
+    :param edges_to_roads_dict: the linestrings of the roads per edge
+    :param nodes_geo_locs: the geo locations of the nodes, updated with the display locations of the blocks
+    :return: the block output
+    """
+    edges_labels, inner_nodes_mask = label_edges(G, no_entrance_polygon, patient_effective_polygon,
+                                                 is_contained_in_patient_polygon, edges_predicates)
+    return place_road_blocks(scenario, patient_effective_polygon, edges_labels, inner_nodes_mask,
+                             edges_to_roads_dict, nodes_geo_locs)
+
+
+def label_contracted_roads(G: RoadsGraph, contracted_G: ContractedRoadsGraph, scenario: Scenario,
+                           no_entrance_polygon: Polygon, patient_effective_polygon: Polygon, villages: MultiPolygon,
+                           is_contained_in_patient_polygon: np.ndarray, edges_predicates: EdgePredicates,
+                           edges_to_roads_dict: Dict, nodes_geo_locs: Dict) -> Dict:
+    """
+    Labels the roads as label_roads does on the original graph, on the contracted graph wherever this gives the same
+    labels. A chain stays contracted only if it lies outside the effective polygon and intersects none of the
+    scenario geometries: its inner nodes are then neither labeled, nor walked by the post processing, nor the
+    terminals of the min cut. Every other chain is split back into its original edges.
+    :param G: the original roads network
+    :param contracted_G: the contracted roads network
+    :param scenario: the scenario
+    :param no_entrance_polygon: danger polygon
+    :param patient_effective_polygon: the patient effective polygon
+    :param villages: the villages
+    :param is_contained_in_patient_polygon: mask of the original nodes contained in the patient effective polygon
+    :param edges_predicates: the edges predicates of the contracted graph
+    :param edges_to_roads_dict: the linestrings of the roads per edge of the original graph
+    :param nodes_geo_locs: the geo locations of the original nodes, updated with the display locations of the blocks
+    :return: the block output on the original graph
+    """
+    contracted_edges = np.asarray(contracted_G.nodes_ids)[np.asarray(contracted_G.edges)]
+    split_mask = is_contained_in_patient_polygon[contracted_edges].any(axis=1) | \
+        edges_predicates.intersects_no_entrance | edges_predicates.intersects_village_or_end_of_map | \
+        edges_predicates.intersects_patient_boundary
+    split_G, contracted_edges_ids, original_edges_ids = split_chains(G, contracted_G, split_mask)
+    split_predicates = split_edges_predicates(G, edges_predicates, contracted_edges_ids, original_edges_ids,
+                                              no_entrance_polygon, villages, scenario.bbox.get_end_of_map_polygon(),
+                                              patient_effective_polygon)
+
+    edges_labels, inner_nodes_mask = label_edges(split_G, no_entrance_polygon, patient_effective_polygon,
+                                                 is_contained_in_patient_polygon, split_predicates)
+    edges_labels, inner_nodes_mask = expand_edges_labels(contracted_G, split_G, contracted_edges_ids,
+                                                         original_edges_ids, edges_labels, inner_nodes_mask)
+    return place_road_blocks(scenario, patient_effective_polygon, edges_labels, inner_nodes_mask,
+                             edges_to_roads_dict, nodes_geo_locs)
+
+
+class IncrementalBlocker:
+    """
+    Blocks the roads of successive patient locations on the same graph, e.g. along the route of a moving patient.
+    The edges predicates of the villages and the end of map do not depend on the patient and are computed once. The
+    containment of the nodes in the effective polygon and the predicates of the patient polygons can change only
+    where these polygons changed, so only the nodes and the edges around the symmetric difference of the previous and
+    the new polygons are tested again. The labels are then assigned as by block_roads, and are the same.
+    """
+
+    def __init__(self, G: RoadsGraph, villages: MultiPolygon, contracted_G: Optional[ContractedRoadsGraph] = None):
+        self._G = G
+        self._contracted_G = contracted_G
+        self._villages = villages
+        if contracted_G is not None:
+            self._roads_index = get_area_context().memoize('contracted_roads_index', lambda: RoadsIndex(contracted_G))
+        else:
+            self._roads_index = get_area_context().memoize('roads_index', lambda: RoadsIndex(G))
+        self._intersects_villages = self._roads_index.intersects(villages)
+        self._intersects_end_of_map = self._roads_index.intersects(
+            Scenario(heralds=None).bbox.get_end_of_map_polygon())
+        # the nodes containment is kept for the original nodes, also with a contracted graph
+        self._nodes_geo_locs = G.get_geo_locs()
+        self._nodes_locs = np.asarray(G.nodes_geo_locs, dtype=float).reshape(-1, 2)
+        self._edges_to_roads_dict = G.get_roads()
+
+        # the patient geometries and their predicates in the previous block
+        self._no_entrance_polygon = None
+        self._patient_effective_polygon = None
+        self._is_contained_in_patient_polygon = None
+        self._intersects_no_entrance = None
+        self._intersects_patient_boundary = None
+
+    def _update_contained(self, patient_effective_polygon: Polygon) -> np.ndarray:
+        changed = self._patient_effective_polygon.symmetric_difference(patient_effective_polygon)
+        is_contained = self._is_contained_in_patient_polygon.copy()
+        if changed.is_empty:
+            return is_contained
+        # a node can enter or leave the polygon only if it lies in the symmetric difference. the nodes in its bounding
+        # box are tested against the prepared symmetric difference first, which is cheap
+        min_x, min_y, max_x, max_y = changed.bounds
+        candidates = np.flatnonzero((self._nodes_locs[:, 0] >= min_x) & (self._nodes_locs[:, 0] <= max_x) &
+                                    (self._nodes_locs[:, 1] >= min_y) & (self._nodes_locs[:, 1] <= max_y))
+        prepared_changed = prep(changed)
+        candidates = np.array([node for node in candidates.tolist()
+                               if prepared_changed.intersects(Point(self._nodes_locs[node]))], dtype=np.int64)
+        is_contained[candidates] = point_in_multipolygon(self._nodes_locs[candidates], patient_effective_polygon)
+        return is_contained
+
+    def block(self, patient_effective_polygon: Polygon) -> Dict:
+        """
+        Blocks the roads for the patient of the current config
+        :param patient_effective_polygon: the patient effective polygon
+        :return: the block output, as returned by block_roads
+        """
+        scenario = Scenario(heralds=None)
+        no_entrance_polygon = get_no_entrance_polygon(scenario)
+        if self._patient_effective_polygon is None:
+            is_contained_in_patient_polygon = point_in_multipolygon(self._nodes_locs, patient_effective_polygon)
+            intersects_no_entrance = self._roads_index.intersects(no_entrance_polygon)
+            intersects_patient_boundary = self._roads_index.intersects(patient_effective_polygon.boundary)
+        else:
+            is_contained_in_patient_polygon = self._update_contained(patient_effective_polygon)
+            intersects_no_entrance = self._roads_index.update_intersects(self._intersects_no_entrance,
+                                                                         self._no_entrance_polygon,
+                                                                         no_entrance_polygon)
+            intersects_patient_boundary = self._roads_index.update_intersects(
+                self._intersects_patient_boundary, self._patient_effective_polygon.boundary,
+                patient_effective_polygon.boundary)
+
+        self._no_entrance_polygon = no_entrance_polygon
+        self._patient_effective_polygon = patient_effective_polygon
+        self._is_contained_in_patient_polygon = is_contained_in_patient_polygon
+        self._intersects_no_entrance = intersects_no_entrance
+        self._intersects_patient_boundary = intersects_patient_boundary
+
+        edges_predicates = EdgePredicates(intersects_no_entrance=intersects_no_entrance,
+                                          intersects_villages=self._intersects_villages,
+                                          intersects_end_of_map=self._intersects_end_of_map,
+                                          intersects_patient_boundary=intersects_patient_boundary)
+        # the display locations of the blocks are added to the nodes locations, so every block gets its own copy
+        if self._contracted_G is not None:
+            return label_contracted_roads(self._G, self._contracted_G, scenario, no_entrance_polygon,
+                                          patient_effective_polygon, self._villages, is_contained_in_patient_polygon,
+                                          edges_predicates, self._edges_to_roads_dict, dict(self._nodes_geo_locs))
+        return label_roads(self._G, scenario, no_entrance_polygon, patient_effective_polygon,
+                           is_contained_in_patient_polygon, edges_predicates, self._edges_to_roads_dict,
+                           dict(self._nodes_geo_locs))
@@ -0,0 +1,126 @@
+from typing import NamedTuple
+
+import numpy as np
+from shapely.geometry.base import BaseGeometry
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
+
+
+class RoadsIndex:
+    """
+    Spatial index over the roads of every edge of the graph. It depends only on the graph, so it is built once and
+    reused by all the scenarios blocked on the same graph.
+    """
+
+    def __init__(self, G: RoadsGraph):
+        self.roads = [G.road(edge_id) for edge_id in range(G.n_edges)]
+        self.tree = STRtree(self.roads)
+        self.index_by_id = {id(road): i for i, road in enumerate(self.roads)}
+
+    def intersects(self, geometry: BaseGeometry) -> np.ndarray:
+        """
+        Finds the roads intersecting the geometry. Only the roads whose bounding box intersects the geometry are
+        tested, against the prepared geometry
+        :param geometry: any shapely geometry
+        :return: boolean array, indexed by the edge id
+        """
+        mask = np.zeros(len(self.roads), dtype=bool)
+        if geometry.is_empty:
+            return mask
+        prepared_geometry = prep(geometry)
+        for road in self.tree.query(geometry):
+            if prepared_geometry.intersects(road):
+                mask[self.index_by_id[id(road)]] = True
+        return mask
+
+    def update_intersects(self, mask: np.ndarray, previous_geometry: BaseGeometry,
+                          geometry: BaseGeometry) -> np.ndarray:
+        """
+        Finds the roads intersecting a geometry, given the roads intersecting a previous version of it. A road can
+        start or stop intersecting only where the two geometries differ, so only the roads intersecting their
+        symmetric difference are tested again. For a moving patient these are the roads near the previous and the new
+        boundaries, not all the roads around the patient
+        :param mask: the roads intersecting the previous geometry, indexed by the edge id
+        :param previous_geometry: the previous geometry
+        :param geometry: the new geometry
+        :return: boolean array, indexed by the edge id
+        """
+        changed = previous_geometry.symmetric_difference(geometry)
+        mask = mask.copy()
+        if changed.is_empty:
+            return mask
+        prepared_changed = prep(changed)
+        prepared_geometry = prep(geometry) if not geometry.is_empty else None
+        for road in self.tree.query(changed):
+            if prepared_changed.intersects(road):
+                mask[self.index_by_id[id(road)]] = prepared_geometry is not None and prepared_geometry.intersects(road)
+        return mask
+
+
+class EdgePredicates(NamedTuple):
+    """
+    Per scenario geometric predicates of every edge of the graph, indexed by the edge id
+    """
+    intersects_no_entrance: np.ndarray
+    intersects_villages: np.ndarray
+    intersects_end_of_map: np.ndarray
+    intersects_patient_boundary: np.ndarray
+
+    @property
+    def intersects_village_or_end_of_map(self) -> np.ndarray:
+        return self.intersects_villages | self.intersects_end_of_map
+
+
+def compute_edge_predicates(roads_index: RoadsIndex, no_entrance_polygon: BaseGeometry, villages: BaseGeometry,
+                            end_of_map_polygon: BaseGeometry,
+                            patient_effective_polygon: BaseGeometry) -> EdgePredicates:
+    """
+    Computes the geometric predicates of all the edges in one bulk pass per geometry
+    :param roads_index: spatial index over the roads of the graph
+    :param no_entrance_polygon: danger polygon
+    :param villages: villages multipolygon
+    :param end_of_map_polygon: the end of map polygon
+    :param patient_effective_polygon: the patient effective polygon
+    :return: the edges predicates
+    """
+    return EdgePredicates(intersects_no_entrance=roads_index.intersects(no_entrance_polygon),
+                          intersects_villages=roads_index.intersects(villages),
+                          intersects_end_of_map=roads_index.intersects(end_of_map_polygon),
+                          intersects_patient_boundary=roads_index.intersects(patient_effective_polygon.boundary))
+
+
+def split_edges_predicates(G: RoadsGraph, contracted_predicates: EdgePredicates, contracted_edges_ids: np.ndarray,
+                           original_edges_ids: np.ndarray, no_entrance_polygon: BaseGeometry, villages: BaseGeometry,
+                           end_of_map_polygon: BaseGeometry,
+                           patient_effective_polygon: BaseGeometry) -> EdgePredicates:
+    """
+    Computes the geometric predicates of the edges of a graph whose contracted chains are partly split, see
+    split_chains. A contracted chain keeps the predicates of its contracted edge. An original edge can intersect a
+    geometry only if its whole chain does, so only these original edges are intersected with the geometry.
+    :param G: the original roads graph
+    :param contracted_predicates: the predicates of the edges of the contracted graph
+    :param contracted_edges_ids: the contracted edge every edge belongs to
+    :param original_edges_ids: the original edge id of every edge, -1 for the contracted chains
+    :param no_entrance_polygon: danger polygon
+    :param villages: villages multipolygon
+    :param end_of_map_polygon: the end of map polygon
+    :param patient_effective_polygon: the patient effective polygon
+    :return: the edges predicates
+    """
+    def split_predicate(contracted_predicate: np.ndarray, geometry: BaseGeometry) -> np.ndarray:
+        predicate = contracted_predicate[contracted_edges_ids]
+        candidates = np.flatnonzero(predicate & (original_edges_ids >= 0))
+        if len(candidates) > 0:
+            prepared_geometry = prep(geometry)
+            predicate[candidates] = [prepared_geometry.intersects(G.road(edge_id))
+                                     for edge_id in original_edges_ids[candidates].tolist()]
+        return predicate
+
+    return EdgePredicates(
+        intersects_no_entrance=split_predicate(contracted_predicates.intersects_no_entrance, no_entrance_polygon),
+        intersects_villages=split_predicate(contracted_predicates.intersects_villages, villages),
+        intersects_end_of_map=split_predicate(contracted_predicates.intersects_end_of_map, end_of_map_polygon),
+        intersects_patient_boundary=split_predicate(contracted_predicates.intersects_patient_boundary,
+                                                    patient_effective_polygon.boundary))
@@ -1,17 +1,21 @@
-from typing import Dict, Tuple
+from collections import defaultdict
+from typing import Dict, Tuple, List
 
-from shapely.geometry import MultiPoint, LineString, Polygon
+from shapely.geometry import LineString, Polygon
 import numpy as np
 
+from general_utils.geometric_utils import first_boundary_intersections
 from roads_heralds.roads_to_networks.roads_utils import get_road_by_edge_key
 
 
-def get_edges_ending_at_node(node: int, edges_labels: Dict[Tuple, str]):
-    edges = []
+def index_edges_by_end_node(edges_labels: Dict[Tuple, str]) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    :return: dict mapping from node to the labeled edges ending at this node
+    """
+    edges_ending_at_node = defaultdict(list)
     for edge in edges_labels.keys():
-        if edge[1] == node:
-            edges.append(edge)
-    return edges
+        edges_ending_at_node[edge[1]].append(edge)
+    return edges_ending_at_node
 
 
 def update_nodes_plotting_locs(nodes_labels: Dict[int, str],
@@ -20,34 +24,39 @@ def update_nodes_plotting_locs(nodes_labels: Dict[int, str],
                                nodes_geo_locs: Dict[int, Tuple[float, float]],
                                patient_effective_polygon: Polygon):
     """
-    Move every safe-marked node to the boundary of the effective polygon, if there is not filtered edge that ends
-    at this node
+    Move every danger-marked node to the boundary of the effective polygon, if there is not filtered edge that ends
+    at this node. The boundary intersections of the roads of all the moved nodes are computed at once.
     :param nodes_labels: dict mapping from node to it's label
     :param edges_labels: dict mapping from edge to it's label
     :param edges_to_roads_dict: dict mapping from tuple of ints to the road linestring
     :param nodes_geo_locs: dict mapping from node to it's geo location in degrees lat,lon
     :param patient_effective_polygon: effective polygon
     """
+    edges_ending_at_node = index_edges_by_end_node(edges_labels)
+
+    # if there is even one filtered edge, keep the block at the same point. else all edges are dangerous (have not
+    # been filtered before), so the blockage must be kept but can be moved inward, to the intersection with the
+    # polygon itself
+    moved_nodes = [node for node, node_label in nodes_labels.items() if node_label == 'danger_marked' and
+                   all(edges_labels[edge] != 'filtered' for edge in edges_ending_at_node[node])]
+    moved_edges = [edge for node in moved_nodes for edge in edges_ending_at_node[node]]
+    intersections = first_boundary_intersections(
+        [np.array(get_road_by_edge_key(edge, edges_to_roads_dict).coords) for edge in moved_edges],
+        patient_effective_polygon.boundary)
+    intersections_by_edge = dict(zip(moved_edges, intersections))
+
     index = len(nodes_geo_locs)
     new_nodes_labels = nodes_labels.copy()
-    for node, node_label in nodes_labels.items():
-        if nodes_labels[node] == 'danger_marked':
-            edges_ending_at_node = get_edges_ending_at_node(node, edges_labels)
-            current_labels = [edges_labels[edge] for edge in edges_ending_at_node]
-            # if there is even one filtered edge, keep the block at the same point
-            if 'filtered' in current_labels:
-                continue
-
-            # else all edges are dangerous (have not been filtered before), so the blockage must be kept but can be
-            # moved inward, to the intersection with the polygon itself
-            for edge in edges_ending_at_node:
-                road = get_road_by_edge_key(edge, edges_to_roads_dict)
-                intersection = road.intersection(patient_effective_polygon.boundary)
-                if type(intersection) == MultiPoint:
-                    intersection = intersection[0]
-                nodes_geo_locs[index] = np.array(intersection).reshape(2)
-                new_nodes_labels[index] = node_label
-                index += 1
-            nodes_geo_locs.pop(node, None)
-            new_nodes_labels.pop(node, None)
+    for node in moved_nodes:
+        node_intersections = [intersections_by_edge[edge] for edge in edges_ending_at_node[node]]
+        # a road that does not cross the polygon boundary (possible with the min cut solver) keeps the block
+        if any(np.isnan(intersection).any() for intersection in node_intersections):
+            continue
+
+        for intersection in node_intersections:
+            nodes_geo_locs[index] = intersection
+            new_nodes_labels[index] = nodes_labels[node]
+            index += 1
+        nodes_geo_locs.pop(node, None)
+        new_nodes_labels.pop(node, None)
     return new_nodes_labels
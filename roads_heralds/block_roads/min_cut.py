@@ -0,0 +1,117 @@
+from typing import Dict, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import maximum_flow, breadth_first_order
+from shapely.geometry import Polygon
+
+from general_utils.geometric_utils import point_in_multipolygon
+from roads_heralds.block_roads.edge_predicates import EdgePredicates
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
+
+
+def find_terminals(G: RoadsGraph, is_contained_in_patient_polygon: np.ndarray,
+                   edges_predicates: EdgePredicates) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the nodes the outsiders come from and the nodes they must not pass.
+    Sources are the outer nodes of the edges reaching a village or the end of map. Sinks are both nodes of the edges
+    reaching the no entrance polygon with an inner node: an outsider passing any of them can walk into the no entrance
+    polygon. A node that is both is only a sink, it must be blocked anyway.
+    :param G: roads network
+    :param is_contained_in_patient_polygon: mask of the nodes contained in the patient effective polygon
+    :param edges_predicates: the geometric predicates of all the edges
+    :return: masks of the sources and the sinks
+    """
+    edges = np.asarray(G.edges)
+    sources = np.zeros(G.n_nodes, dtype=bool)
+    sources[edges[edges_predicates.intersects_village_or_end_of_map].reshape(-1)] = True
+    sources &= ~is_contained_in_patient_polygon
+
+    sinks = np.zeros(G.n_nodes, dtype=bool)
+    sinks[edges[edges_predicates.intersects_no_entrance &
+                is_contained_in_patient_polygon[edges].any(axis=1)].reshape(-1)] = True
+    return sources & ~sinks, sinks
+
+
+def min_cut_sides(G: RoadsGraph, sources: np.ndarray, sinks: np.ndarray,
+                  unblockable: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds a cut between the sources and the sinks with the fewest road block heralds, with a single max flow run.
+    A herald blocks either a single road or a whole junction, so every node is split into an entry and an exit
+    joined by an edge of capacity 1, and every road is an undirected edge of capacity 1 from the exit of one node to
+    the entry of the other. The super source is connected to the entries of the sources and the exits of the sinks to
+    the super sink, with edges that can not be cut, as are the entries and exits of the unblockable nodes.
+    :param G: roads network
+    :param sources: mask of the source nodes
+    :param sinks: mask of the sink nodes
+    :param unblockable: mask of the nodes no herald may stand at
+    :return: masks of the outer nodes, whose exit is on the source side of the cut, and of the blocked nodes, whose
+    entry only is on the source side
+    """
+    edges = np.asarray(G.edges)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    # the entry of node i is i and its exit is n + i
+    n_nodes = G.n_nodes
+    super_source, super_sink = 2 * n_nodes, 2 * n_nodes + 1
+    infinity = len(edges) + n_nodes + 1
+
+    source_nodes, sink_nodes = np.flatnonzero(sources), np.flatnonzero(sinks)
+    tails = np.concatenate([np.arange(n_nodes), edges[:, 0] + n_nodes, edges[:, 1] + n_nodes,
+                            np.full(len(source_nodes), super_source), sink_nodes + n_nodes])
+    heads = np.concatenate([np.arange(n_nodes) + n_nodes, edges[:, 1], edges[:, 0],
+                            source_nodes, np.full(len(sink_nodes), super_sink)])
+    capacities = np.concatenate([np.where(unblockable, infinity, 1), np.ones(2 * len(edges)),
+                                 np.full(len(source_nodes) + len(sink_nodes), infinity)])
+    # parallel roads are summed into a single capacity
+    capacity = csr_matrix((capacities.astype(np.int32), (tails, heads)), shape=(2 * n_nodes + 2, 2 * n_nodes + 2))
+
+    result = maximum_flow(capacity, super_source, super_sink)
+    # older scipy versions name the flow graph 'residual'
+    flow = result.flow if hasattr(result, 'flow') else result.residual
+    residual = (capacity - flow).tocsr()
+    residual.data = (residual.data > 0).astype(np.int8)
+    residual.eliminate_zeros()
+
+    # the nodes reachable from the super source in the residual graph are on the source side of the cut
+    source_side = np.zeros(2 * n_nodes + 2, dtype=bool)
+    source_side[breadth_first_order(residual, super_source, directed=True, return_predecessors=False)] = True
+    outer = source_side[n_nodes:2 * n_nodes]
+    return outer, source_side[:n_nodes] & ~outer
+
+
+def min_cut_edges_labels(G: RoadsGraph, no_entrance_polygon: Polygon, is_contained_in_patient_polygon: np.ndarray,
+                         edges_predicates: EdgePredicates) -> Tuple[Dict[Tuple[int, int], str], np.ndarray]:
+    """
+    Labels the edges of a cut with the fewest heralds separating the outsiders from the no entrance polygon:
+    'safe_crossing' - blocked road that does not reach the no entrance polygon, or road leading the outsiders to a
+    blocked node
+    'danger_crossing' - blocked road that reaches the no entrance polygon
+    A blocked road is saved with the inner node first and the outer node second, as the crossing edges of the label
+    and filter solver. A road leading to a blocked node is saved with the outer node first and the blocked node second,
+    and the blocked node is not on the inner side, so that assign_nodes_labels marks it.
+    :param G: roads network
+    :param no_entrance_polygon: danger polygon, no herald stands at the sinks inside it
+    :param is_contained_in_patient_polygon: mask of the nodes contained in the patient effective polygon
+    :param edges_predicates: the geometric predicates of all the edges
+    :return: dict from the labeled edges to the label, and the mask of the nodes on the inner side of the cut
+    """
+    sources, sinks = find_terminals(G, is_contained_in_patient_polygon, edges_predicates)
+    if not np.any(sources) or not np.any(sinks):
+        return {}, is_contained_in_patient_polygon
+
+    unblockable = sources.copy()
+    sink_nodes = np.flatnonzero(sinks)
+    unblockable[sink_nodes] = point_in_multipolygon(np.asarray(G.nodes_geo_locs)[sink_nodes], no_entrance_polygon)
+    outer, blocked = min_cut_sides(G, sources, sinks, unblockable)
+    inner = ~outer & ~blocked
+
+    edges = np.asarray(G.edges)
+    edges_labels = {}
+    for edge_id in np.flatnonzero(outer[edges[:, 0]] != outer[edges[:, 1]]):
+        u, v = edges[edge_id].tolist()
+        if blocked[u] or blocked[v]:
+            edges_labels[(u, v) if outer[u] else (v, u)] = 'safe_crossing'
+            continue
+        edges_labels[(v, u) if outer[u] else (u, v)] = 'danger_crossing' if \
+            edges_predicates.intersects_no_entrance[edge_id] else 'safe_crossing'
+    return edges_labels, inner
@@ -1,37 +1,50 @@
 from typing import Dict, Tuple, List
-from shapely.geometry import Polygon, LineString, MultiPolygon
 
-from models.scenario import Scenario
-import networkx as nx
+import numpy as np
+from roads_heralds.block_roads.edge_predicates import EdgePredicates
+from roads_heralds.roads_to_networks.graph_kernels import Adjacency, edges_mask_from_ids, connected_components_labels, \
+    oriented_edges_ids, parallel_edges_mask, networkx_adjacency, adjacency_degrees, frontier_neighbors
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
 
-from roads_heralds.roads_to_networks.roads_utils import get_road_by_edge_key
 
-
-def edge_prevents_to_reach_patient(inner_subgraph: nx.Graph, inner_node: int, marked_nodes_set: List[int],
-                                   edges_to_roads_dict: Dict[Tuple, LineString], no_entrance_polygon: Polygon) -> bool:
+def edge_prevents_to_reach_patient(adjacency: Adjacency, edges_mask: np.ndarray, degrees: np.ndarray, inner_node: int,
+                                   marked_nodes_mask: np.ndarray, intersects_no_entrance: np.ndarray) -> bool:
     """
-    Checks if the edge is essential to prevent an outsider from reaching the patient via the roads networks
-    :param inner_subgraph: the part of the network that is inside the effective polygon
+    Checks if the edge is essential to prevent an outsider from reaching the patient via the roads networks.
+    Follows the BFS tree of the inner subgraph from the inner node: the edge is essential if the tree path to one of
+    the leaves of the subgraph passes through an edge intersecting the no entrance polygon before reaching a marked
+    node. The paths to all the leaves are followed at once, one BFS level at a time, and the search stops as soon as
+    the answer is known. Every level is kept in the order its nodes were discovered and the neighbors are visited in
+    the order of the adjacency, so a node hangs from the same parent as in a queue based BFS of the networkx graph.
+    :param adjacency: the adjacency of the network, see networkx_adjacency
+    :param edges_mask: mask of the edges of the network without the marked edges
+    :param degrees: the degree of every node in the network without the marked edges
     :param inner_node: the inner node of the crossing edge
-    :param marked_nodes_set: all the marked nodes
-    :param edges_to_roads_dict: dict from the edges (tuples of ints, each int is a node) to the underlying road
-    :param no_entrance_polygon:
+    :param marked_nodes_mask: mask of the marked nodes
+    :param intersects_no_entrance: mask of the edges intersecting the no entrance polygon
     :return: bool
     """
-    # calculate all paths to the leaf nodes in the inner subgraph
-    paths = []
-    for node in inner_subgraph:
-        if inner_subgraph.degree(node) == 1:  # it's a leaf
-            paths.append(nx.shortest_path(inner_subgraph, inner_node, node))
-
-    # if one of the paths intersects the no entrance polygon
-    for path in paths:
-        for edge in zip(path[:-1], path[1:]):
-            road = get_road_by_edge_key(edge, edges_to_roads_dict)
-            if road.intersects(no_entrance_polygon):
-                return True
-            if edge[1] in marked_nodes_set:
-                break
+    # open - the tree path from the inner node has not reached a marked node yet
+    # flagged - the tree path from the inner node passed through a no entrance edge while open
+    visited = np.zeros(len(degrees), dtype=bool)
+    visited[inner_node] = True
+    frontier = np.array([inner_node], dtype=np.int64)
+    frontier_open = np.array([True])
+    frontier_flagged = np.array([False])
+    while len(frontier) > 0 and np.any(frontier_open | frontier_flagged):
+        if np.any(frontier_flagged & (degrees[frontier] == 1)):
+            return True
+        parents_positions, neighbors, edges_ids = frontier_neighbors(adjacency, frontier, edges_mask)
+        new = ~visited[neighbors]
+        _, first = np.unique(neighbors[new], return_index=True)
+        first = np.sort(first)
+        frontier = neighbors[new][first]
+        visited[frontier] = True
+        parents_positions = parents_positions[new][first]
+        parents_open = frontier_open[parents_positions]
+        frontier_flagged = frontier_flagged[parents_positions] | \
+            (parents_open & intersects_no_entrance[edges_ids[new][first]])
+        frontier_open = parents_open & ~marked_nodes_mask[frontier]
     return False
 
 
@@ -52,75 +65,94 @@ def gather_marked_nodes(marked_edges: List[Tuple], edges_labels: Dict[Tuple, str
     return marked_nodes, non_marked_nodes
 
 
-def connected_to_village_or_end_of_map(outer_subgraph: nx.Graph, edges_to_roads_dict: Dict[Tuple, LineString],
-                                       scenario: Scenario, villages: MultiPolygon) -> bool:
+def components_connected_to_village_or_end_of_map(G: RoadsGraph, components_labels: np.ndarray,
+                                                  edges_mask: np.ndarray, components: np.ndarray,
+                                                  intersects_village_or_end_of_map: np.ndarray) -> np.ndarray:
     """
-    Checks if the edge is connected to a village or reaches the end of map
-    :param outer_subgraph: the part of the network that is outside the effective polygon
-    :param edges_to_roads_dict: dict from the edges (tuples of ints, each int is a node) to the underlying road, that is a linestring with multiple nodes
-    :param scenario: current scenario
-    :param villages: the villages
-    :return: bool
+    Checks which of the given components is connected to a village or reaches the end of map
+    :param G: roads network
+    :param components_labels: the component label of every node
+    :param edges_mask: mask of the present edges
+    :param components: labels of the components to check
+    :param intersects_village_or_end_of_map: mask of the edges intersecting a village or the end of map polygon
+    :return: boolean array, indexed by component label
     """
-
-    end_of_map_polygon = scenario.bbox.get_end_of_map_polygon()
-    overall_polygon = end_of_map_polygon.union(villages)
-
-    for edge in outer_subgraph.edges():
-        road = get_road_by_edge_key(edge, edges_to_roads_dict)
-        if road.intersects(overall_polygon):
-            return True
-    return False
+    connected = np.zeros(components_labels.max() + 1, dtype=bool)
+    edges_components = components_labels[np.asarray(G.edges)[:, 0]]
+    reaching = edges_mask & intersects_village_or_end_of_map & np.isin(edges_components, components)
+    connected[edges_components[reaching]] = True
+    return connected
 
 
-def post_process(G: nx.Graph, edges_labels: Dict[Tuple, str], edges_to_roads_dict: Dict[Tuple, LineString],
-                 scenario: Scenario, no_entrance_polygon: Polygon, villages: MultiPolygon, nodes_geo_locs) -> Dict[
-    Tuple, str]:
+def post_process(G: RoadsGraph, edges_labels: Dict[Tuple, str], edges_predicates: EdgePredicates) -> Dict[Tuple, str]:
     """
     The post processing of the labeled edges. Filters crossing edges that:
     (1) do not prevent outsiders from reaching the entrance polygon
     (2) are not connected to villages or the edges of the map
+    All marked edges are removed once, and the components of the remaining network are labeled in a single pass.
+    The inner component of a marked edge is the component of its inner node. Its outer component is the component
+    of its outer node plus the marked edge itself, or just the marked edge if both nodes share a component (as the
+    inner component edges are not part of the outer one).
     :param G: roads network
     :param edges_labels: dict mapping from edges to the labels
-    :param edges_to_roads_dict: dict mapping from edges to the underlying roads
-    :param scenario: Scenario object
-    :param no_entrance_polygon: danger polygon
-    :param villages: villages multipolygon
+    :param edges_predicates: the geometric predicates of all the edges
     :return: the updated edges_labels dict
     """
     marked_edges = [edge for edge, edge_label in edges_labels.items() if
                     edge_label in ['danger_crossing', 'safe_crossing']]
+    if len(marked_edges) == 0:
+        return edges_labels
 
     marked_nodes, non_marked_nodes = gather_marked_nodes(marked_edges, edges_labels)
-    marked_nodes_set = list(set(marked_nodes.copy()))
-
-    for marked_edge in marked_edges:
-
-        # remove marked edges
-        G_copy = G.copy()
-        G_copy.remove_edges_from(marked_edges)
-
-        # find if inner component reaches the no entrance polygon close to patient
-        inner_node = marked_edge[0]
-        inner_connected_components = nx.node_connected_component(G_copy, inner_node)
-        inner_subgraph = G_copy.subgraph(inner_connected_components)
-
-        if not edge_prevents_to_reach_patient(inner_subgraph,
-                                              inner_node,
-                                              marked_nodes_set,
-                                              edges_to_roads_dict,
-                                              no_entrance_polygon):
+    marked_nodes_mask = np.zeros(G.n_nodes, dtype=bool)
+    marked_nodes_mask[marked_nodes] = True
+
+    # parallel edges are a single edge, with the road the edges to roads dict gives for it: removing a marked edge
+    # removes its parallel edges too, and only that road of an outer edge is checked
+    graph_edges = np.asarray(G.edges)
+    roads_edges_mask = edges_mask_from_ids(G, oriented_edges_ids(G, np.sort(graph_edges, axis=1)))
+    marked_edges_array = np.array(marked_edges).reshape(-1, 2)
+    marked_edges_ids = oriented_edges_ids(G, np.sort(marked_edges_array, axis=1))
+    remaining_edges_mask = ~parallel_edges_mask(G, marked_edges_ids)
+
+    # label the components of the network without the marked edges, once for all marked edges
+    components_labels = connected_components_labels(G, remaining_edges_mask)
+    inner_components = components_labels[marked_edges_array[:, 0]]
+    outer_components = components_labels[marked_edges_array[:, 1]]
+
+    # find if inner component reaches the no entrance polygon close to patient, once per inner node. a component
+    # without edges intersecting the no entrance polygon can not reach it
+    adjacency = networkx_adjacency(G)
+    degrees = adjacency_degrees(adjacency, remaining_edges_mask)
+    reaching_no_entrance = remaining_edges_mask & edges_predicates.intersects_no_entrance
+    components_reaching_no_entrance = np.zeros(components_labels.max() + 1, dtype=bool)
+    components_reaching_no_entrance[components_labels[graph_edges[reaching_no_entrance, 0]]] = True
+    prevents_by_inner_node = {}
+    for inner_node, inner_component in zip(marked_edges_array[:, 0].tolist(), inner_components.tolist()):
+        if inner_node not in prevents_by_inner_node:
+            prevents_by_inner_node[inner_node] = components_reaching_no_entrance[inner_component] and \
+                edge_prevents_to_reach_patient(adjacency,
+                                               remaining_edges_mask,
+                                               degrees,
+                                               inner_node,
+                                               marked_nodes_mask,
+                                               edges_predicates.intersects_no_entrance)
+
+    # find if outer component reaches a village or the end of map
+    intersects_village_or_end_of_map = edges_predicates.intersects_village_or_end_of_map
+    separated = outer_components != inner_components
+    components_connected = components_connected_to_village_or_end_of_map(G, components_labels,
+                                                                         remaining_edges_mask & roads_edges_mask,
+                                                                         np.unique(outer_components[separated]),
+                                                                         intersects_village_or_end_of_map)
+
+    for i, (marked_edge, marked_edge_id) in enumerate(zip(marked_edges, marked_edges_ids)):
+        if not prevents_by_inner_node[marked_edge[0]]:
             edges_labels[marked_edge] = 'filtered'
             continue
 
-        # find if outer component reaches a village or the end of map
-        outer_node = marked_edge[1]
-        G_copy.remove_edges_from(inner_subgraph.edges())
-        G_copy.add_edge(*marked_edge, roads=get_road_by_edge_key(marked_edge, edges_to_roads_dict))
-        outer_connected_components = nx.node_connected_component(G_copy, outer_node)
-        outer_subgraph = G_copy.subgraph(outer_connected_components)
-
-        if not connected_to_village_or_end_of_map(outer_subgraph, edges_to_roads_dict, scenario, villages):
+        connected = separated[i] and components_connected[outer_components[i]]
+        if not connected and not intersects_village_or_end_of_map[marked_edge_id]:
             edges_labels[marked_edge] = 'filtered'
 
     return edges_labels
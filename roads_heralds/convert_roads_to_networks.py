@@ -3,25 +3,57 @@ import argparse
 
 from tqdm import tqdm
 
-from algo_config.algo_config import AlgorithmConfig
-from dir_definitions import BENCHMARK_DIR, ROADS_NETWORKS_DIR
+from algo_config.algo_config import RunConfig, bind_config, get_run_config
+from dir_definitions import BENCHMARK_DIR
+from general_utils.artifact_cache import get_artifact_cache
+from general_utils.geo_data_retriever import get_geographic_data_path, GeographicType
+from roads_heralds.roads_to_networks import contract, core, intersect, merge, roads_graph, roads_utils
+from roads_heralds.roads_to_networks.contract import ContractedRoadsGraph, contract_degree2_chains
 from roads_heralds.roads_to_networks.core import generate_roads_network
-import networkx as nx
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
+
+ROADS_GRAPH_CONFIG_KEYS = ('area_name', 'intersection_points_distance_threshold', 'roads_noding')
+ROADS_GRAPH_CODE_MODULES = (core, intersect, merge, roads_graph, roads_utils)
 
 benchmark_files = [os.path.join(BENCHMARK_DIR, file)
                    for file in os.listdir(BENCHMARK_DIR) if file.endswith('.yaml')]
 
 
-def read_network_graph() -> nx.Graph:
-    graph_path = os.path.join(ROADS_NETWORKS_DIR, f'roads_graph_{AlgorithmConfig().get_name()}.pkl')
-    if not os.path.isfile(graph_path):
-        generate_roads_network()
-    G = nx.read_gpickle(graph_path)
-    return G
+def roads_graph_artifact_key() -> str:
+    """
+    :return: the key of the roads graph of the current config in the artifact cache
+    """
+    roads_path = get_geographic_data_path(get_run_config().get_value('area_name'), GeographicType.ROAD)
+    return get_artifact_cache().key('roads_graph',
+                                    config_keys=ROADS_GRAPH_CONFIG_KEYS,
+                                    input_files=[f'{roads_path}.json'],
+                                    code_files=[module.__file__ for module in ROADS_GRAPH_CODE_MODULES])
+
+
+def read_network_graph() -> RoadsGraph:
+    """Reads the roads graph of the current benchmark from the artifact cache, memory-mapped. Generates the graph if
+    needed.
+
+    :return: the roads graph
+    """
+    return get_artifact_cache().get_or_create(roads_graph_artifact_key(), generate_roads_network,
+                                              save=RoadsGraph.save, load=RoadsGraph.load)
+
+
+def read_contracted_network_graph() -> ContractedRoadsGraph:
+    """Reads the roads graph of the current benchmark with contracted degree-2 chains from the artifact cache,
+    memory-mapped. Contracts the full graph if needed.
+
+    :return: the contracted roads graph
+    """
+    key = get_artifact_cache().key('contracted_roads_graph',
+                                   code_files=[contract.__file__],
+                                   dependencies=[roads_graph_artifact_key()])
+    return get_artifact_cache().get_or_create(key, lambda: contract_degree2_chains(read_network_graph()),
+                                              save=ContractedRoadsGraph.save, load=ContractedRoadsGraph.load)
 
 
 if __name__ == "__main__":
-    alg_config = AlgorithmConfig()
     parser = argparse.ArgumentParser()
     parser.add_argument("-scenarios", help="scenarios to run", nargs="+", type=int)
     args = parser.parse_args()
@@ -32,5 +64,6 @@ if __name__ == "__main__":
         benchmark_files = sorted(benchmark_files)
 
     for benchmark_file in tqdm(benchmark_files):
-        alg_config.load_config(os.path.join(BENCHMARK_DIR, benchmark_file))
-        read_network_graph()
+        with bind_config(RunConfig.from_file(os.path.join(BENCHMARK_DIR, benchmark_file))):
+            read_network_graph()
+            read_contracted_network_graph()
@@ -3,22 +3,14 @@ import os
 
 from tqdm import tqdm
 
-from algo_config.algo_config import AlgorithmConfig
+from algo_config.algo_config import RunConfig, bind_config
 from dir_definitions import BENCHMARK_DIR
-from general_utils.patient_utils import get_patient_filtered_polygons
-from models.scenario import Scenario
-
-from noise_heralds.make_noise.core import place_heralds_main
-from noise_heralds.segment import read_segmented_areas, SegmentedAreas
-from roads_heralds.block_roads.core import block_roads
-from roads_heralds.convert_roads_to_networks import read_network_graph
-from visualization.visualizer import draw
+from pipeline.stages import HERALDS_PIPELINE
 
 benchmark_files = [os.path.join(BENCHMARK_DIR, file)
                    for file in os.listdir(BENCHMARK_DIR) if file.endswith('.yaml')]
 
 if __name__ == "__main__":
-    alg_config = AlgorithmConfig()
     parser = argparse.ArgumentParser()
     parser.add_argument("-scenarios", help="scenarios to run", nargs="+", type=int)
     args = parser.parse_args()
@@ -29,28 +21,6 @@ if __name__ == "__main__":
         benchmark_files = sorted(benchmark_files)
 
     for benchmark_file in tqdm(benchmark_files):
-        alg_config.load_config(os.path.join(BENCHMARK_DIR, benchmark_file))
-        scenario = Scenario(heralds=None)
-
-        # calculate patient's contagion and effective polygons
-        patient_contagion_polygon, patient_effective_polygon = get_patient_filtered_polygons(scenario)
-
-        # read the segmented areas (villages and LOS map)
-        seg_areas: SegmentedAreas = read_segmented_areas()
-
-        # load the roads graph
-        G = read_network_graph()
-
-        # calculate noise heralds locations
-        noise_output = place_heralds_main(seg_areas)
-
-        # calculate roads heralds locations
-        blocks_output = block_roads(G, seg_areas.villages, patient_effective_polygon)
-
-        # draw the solution
-        draw(scenario=scenario,
-             seg_areas=seg_areas,
-             patient_contagion_polygon=patient_contagion_polygon,
-             patient_effective_polygon=patient_effective_polygon,
-             blocks_output=blocks_output,
-             to_file=f'blocks_only/{alg_config.get_name()}')
+        with bind_config(RunConfig.from_file(os.path.join(BENCHMARK_DIR, benchmark_file))):
+            # block the roads and draw the output
+            HERALDS_PIPELINE.run(['blocks_figure'])
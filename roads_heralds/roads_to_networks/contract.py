@@ -0,0 +1,190 @@
+from typing import List, Set, Tuple
+
+import numpy as np
+
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph, ROADS_GRAPH_ARRAYS
+
+CONTRACTION_ARRAYS = ('nodes_ids', 'chains_nodes', 'chains_nodes_offsets', 'chains_edges', 'chains_edges_offsets')
+
+
+class ContractedRoadsGraph(RoadsGraph):
+    """
+    Roads graph whose chains of degree-2 nodes are contracted into single edges. Keeps the mapping back to the
+    original graph: the original id of every node, and for every edge the original nodes and edges along its chain
+    (ragged arrays, with per-edge offsets).
+    """
+    ARRAYS = ROADS_GRAPH_ARRAYS + CONTRACTION_ARRAYS
+
+    def __init__(self, nodes_geo_locs: np.ndarray, edges: np.ndarray, roads_coords: np.ndarray,
+                 roads_offsets: np.ndarray, nodes_ids: np.ndarray, chains_nodes: np.ndarray,
+                 chains_nodes_offsets: np.ndarray, chains_edges: np.ndarray, chains_edges_offsets: np.ndarray,
+                 indptr: np.ndarray = None, indices: np.ndarray = None, edges_ids: np.ndarray = None):
+        super().__init__(nodes_geo_locs, edges, roads_coords, roads_offsets, indptr, indices, edges_ids)
+        self.nodes_ids = nodes_ids
+        self.chains_nodes = chains_nodes
+        self.chains_nodes_offsets = chains_nodes_offsets
+        self.chains_edges = chains_edges
+        self.chains_edges_offsets = chains_edges_offsets
+
+    def chain_nodes(self, edge_id: int) -> np.ndarray:
+        """
+        :return: the original nodes along the edge, from the first node of the edge to the second one
+        """
+        return self.chains_nodes[self.chains_nodes_offsets[edge_id]:self.chains_nodes_offsets[edge_id + 1]]
+
+    def chain_edges(self, edge_id: int) -> np.ndarray:
+        """
+        :return: the original edges ids along the edge, in the same order as the chain nodes
+        """
+        return self.chains_edges[self.chains_edges_offsets[edge_id]:self.chains_edges_offsets[edge_id + 1]]
+
+
+def find_chains(G: RoadsGraph) -> List[Tuple[List[int], List[int]]]:
+    """
+    Walks the graph from every node whose degree is not 2 along the chains of degree-2 nodes. Cycles made only of
+    degree-2 nodes are walked from their smallest node.
+    :param G: roads graph
+    :return: list of chains, every chain is the list of its nodes and the list of the edges ids between them
+    """
+    edges = np.asarray(G.edges)
+    degrees = G.degrees()
+    self_loops_nodes = edges[edges[:, 0] == edges[:, 1], 0]
+    is_end = degrees != 2
+    is_end[self_loops_nodes] = True
+
+    chains = []
+    used = np.zeros(G.n_edges, dtype=bool)
+    starts = list(np.flatnonzero(is_end)) + list(range(G.n_nodes))
+    for start in starts:
+        for first_edge in G.edges_ids[G.indptr[start]:G.indptr[start + 1]]:
+            if used[first_edge]:
+                continue
+            # a node first reached here lies on a cycle of degree-2 nodes, it becomes the end of the cycle chain
+            is_end[start] = True
+            nodes, chain_edges = [int(start)], [int(first_edge)]
+            used[first_edge] = True
+            node = int(edges[first_edge, 1] if edges[first_edge, 0] == start else edges[first_edge, 0])
+            while not is_end[node]:
+                nodes.append(node)
+                next_edge = [edge_id for edge_id in G.edges_ids[G.indptr[node]:G.indptr[node + 1]]
+                             if edge_id != chain_edges[-1]][0]
+                chain_edges.append(int(next_edge))
+                used[next_edge] = True
+                node = int(edges[next_edge, 1] if edges[next_edge, 0] == node else edges[next_edge, 0])
+            nodes.append(node)
+            chains.append((nodes, chain_edges))
+    return chains
+
+
+def split_chain(nodes: List[int], chain_edges: List[int],
+                used_pairs: Set[Tuple[int, int]]) -> List[Tuple[List[int], List[int]]]:
+    """
+    Splits a chain at its middle node until none of its parts would become a self loop or an edge parallel to an
+    existing one. A single original edge is never split, it can not be parallel to another one.
+    :param nodes: the chain nodes
+    :param chain_edges: the chain edges ids
+    :param used_pairs: the pairs of end nodes of the edges of the contracted graph so far, updated in place
+    :return: the parts of the chain
+    """
+    pair = (min(nodes[0], nodes[-1]), max(nodes[0], nodes[-1]))
+    if len(chain_edges) == 1 or (nodes[0] != nodes[-1] and pair not in used_pairs):
+        used_pairs.add(pair)
+        return [(nodes, chain_edges)]
+    middle = len(chain_edges) // 2
+    return split_chain(nodes[:middle + 1], chain_edges[:middle], used_pairs) + \
+        split_chain(nodes[middle:], chain_edges[middle:], used_pairs)
+
+
+def chain_road_coords(G: RoadsGraph, nodes: List[int], chain_edges: List[int]) -> np.ndarray:
+    """
+    Concatenates the roads along the chain, every road oriented from the previous node to the next one
+    """
+    nodes_geo_locs = np.asarray(G.nodes_geo_locs)
+    roads = []
+    for i, edge_id in enumerate(chain_edges):
+        road = G.road_coords(edge_id)
+        if np.linalg.norm(road[0] - nodes_geo_locs[nodes[i]]) > np.linalg.norm(road[-1] - nodes_geo_locs[nodes[i]]):
+            road = road[::-1]
+        roads.append(road if i == 0 else road[1:])
+    return np.vstack(roads)
+
+
+def contract_degree2_chains(G: RoadsGraph) -> ContractedRoadsGraph:
+    """
+    Contracts the chains of degree-2 nodes of the graph into single edges, with the concatenated roads as geometry.
+    Chains are split where needed so that the contracted graph has no self loops or parallel edges, as the original.
+    :param G: roads graph
+    :return: the contracted roads graph
+    """
+    chains = find_chains(G)
+
+    # the single edges between ends come first, so the chains are split around them
+    chains.sort(key=lambda chain: len(chain[1]) > 1)
+    used_pairs = set()
+    chains = [part for nodes, chain_edges in chains for part in split_chain(nodes, chain_edges, used_pairs)]
+
+    nodes_ids = np.unique(np.array([[nodes[0], nodes[-1]] for nodes, _ in chains], dtype=np.int64).reshape(-1))
+    edges = np.searchsorted(nodes_ids, np.array([[nodes[0], nodes[-1]] for nodes, _ in chains],
+                                                dtype=np.int64).reshape(-1, 2))
+
+    roads = [chain_road_coords(G, nodes, chain_edges) for nodes, chain_edges in chains]
+    roads_offsets = np.concatenate([[0], np.cumsum([len(road) for road in roads])]).astype(np.int64)
+    chains_nodes_offsets = np.concatenate([[0], np.cumsum([len(nodes) for nodes, _ in chains])]).astype(np.int64)
+    chains_edges_offsets = np.concatenate([[0], np.cumsum([len(edges) for _, edges in chains])]).astype(np.int64)
+    return ContractedRoadsGraph(nodes_geo_locs=np.asarray(G.nodes_geo_locs)[nodes_ids],
+                                edges=edges,
+                                roads_coords=np.vstack(roads) if len(roads) > 0 else np.empty((0, 2)),
+                                roads_offsets=roads_offsets,
+                                nodes_ids=nodes_ids,
+                                chains_nodes=np.array([node for nodes, _ in chains for node in nodes], dtype=np.int64),
+                                chains_nodes_offsets=chains_nodes_offsets,
+                                chains_edges=np.array([edge for _, edges in chains for edge in edges], dtype=np.int64),
+                                chains_edges_offsets=chains_edges_offsets)
+
+
+def ragged_rows(values: np.ndarray, offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gathers rows of a ragged array
+    :param values: the flat values of the ragged array
+    :param offsets: the per-row offsets into the values
+    :param rows: the rows to gather, in order
+    :return: the flat values of the gathered rows and their offsets
+    """
+    starts = np.asarray(offsets)[rows]
+    counts = np.asarray(offsets)[rows + 1] - starts
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return np.asarray(values)[positions], np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def split_chains(G: RoadsGraph, contracted_G: ContractedRoadsGraph,
+                 split_mask: np.ndarray) -> Tuple[RoadsGraph, np.ndarray, np.ndarray]:
+    """
+    Builds the graph of the contracted edges where the edges of the split mask are replaced back by the original edges
+    along their chains. The nodes keep their original ids, so the inner nodes of the chains that are not split are
+    left without edges. The edges are ordered by the first original edge along them, so the original edges keep their
+    relative order and the graph is walked as the original one wherever the chains are split.
+    :param G: the original roads graph
+    :param contracted_G: the contracted roads graph of G
+    :param split_mask: mask of the contracted edges to split
+    :return: the graph, and for every one of its edges the id of the contracted edge it belongs to and its original edge
+    id, -1 for the contracted chains
+    """
+    chains_lengths = np.diff(contracted_G.chains_edges_offsets)
+    split_ids = np.flatnonzero(split_mask)
+    kept_ids = np.flatnonzero(~split_mask)
+
+    split_edges_ids, _ = ragged_rows(contracted_G.chains_edges, contracted_G.chains_edges_offsets, split_ids)
+    first_edges_ids = np.asarray(contracted_G.chains_edges)[np.asarray(contracted_G.chains_edges_offsets)[:-1]]
+    contracted_edges_ids = np.concatenate([np.repeat(split_ids, chains_lengths[split_ids]), kept_ids])
+    original_edges_ids = np.concatenate([split_edges_ids, np.full(len(kept_ids), -1, dtype=np.int64)])
+    order = np.argsort(np.concatenate([split_edges_ids, first_edges_ids[kept_ids]]), kind='stable')
+    contracted_edges_ids, original_edges_ids = contracted_edges_ids[order], original_edges_ids[order]
+
+    edges = np.concatenate([np.asarray(G.edges)[split_edges_ids],
+                            np.asarray(contracted_G.nodes_ids)[np.asarray(contracted_G.edges)[kept_ids]]])[order]
+    split_coords, split_offsets = ragged_rows(G.roads_coords, G.roads_offsets, split_edges_ids)
+    kept_coords, kept_offsets = ragged_rows(contracted_G.roads_coords, contracted_G.roads_offsets, kept_ids)
+    roads_coords, roads_offsets = ragged_rows(np.concatenate([split_coords, kept_coords]),
+                                              np.concatenate([split_offsets, kept_offsets[1:] + len(split_coords)]),
+                                              order)
+    return RoadsGraph(G.nodes_geo_locs, edges, roads_coords, roads_offsets), contracted_edges_ids, original_edges_ids
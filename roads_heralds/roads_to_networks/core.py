@@ -1,20 +1,17 @@
-import os
-
 import networkx as nx
 
-from dir_definitions import ROADS_NETWORKS_DIR
 from general_utils.patient_utils import get_patient_filtered_polygons
 from models.scenario import Scenario
-from roads_heralds.roads_to_networks.intersect import calculate_intersecting_linestrings
+from roads_heralds.roads_to_networks.intersect import calculate_intersecting_linestrings, node_linestrings
 from roads_heralds.roads_to_networks.merge import merge_junctions
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
 from roads_heralds.roads_to_networks.roads_utils import set_geo_locs, set_edges_grid_locs, \
-    create_edges_to_roads_dict, \
-    gather_intersecting_nodes, get_roads_linestrings_dict
+    create_edges_to_roads_dict, index_linestrings_endpoints, get_roads_linestrings_dict
 from visualization.visualizer import draw
-from algo_config.algo_config import AlgorithmConfig
+from algo_config.algo_config import get_run_config
 
 
-def generate_roads_network():
+def generate_roads_network() -> RoadsGraph:
     scenario = Scenario(heralds=None)
 
     # hotfix - get merge close intersections at ends or starts of roads_heralds
@@ -24,19 +21,19 @@ def generate_roads_network():
     roads_linestrings = get_roads_linestrings_dict(roads)
 
     # calculate all segments, parts of the above linestrings splitted at the intersections
-    intersected_linestrings = calculate_intersecting_linestrings(roads_linestrings)
-
-    # gather all nodes from above linestrings
-    intersected_nodes = gather_intersecting_nodes(intersected_linestrings)
+    if get_run_config().get_value('roads_noding') == 'single_pass':
+        intersected_linestrings = node_linestrings(roads_linestrings)
+    else:
+        intersected_linestrings = calculate_intersecting_linestrings(roads_linestrings)
 
-    # the unique nodes are the junctions
-    nodes = list(set(intersected_nodes))
+    # the unique first and last points of the segments are the junctions, and every segment is an edge
+    nodes, edges = index_linestrings_endpoints(intersected_linestrings)
 
     # mapping dict, from node geo location to id
-    nodes_to_id_dict = {node: i for i, node in enumerate(nodes)}
+    nodes_to_id_dict = {tuple(node): i for i, node in enumerate(nodes.tolist())}
 
     # dict from the edges (tuples of nodes id) to the linestrings of the roads_heralds
-    edges_to_roads_dict = create_edges_to_roads_dict(nodes_to_id_dict, intersected_linestrings)
+    edges_to_roads_dict = create_edges_to_roads_dict(edges, intersected_linestrings)
 
     G = nx.Graph()
 
@@ -50,15 +47,13 @@ def generate_roads_network():
     # set the linestrings of the underlying roads_heralds as the attribute of an edge
     set_edges_grid_locs(G, edges_to_roads_dict)
 
-    # save the graph
-    save_path = os.path.join(ROADS_NETWORKS_DIR, f'roads_graph_{AlgorithmConfig().get_name()}.pkl')
-    if not os.path.isdir(ROADS_NETWORKS_DIR):
-        os.mkdir(ROADS_NETWORKS_DIR)
-    nx.write_gpickle(G, save_path)
+    # the graph in the compact arrays format
+    roads_graph = RoadsGraph.from_edges_to_roads_dict(nodes, edges_to_roads_dict)
 
     # draw graph
     patient_contagion_polygon, patient_effective_polygon = get_patient_filtered_polygons(scenario)
     draw(scenario=scenario, graph=G,
          patient_contagion_polygon=patient_contagion_polygon,
          patient_effective_polygon=patient_effective_polygon,
-         to_file=f'roads_only/{AlgorithmConfig().get_name()}')
+         to_file=f'roads_only/{get_run_config().get_name()}')
+    return roads_graph
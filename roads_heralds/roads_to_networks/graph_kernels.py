@@ -0,0 +1,151 @@
+from typing import List, NamedTuple, Tuple, Optional, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
+
+# Graph algorithms on the CSR arrays of a RoadsGraph. Removed edges are given as a boolean mask over the edges ids
+# (True means the edge is present), so the graph itself is never copied or modified.
+
+
+def find_edges_ids(G: RoadsGraph, edges: List[Tuple[int, int]]) -> np.ndarray:
+    """
+    Finds the ids of the given edges, in any of their orientations
+    :param G: roads graph
+    :param edges: list of edges, tuples of nodes ids
+    :return: array of the edges ids
+    """
+    graph_edges = np.asarray(G.edges)
+    graph_keys = np.min(graph_edges, axis=1) * G.n_nodes + np.max(graph_edges, axis=1)
+    order = np.argsort(graph_keys, kind='stable')
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    keys = np.min(edges, axis=1) * G.n_nodes + np.max(edges, axis=1)
+    positions = np.searchsorted(graph_keys[order], keys)
+    if np.any(positions >= len(order)) or np.any(graph_keys[order[np.minimum(positions, len(order) - 1)]] != keys):
+        raise KeyError("Edge is not in the roads graph")
+    return order[positions]
+
+
+def edges_mask_from_ids(G: RoadsGraph, edges_ids: np.ndarray) -> np.ndarray:
+    mask = np.zeros(G.n_edges, dtype=bool)
+    mask[edges_ids] = True
+    return mask
+
+
+def connected_components_labels(G: RoadsGraph, edges_mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Labels the connected components of the graph
+    :param G: roads graph
+    :param edges_mask: mask of the present edges, all edges by default
+    :return: array of the component label of every node
+    """
+    edges = np.asarray(G.edges) if edges_mask is None else np.asarray(G.edges)[edges_mask]
+    adjacency = csr_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])),
+                           shape=(G.n_nodes, G.n_nodes))
+    _, labels = connected_components(adjacency, directed=False)
+    return labels
+
+
+class Adjacency(NamedTuple):
+    """
+    A CSR adjacency: the neighbors of node i are indices[indptr[i]:indptr[i + 1]], reached by the edges edges_ids
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    edges_ids: np.ndarray
+
+
+def oriented_edges_ids(G: RoadsGraph, edges: np.ndarray) -> np.ndarray:
+    """
+    Finds the id of the edge whose road the edges to roads dict gives for every oriented edge: the last edge with
+    this orientation, or else the last edge with the opposite one. Parallel edges share a single key in the dict, as
+    they share a single edge in a networkx graph.
+    :param G: roads graph
+    :param edges: 2D array (edges, 2) of oriented edges of the graph
+    :return: array of the edges ids
+    """
+    graph_edges = np.asarray(G.edges)
+    graph_keys = graph_edges[:, 0] * G.n_nodes + graph_edges[:, 1]
+    # the last id of every key
+    keys, last_positions = np.unique(graph_keys[::-1], return_index=True)
+    last_ids = len(graph_keys) - 1 - last_positions
+
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges_keys = edges[:, 0] * G.n_nodes + edges[:, 1]
+    reversed_keys = edges[:, 1] * G.n_nodes + edges[:, 0]
+    positions = np.minimum(np.searchsorted(keys, edges_keys), len(keys) - 1)
+    reversed_positions = np.minimum(np.searchsorted(keys, reversed_keys), len(keys) - 1)
+    return np.where(keys[positions] == edges_keys, last_ids[positions], last_ids[reversed_positions])
+
+
+def parallel_edges_mask(G: RoadsGraph, edges_ids: np.ndarray) -> np.ndarray:
+    """
+    :return: mask of the edges connecting the same nodes as any of the given edges, the given edges included
+    """
+    graph_edges = np.asarray(G.edges)
+    graph_keys = np.min(graph_edges, axis=1) * G.n_nodes + np.max(graph_edges, axis=1)
+    return np.isin(graph_keys, graph_keys[np.asarray(edges_ids, dtype=np.int64)])
+
+
+def networkx_adjacency(G: RoadsGraph) -> Adjacency:
+    """
+    The adjacency of the graph as seen in a copy of a networkx graph built from the edges. Parallel edges give a single
+    entry, with the edge id given by oriented_edges_ids. The graph copy adds the edges node by node, so the lower
+    neighbors of a node come first by id, and then the others in the order their first edge was added to the graph.
+    :param G: roads graph
+    :return: the adjacency
+    """
+    graph_edges = np.asarray(G.edges, dtype=np.int64).reshape(-1, 2)
+    # the first edge between every pair of nodes, which is when the pair is added to the graph
+    pairs_keys = np.min(graph_edges, axis=1) * G.n_nodes + np.max(graph_edges, axis=1)
+    pairs_keys, first_edges_ids = np.unique(pairs_keys, return_index=True)
+    pairs = graph_edges[first_edges_ids]
+
+    sources = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    targets = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    first_edges_ids = np.tile(first_edges_ids, 2)
+    not_repeated_loop = np.concatenate([np.ones(len(pairs), dtype=bool), pairs[:, 0] != pairs[:, 1]])
+    sources, targets, first_edges_ids = \
+        sources[not_repeated_loop], targets[not_repeated_loop], first_edges_ids[not_repeated_loop]
+
+    upper = targets >= sources
+    order = np.lexsort((np.where(upper, first_edges_ids, targets), upper, sources))
+    sources, targets = sources[order], targets[order]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=G.n_nodes))])
+    return Adjacency(indptr, targets, oriented_edges_ids(G, np.stack([sources, targets], axis=1)))
+
+
+def adjacency_degrees(adjacency: Adjacency, edges_mask: np.ndarray) -> np.ndarray:
+    """
+    :return: the degree of every node over the present edges, where a self loop counts twice as in networkx
+    """
+    present = edges_mask[adjacency.edges_ids]
+    sources = np.repeat(np.arange(len(adjacency.indptr) - 1), np.diff(adjacency.indptr))
+    loops = present & (adjacency.indices == sources)
+    return np.bincount(sources[present], minlength=len(adjacency.indptr) - 1) + \
+        np.bincount(sources[loops], minlength=len(adjacency.indptr) - 1)
+
+
+def frontier_neighbors(adjacency: Union[RoadsGraph, Adjacency], frontier: np.ndarray,
+                       edges_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Gathers the neighbors of all the frontier nodes at once, in the order of the frontier and then of the adjacency
+    :param adjacency: roads graph or adjacency, anything with CSR indptr, indices and edges_ids arrays
+    :param frontier: array of nodes ids
+    :param edges_mask: mask of the present edges, all edges by default
+    :return: the positions in the frontier of the nodes the neighbors were reached from, the neighbors, and the ids of
+    the edges leading to them
+    """
+    starts = adjacency.indptr[frontier]
+    counts = adjacency.indptr[frontier + 1] - starts
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    sources = np.repeat(np.arange(len(frontier)), counts)
+    neighbors = adjacency.indices[positions]
+    edges_ids = adjacency.edges_ids[positions]
+    if edges_mask is not None:
+        present = edges_mask[edges_ids]
+        sources, neighbors, edges_ids = sources[present], neighbors[present], edges_ids[present]
+    return sources, neighbors, edges_ids
+
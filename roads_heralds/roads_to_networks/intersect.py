@@ -1,24 +1,21 @@
 from typing import List, Dict, Tuple
 from shapely.geometry import LineString, MultiPoint, MultiLineString, Point, GeometryCollection
-from shapely.ops import split
+from shapely.ops import split, unary_union
+from shapely.strtree import STRtree
 import numpy as np
 
 
-def get_all_roads_in_radius(roads_linestrings: Dict[Tuple, LineString], current_road_center: Tuple[float, float]) -> \
-        List[LineString]:
+def find_candidate_pairs(roads: List[LineString]) -> np.ndarray:
     """
-    Find all roads in some radius for fast query
-    :param roads_linestrings: dict from centers of roads to the roads
-    :param current_road_center: queried road centers
-    :return:list of roads linestrings
+    Find all pairs of roads whose bounding boxes intersect, using a spatial index built once over all the roads
+    :param roads: list of roads linestrings
+    :return: 2D array (pairs, 2) of roads indices, every pair appears once with the smaller index first
     """
-    roads_centers = np.array([road_center for road_center in roads_linestrings.keys()])
-    distance_to_centers = np.linalg.norm(roads_centers - current_road_center, axis=1)
-    close_by_centers_mask = np.bitwise_and(distance_to_centers < 2 * roads_linestrings[current_road_center].length,
-                                           distance_to_centers > 0)
-    relevant_centers = roads_centers[close_by_centers_mask].tolist()
-    return [road_linestring for road_center, road_linestring in roads_linestrings.items() if
-            list(road_center) in relevant_centers]
+    tree = STRtree(roads)
+    index_by_id = {id(road): i for i, road in enumerate(roads)}
+    pairs = np.array([(i, index_by_id[id(other_road)])
+                      for i, road in enumerate(roads) for other_road in tree.query(road)]).reshape(-1, 2)
+    return pairs[pairs[:, 0] < pairs[:, 1]]
 
 
 def get_representative_points_from_geometry(intersections: List, intersection_geometry: GeometryCollection):
@@ -51,24 +48,37 @@ def calculate_intersecting_linestrings(roads_linestrings: Dict[Tuple, LineString
     :param roads_linestrings: dict from centers of roads to the roads
     :return: list of all the elemental linestrings (breaked by the intersection points)
     """
-    intersected_linestrings = []
-    for current_road_center, current_linestring in roads_linestrings.items():
-        # query all nearby roads
-        relevant_linestrings = get_all_roads_in_radius(roads_linestrings, current_road_center)
+    roads = list(roads_linestrings.values())
 
-        # check if nearby road intersects the current road. If it does, add one relevant point from the
-        # intersection geometry to a list
-        intersections = []
-        for relevant_linestring in relevant_linestrings:
-            if current_linestring.intersects(relevant_linestring):
-                intersection_geometry = current_linestring.intersection(relevant_linestring)
-                get_representative_points_from_geometry(intersections, intersection_geometry)
+    # check every candidate pair once. If the roads intersect, add one relevant point from the intersection geometry
+    # to the intersections lists of both roads
+    intersections = [[] for _ in roads]
+    for i, j in find_candidate_pairs(roads):
+        if roads[i].intersects(roads[j]):
+            intersection_geometry = roads[i].intersection(roads[j])
+            get_representative_points_from_geometry(intersections[i], intersection_geometry)
+            get_representative_points_from_geometry(intersections[j], intersection_geometry)
 
-        # take all the points and split the linestring into multiple linestring, with the intersections as the junctions
-        if len(intersections) > 0:
-            intersections_multipoint = MultiPoint(intersections)
-            splitted_linestring = split(current_linestring, intersections_multipoint)
+    # take all the points and split every linestring into multiple linestring, with the intersections as the junctions
+    intersected_linestrings = []
+    for road, road_intersections in zip(roads, intersections):
+        if len(road_intersections) > 0:
+            intersections_multipoint = MultiPoint(road_intersections)
+            splitted_linestring = split(road, intersections_multipoint)
             for linestring in splitted_linestring:
                 intersected_linestrings.append(linestring)
 
     return intersected_linestrings
+
+
+def node_linestrings(roads_linestrings: Dict[Tuple, LineString]) -> List[LineString]:
+    """
+    Break all linestrings into elemental linestrings by noding the whole roads layer in a single union operation.
+    Collinear overlaps are merged into a single segment, instead of being intersected pairwise.
+    :param roads_linestrings: dict from centers of roads to the roads
+    :return: list of all the elemental linestrings (breaked by the intersection points)
+    """
+    noded_roads = unary_union(list(roads_linestrings.values()))
+    if type(noded_roads) == LineString:
+        return [noded_roads]
+    return list(noded_roads.geoms)
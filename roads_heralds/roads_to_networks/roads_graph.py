@@ -0,0 +1,104 @@
+import os
+from pathlib import Path
+from typing import Dict, Tuple, Optional
+
+import numpy as np
+from shapely.geometry import LineString
+
+ROADS_GRAPH_ARRAYS = ('nodes_geo_locs', 'edges', 'indptr', 'indices', 'edges_ids', 'roads_coords', 'roads_offsets')
+
+
+class RoadsGraph:
+    """
+    Compact roads network. Holds the nodes geo locations, the edges as pairs of nodes ids, a CSR adjacency
+    (indptr, indices and the id of the edge behind every adjacency entry) and the edges geometries as one flat
+    coordinates array with per-edge offsets. All arrays are saved as .npy files and can be memory-mapped on load.
+    """
+    ARRAYS = ROADS_GRAPH_ARRAYS
+
+    def __init__(self, nodes_geo_locs: np.ndarray, edges: np.ndarray, roads_coords: np.ndarray,
+                 roads_offsets: np.ndarray, indptr: Optional[np.ndarray] = None, indices: Optional[np.ndarray] = None,
+                 edges_ids: Optional[np.ndarray] = None):
+        self.nodes_geo_locs = nodes_geo_locs
+        self.edges = edges
+        self.roads_coords = roads_coords
+        self.roads_offsets = roads_offsets
+        if indptr is None:
+            indptr, indices, edges_ids = build_csr_adjacency(len(nodes_geo_locs), edges)
+        self.indptr = indptr
+        self.indices = indices
+        self.edges_ids = edges_ids
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.nodes_geo_locs)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edges)
+
+    @classmethod
+    def from_edges_to_roads_dict(cls, nodes_geo_locs: np.ndarray,
+                                 edges_to_roads_dict: Dict[Tuple[int, int], LineString]) -> 'RoadsGraph':
+        """
+        Creates the graph from the nodes locations and the dict from the edges to the underlying roads
+        :param nodes_geo_locs: 2D array of the nodes geo locations, the node id is the row index
+        :param edges_to_roads_dict: dict from the edges (tuples of ints, each int is a node) to the underlying road
+        :return: the roads graph
+        """
+        edges = np.array(list(edges_to_roads_dict.keys()), dtype=np.int64).reshape(-1, 2)
+        roads = [np.array(road.coords).reshape(-1, 2) for road in edges_to_roads_dict.values()]
+        roads_offsets = np.concatenate([[0], np.cumsum([len(road) for road in roads])]).astype(np.int64)
+        roads_coords = np.vstack(roads) if len(roads) > 0 else np.empty((0, 2))
+        return cls(np.asarray(nodes_geo_locs, dtype=float).reshape(-1, 2), edges, roads_coords, roads_offsets)
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def road_coords(self, edge_id: int) -> np.ndarray:
+        return self.roads_coords[self.roads_offsets[edge_id]:self.roads_offsets[edge_id + 1]]
+
+    def road(self, edge_id: int) -> LineString:
+        return LineString(self.road_coords(edge_id))
+
+    def get_geo_locs(self) -> Dict[int, Tuple[float, float]]:
+        """
+        :return: a new dict mapping from node to it's geo location in degrees lat,lon
+        """
+        return {i: tuple(geo_loc) for i, geo_loc in enumerate(np.asarray(self.nodes_geo_locs).tolist())}
+
+    def get_roads(self) -> Dict[Tuple[int, int], LineString]:
+        """
+        :return: a new dict from the edges (tuples of ints, each int is a node) to the underlying road
+        """
+        return {(u, v): self.road(edge_id) for edge_id, (u, v) in enumerate(np.asarray(self.edges).tolist())}
+
+    def save(self, graph_dir: str) -> None:
+        Path(graph_dir).mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(graph_dir, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, graph_dir: str, mmap_mode: Optional[str] = 'r') -> 'RoadsGraph':
+        arrays = {name: np.load(os.path.join(graph_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in cls.ARRAYS}
+        return cls(**arrays)
+
+
+def build_csr_adjacency(n_nodes: int, edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds the CSR adjacency of an undirected graph, every edge appears in the adjacency of both of its nodes
+    :param n_nodes: number of nodes
+    :param edges: 2D array (edges, 2) of nodes ids
+    :return: indptr, indices (the neighbors) and the edges ids of the adjacency entries
+    """
+    edges = np.asarray(edges).reshape(-1, 2)
+    sources = np.concatenate([edges[:, 0], edges[:, 1]])
+    targets = np.concatenate([edges[:, 1], edges[:, 0]])
+    edges_ids = np.tile(np.arange(len(edges), dtype=np.int64), 2)
+    order = np.argsort(sources, kind='stable')
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=n_nodes))]).astype(np.int64)
+    return indptr, targets[order].astype(np.int64), edges_ids[order]
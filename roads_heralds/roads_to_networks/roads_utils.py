@@ -4,11 +4,13 @@ from collections import defaultdict
 from typing import Dict, Tuple, List
 import networkx as nx
 
+from models.geo_layer import GeoLayer
 
-def get_roads_linestrings_dict(roads: List[List[Tuple]]) -> Dict[Tuple, LineString]:
+
+def get_roads_linestrings_dict(roads: GeoLayer) -> Dict[Tuple, LineString]:
     """
-    Format the roads from list structure to a dict structure, with their centers as keys
-    :param roads: list of lists with points
+    Format the roads from the layer structure to a dict structure, with their centers as keys
+    :param roads: the roads layer
     :return: dict mapping from road center to the actual road as a linestring
     """
     roads_linestrings = {}
@@ -19,44 +21,29 @@ def get_roads_linestrings_dict(roads: List[List[Tuple]]) -> Dict[Tuple, LineStri
     return roads_linestrings
 
 
-def extract_start_end_points_of_linestring(linestring: LineString) -> Tuple[Tuple, Tuple]:
-    """
-    Returns the first and last points of the intersecting linestring. Those are the nodes.
-    :param linestring: the linestring of the road, sequence of points
-    :return: first,last points
-    """
-    start = (linestring.coords.xy[0][0], linestring.coords.xy[1][0])
-    end = (linestring.coords.xy[0][-1], linestring.coords.xy[1][-1])
-    return start, end
-
-
-def gather_intersecting_nodes(intersected_linestrings: List[LineString]) -> List[Tuple]:
+def index_linestrings_endpoints(intersected_linestrings: List[LineString]) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Extract all first and last points in the intersected linestring into a list
+    Extracts the first and last points of all the intersected linestrings. The unique points are the nodes, and every
+    linestring becomes an edge between the ids of its first and last points.
     :param intersected_linestrings: list of intersecting roads
-    :return: list of intersection points
+    :return: 2D array of the nodes geo locations, and 2D array (linestrings, 2) of the edges nodes ids
     """
-    intersected_nodes = []
-    for intersected_linestring in intersected_linestrings:
-        start, end = extract_start_end_points_of_linestring(intersected_linestring)
-        intersected_nodes.append(start)
-        intersected_nodes.append(end)
-    return intersected_nodes
+    endpoints = np.array([(linestring.coords[0], linestring.coords[-1])
+                          for linestring in intersected_linestrings]).reshape(-1, 2)
+    nodes, nodes_ids = np.unique(endpoints, axis=0, return_inverse=True)
+    return nodes, nodes_ids.reshape(-1, 2)
 
 
-def create_edges_to_roads_dict(nodes_to_id_dict: Dict[Tuple, int], intersected_linestrings: List[LineString]) -> \
+def create_edges_to_roads_dict(edges: np.ndarray, intersected_linestrings: List[LineString]) -> \
         Dict[Tuple, LineString]:
     """
     Creates dict from the edges (tuples of ints, each int is a node) to the underlying road, that is a linestring with multiple nodes
-    :param nodes_to_id_dict: dict mapping from the node location in geo to it's id (an int) in the graph, numbered from 0 to len(nodes)-1
+    :param edges: 2D array of the edges nodes ids, in the same order as the linestrings
     :param intersected_linestrings: list of intersecting roads
     :return: the mentioned dict
     """
     edges_to_roads_dict = defaultdict(LineString)
-    for linestring in intersected_linestrings:
-        start, end = extract_start_end_points_of_linestring(linestring)
-        start_id = nodes_to_id_dict[start]
-        end_id = nodes_to_id_dict[end]
+    for (start_id, end_id), linestring in zip(edges.tolist(), intersected_linestrings):
         edges_to_roads_dict[(start_id, end_id)] = linestring
 
     return edges_to_roads_dict
@@ -70,15 +57,6 @@ def set_edges_grid_locs(G: nx.Graph, edges_to_roads_dict: Dict[Tuple, LineString
     nx.set_edge_attributes(G, edges_to_roads_dict, 'roads')
 
 
-def get_geo_locs(G: nx.Graph) -> Dict:
-    geo_locs = list(nx.get_node_attributes(G, 'geo_locs').values())
-    return {i: geo_locs[i] for i in range(len(geo_locs))}
-
-
-def get_roads(G: nx.Graph) -> Dict:
-    return nx.get_edge_attributes(G, 'roads')
-
-
 def get_road_by_edge_key(edge: Tuple[int, int], edges_to_roads_dict: Dict[Tuple[int, int], LineString]):
     """
     Collect the road by the edge key. If the edge was ordered as inner and outer nodes, then we need to switch the order
@@ -0,0 +1,4 @@
+import matplotlib
+
+# the figures are only saved, never shown
+matplotlib.use('Agg')
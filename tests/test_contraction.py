@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+import pytest
+
+from algo_config.algo_config import RunConfig, bind_config
+from dir_definitions import BENCHMARK_DIR
+from pipeline.stages import HERALDS_PIPELINE
+
+
+def block_output(config: RunConfig):
+    with bind_config(config):
+        return HERALDS_PIPELINE.run(['blocks_output'], workers=1).outputs['blocks_output']
+
+
+@pytest.mark.parametrize("solver", ['label_and_filter', 'min_cut'])
+@pytest.mark.parametrize("benchmark", ['2', '10'])
+def test_contracted_blocking_matches_full_blocking(benchmark, solver):
+    config = RunConfig.from_file(os.path.join(BENCHMARK_DIR, f'benchmark_{benchmark}.yaml')).replace(
+        roads_blocking_solver=solver)
+    locations = [None] + list(np.random.default_rng(0).uniform(0.15, 0.85, (3, 2)))
+    for location in locations:
+        location_config = config if location is None else config.replace(
+            patient_location_type='relative', patient_location_south=float(location[0]),
+            patient_location_west=float(location[1]))
+        full = block_output(location_config.replace(roads_graph_contraction=False))
+        contracted = block_output(location_config.replace(roads_graph_contraction=True))
+        # the same labels in the same order, so the blocks moved to the polygon boundary get the same nodes ids
+        assert list(contracted["edges_labels"].items()) == list(full["edges_labels"].items())
+        assert list(contracted["nodes_labels"].items()) == list(full["nodes_labels"].items())
+        assert {node: tuple(geo_loc) for node, geo_loc in contracted["nodes_geo_locs"].items()} == \
+            {node: tuple(geo_loc) for node, geo_loc in full["nodes_geo_locs"].items()}
+        assert np.array_equal(contracted["heralds"].locations, full["heralds"].locations)
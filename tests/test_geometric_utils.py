@@ -0,0 +1,21 @@
+import numpy as np
+from shapely.geometry import LineString, Point
+
+from general_utils.geometric_utils import first_boundary_intersections
+
+
+def test_first_boundary_intersections_matches_shapely():
+    rng = np.random.default_rng(0)
+    polygon = Point(0, 0).buffer(1).difference(Point(0.5, 0).buffer(0.2))
+    lines = [np.cumsum(np.vstack([rng.uniform(-1.2, 1.2, 2), rng.normal(0, 0.1, (rng.integers(1, 8), 2))]), axis=0)
+             for _ in range(200)]
+    first_points = first_boundary_intersections(lines, polygon.boundary)
+    for line, first_point in zip(lines, first_points):
+        line_string = LineString(line)
+        intersection = line_string.intersection(polygon.boundary)
+        if intersection.is_empty:
+            assert np.all(np.isnan(first_point))
+        else:
+            expected = min((point for point in getattr(intersection, 'geoms', [intersection])),
+                           key=line_string.project)
+            assert np.allclose(first_point, np.array(expected.coords[0]))
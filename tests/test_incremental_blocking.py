@@ -0,0 +1,30 @@
+import os
+
+import numpy as np
+import pytest
+
+from algo_config.algo_config import RunConfig, bind_config
+from dir_definitions import BENCHMARK_DIR
+from pipeline.replan import StreamingPlanner
+from pipeline.stages import HERALDS_PIPELINE
+
+
+def same_block_output(first, second) -> bool:
+    return dict(first["nodes_labels"]) == dict(second["nodes_labels"]) and \
+        first["edges_labels"] == second["edges_labels"] and \
+        np.array_equal(first["heralds"].locations, second["heralds"].locations)
+
+
+@pytest.mark.parametrize("contraction", [False, True])
+def test_incremental_blocking_matches_full_blocking(contraction):
+    config = RunConfig.from_file(os.path.join(BENCHMARK_DIR, 'benchmark_2.yaml')).replace(
+        roads_graph_contraction=contraction)
+    planner = StreamingPlanner(config, with_los=False, workers=1)
+    route = np.cumsum(np.vstack([[0.45, 0.45], np.random.default_rng(0).normal(0, 0.01, (5, 2))]), axis=0)
+    for location in route:
+        plan = planner.update(location, relative=True)
+        location_config = config.replace(patient_location_type='relative', patient_location_south=float(location[0]),
+                                         patient_location_west=float(location[1]))
+        with bind_config(location_config):
+            blocks_output = HERALDS_PIPELINE.run(['blocks_output'], workers=1).outputs['blocks_output']
+        assert same_block_output(plan.blocks_output, blocks_output)
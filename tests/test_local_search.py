@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from models.patient import Patient
+from noise_heralds.make_noise.local_search import CoverageState, add_move, merge_move, shift_move, \
+    outside_contagion_circle
+
+RADIUS = 500.0  # meters
+
+
+def random_state(rng: np.random.Generator):
+    # front points on an arc around the patient, with many redundant heralds standing on them
+    patient = Patient(np.array([32.0, 35.0]), 1000.0, 3000.0)
+    angles = rng.uniform(0, np.pi, 200)
+    distances = rng.uniform(0.018, 0.022, (200, 1))
+    targets = patient.location + distances * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    centers = targets[rng.choice(len(targets), 40, replace=False)]
+    return CoverageState(centers, targets, RADIUS), targets, patient
+
+
+def assert_consistent(state: CoverageState):
+    assert np.array_equal(state.covers, state.coverage(state.centers))
+    assert np.array_equal(state.counts, state.covers.sum(0))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_local_search_moves_keep_the_state_consistent(seed):
+    rng = np.random.default_rng(seed)
+    state, targets, patient = random_state(rng)
+    required = state.required.copy()
+    for _ in range(100):
+        n_heralds, n_uncovered = len(state), state.n_uncovered()
+        move = rng.integers(3)
+        if move == 0:
+            improved = shift_move(state, patient, rng)
+        elif move == 1:
+            improved = merge_move(state, patient, rng)
+        else:
+            before = state.copy()
+            improved = add_move(state, targets, patient, rng)
+            if not improved:
+                # a rejected trial leaves the state untouched
+                assert state.centers is before.centers and state.counts is before.counts
+        state.drop_redundant(rng)
+
+        assert_consistent(state)
+        assert np.array_equal(state.required, required)
+        assert state.n_uncovered() <= n_uncovered
+        assert len(state) <= n_heralds
+        assert np.all(outside_contagion_circle(state.centers, patient))
+
+
+def test_add_move_replaces_two_heralds_with_one():
+    # the two heralds each cover half of a small cluster of targets, which a single herald in the cluster covers
+    rng = np.random.default_rng(0)
+    patient = Patient(np.array([32.0, 35.0]), 1000.0, 3000.0)
+    cluster_center = patient.location + np.array([0.05, 0.0])
+    targets = cluster_center + rng.uniform(-0.0005, 0.0005, (50, 2))
+    centers = cluster_center + np.array([[0.0045, 0.0], [-0.0045, 0.0]])
+    state = CoverageState(centers, targets, RADIUS)
+    assert np.all(state.counts[state.required] == 1)
+
+    # the trial drops the redundant heralds at random order, the new herald first in some of the attempts, which
+    # are then rejected
+    assert any(add_move(state, targets, patient, rng) for _ in range(10))
+    assert len(state) == 1 and state.n_uncovered() == 0
+    assert_consistent(state)
+
+
+def test_assign_takes_the_trial_state():
+    state, _, _ = random_state(np.random.default_rng(0))
+    trial = state.copy()
+    trial.remove(np.array([0]))
+    state.assign(trial)
+    assert len(state) == len(trial)
+    assert_consistent(state)
+
+    # arrays are replaced, never modified in place, so later changes of the trial do not leak into the state
+    trial.remove(np.array([0]))
+    assert len(state) == len(trial) + 1
+    assert_consistent(state)
@@ -0,0 +1,29 @@
+import numpy as np
+from shapely.geometry import box
+
+from roads_heralds.block_roads.assign_labels import assign_nodes_labels
+from roads_heralds.block_roads.edge_predicates import EdgePredicates
+from roads_heralds.block_roads.min_cut import min_cut_edges_labels
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
+
+
+def test_min_cut_blocks_the_junction_of_many_roads():
+    # three village roads meet at the junction 3, which leads by two roads to the sink 6 inside the no entrance
+    # polygon. blocking the junction takes one herald, blocking the roads two or three
+    edges = np.array([[8, 0], [9, 1], [10, 2], [0, 3], [1, 3], [2, 3], [3, 4], [3, 5], [4, 6], [5, 6], [6, 7]])
+    nodes_geo_locs = np.array([[0., 0.], [0., 1.], [0., 2.], [1., 1.], [2., 0.], [2., 2.], [10., 1.], [11., 1.],
+                               [-1., 0.], [-1., 1.], [-1., 2.]])
+    G = RoadsGraph(nodes_geo_locs, edges, nodes_geo_locs[edges.ravel()], np.arange(0, 2 * len(edges) + 1, 2))
+    is_village = np.zeros(len(edges), dtype=bool)
+    is_village[:3] = True
+    intersects_no_entrance = np.zeros(len(edges), dtype=bool)
+    intersects_no_entrance[8:] = True
+    edges_predicates = EdgePredicates(intersects_no_entrance, is_village, np.zeros(len(edges), dtype=bool),
+                                      np.zeros(len(edges), dtype=bool))
+    is_contained = np.zeros(G.n_nodes, dtype=bool)
+    is_contained[[4, 5, 6, 7]] = True
+
+    edges_labels, inner_nodes_mask = min_cut_edges_labels(G, box(9.5, 0.5, 11.5, 1.5), is_contained,
+                                                          edges_predicates)
+    assert edges_labels == {(0, 3): 'safe_crossing', (1, 3): 'safe_crossing', (2, 3): 'safe_crossing'}
+    assert dict(assign_nodes_labels(edges_labels, inner_nodes_mask)) == {3: 'safe_marked'}
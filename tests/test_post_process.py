@@ -0,0 +1,93 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from roads_heralds.block_roads.edge_predicates import EdgePredicates
+from roads_heralds.block_roads import post_process as post_process_module
+from roads_heralds.block_roads.post_process import post_process
+from roads_heralds.roads_to_networks.roads_graph import RoadsGraph
+from roads_heralds.roads_to_networks.roads_utils import get_road_by_edge_key
+
+
+def reference_post_process(G: RoadsGraph, edges_labels, edges_predicates: EdgePredicates):
+    # the networkx post processing, with the paths to the leaves taken from the BFS tree of the inner node
+    H = nx.Graph()
+    H.add_nodes_from(range(G.n_nodes))
+    H.add_edges_from(G.get_roads().keys())
+    edges_ids = {tuple(edge): edge_id for edge_id, edge in enumerate(np.asarray(G.edges).tolist())}
+    marked_edges = [edge for edge, edge_label in edges_labels.items() if
+                    edge_label in ['danger_crossing', 'safe_crossing']]
+    marked_nodes = {edge[0] if edges_labels[edge] == 'safe_crossing' else edge[1] for edge in marked_edges}
+    for marked_edge in marked_edges:
+        G_copy = H.copy()
+        G_copy.remove_edges_from(marked_edges)
+        inner_subgraph = G_copy.subgraph(nx.node_connected_component(G_copy, marked_edge[0]))
+        paths = nx.single_source_shortest_path(inner_subgraph, marked_edge[0])
+        prevents = False
+        for node in inner_subgraph:
+            if inner_subgraph.degree(node) != 1:
+                continue
+            for edge in zip(paths[node][:-1], paths[node][1:]):
+                if edges_predicates.intersects_no_entrance[get_road_by_edge_key(edge, edges_ids)]:
+                    prevents = True
+                if prevents or edge[1] in marked_nodes:
+                    break
+        if not prevents:
+            edges_labels[marked_edge] = 'filtered'
+            continue
+
+        G_copy.remove_edges_from(inner_subgraph.edges())
+        G_copy.add_edge(*marked_edge)
+        outer_subgraph = G_copy.subgraph(nx.node_connected_component(G_copy, marked_edge[1]))
+        # networkx orients the edges of a small subgraph by the order of a python set, take the lower node first
+        if not any(edges_predicates.intersects_village_or_end_of_map[get_road_by_edge_key(tuple(sorted(edge)),
+                                                                                          edges_ids)]
+                   for edge in outer_subgraph.edges()):
+            edges_labels[marked_edge] = 'filtered'
+    return edges_labels
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_post_process_matches_networkx_bfs_tree(seed):
+    # small random networks with parallel edges, reversed duplicates and self loops, where shortest paths often tie
+    rng = np.random.default_rng(seed)
+    n_nodes = int(rng.integers(8, 30))
+    edges = rng.integers(0, n_nodes, (int(rng.integers(n_nodes, 2 * n_nodes)), 2))
+    edges = np.vstack([edges, edges[rng.random(len(edges)) < 0.15][:, ::-1]])
+    edges = edges[rng.permutation(len(edges))]
+    nodes_geo_locs = rng.random((n_nodes, 2))
+    G = RoadsGraph(nodes_geo_locs, edges, nodes_geo_locs[edges.ravel()], np.arange(0, 2 * len(edges) + 1, 2))
+    edges_predicates = EdgePredicates(rng.random(len(edges)) < 0.3, rng.random(len(edges)) < 0.1,
+                                      rng.random(len(edges)) < 0.1, np.zeros(len(edges), dtype=bool))
+
+    edges_labels = {}
+    for u, v in edges.tolist():
+        if u != v and (v, u) not in edges_labels:
+            edges_labels[(u, v)] = ['inside', 'outside', 'safe_crossing', 'danger_crossing'][rng.integers(4)]
+
+    expected = reference_post_process(G, dict(edges_labels), edges_predicates)
+    assert post_process(G, dict(edges_labels), edges_predicates) == expected
+
+
+@pytest.mark.parametrize('flagged_leaf', [True, False])
+def test_edge_prevents_to_reach_patient_stops_early(flagged_leaf, monkeypatch):
+    # the inner node 0 has a leaf and a long chain: the search ends at the flagged leaf, or once every path reached
+    # a marked node, without walking the chain
+    edges = np.array([[0, 1]] + [[i, i + 1] for i in range(2, 1000)] + [[0, 2]])
+    nodes_geo_locs = np.zeros((1001, 2))
+    G = RoadsGraph(nodes_geo_locs, edges, nodes_geo_locs[edges.ravel()], np.arange(0, 2 * len(edges) + 1, 2))
+    adjacency = post_process_module.networkx_adjacency(G)
+    edges_mask = np.ones(len(edges), dtype=bool)
+    intersects_no_entrance = np.zeros(len(edges), dtype=bool)
+    intersects_no_entrance[0 if flagged_leaf else 1:-1] = True
+    marked_nodes_mask = np.zeros(G.n_nodes, dtype=bool)
+    marked_nodes_mask[1 if flagged_leaf else 2] = True
+
+    levels = []
+    frontier_neighbors = post_process_module.frontier_neighbors
+    monkeypatch.setattr(post_process_module, 'frontier_neighbors',
+                        lambda *args: levels.append(1) or frontier_neighbors(*args))
+    degrees = post_process_module.adjacency_degrees(adjacency, edges_mask)
+    assert post_process_module.edge_prevents_to_reach_patient(adjacency, edges_mask, degrees, 0, marked_nodes_mask,
+                                                              intersects_no_entrance) == flagged_leaf
+    assert len(levels) <= 2